@@ -0,0 +1,321 @@
+"""
+Load generator: many concurrent ClientCore uploaders against one server.
+
+Workers are spread over `processes` child processes, each running threads.
+
+- closed loop (--concurrency N): N uploaders in total, each sending its next
+  file as soon as the previous one finished;
+- open loop (--rate R): R uploads per second in total arrive on schedule
+  (Poisson or evenly spaced) whether or not earlier ones finished. Latency is
+  then measured from the scheduled arrival, so a slow server shows up as
+  queueing instead of hiding it.
+
+Only the client package is imported; no Qt, no database.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from client.client_core import ClientCore
+from .workload import FILE_KINDS, LatencyHistogram, SizeDistribution, make_file
+
+
+DEFAULT_DURATION = 10.0
+DEFAULT_MAX_IN_FLIGHT = 256  # per process, open loop
+RESULT_POLL_INTERVAL = 1.0  # seconds between checks for workers that died
+ARRIVALS = ("poisson", "uniform")
+
+
+class LoadResult:
+    """What one process (or, merged, the whole run) measured."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors = Counter()  # error type -> count
+        self.bytes_sent = 0
+        self.completed = 0  # uploads the server acknowledged as stored (or sent, without ack)
+        self.started = None
+        self.finished = None
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.errors.update(other.errors)
+        self.bytes_sent += other.bytes_sent
+        self.completed += other.completed
+        self.started = min(filter(None, (self.started, other.started)), default=None)
+        self.finished = max(filter(None, (self.finished, other.finished)), default=None)
+
+    @property
+    def wall_time(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    def to_dict(self):
+        wall_time = self.wall_time
+        return {
+            "completed": self.completed,
+            "errors": dict(self.errors),
+            "error_count": sum(self.errors.values()),
+            "bytes_sent": self.bytes_sent,
+            "wall_time": wall_time,
+            "throughput_mb_s": self.bytes_sent / wall_time / (1024 * 1024) if wall_time else 0.0,
+            "requests_per_s": self.completed / wall_time if wall_time else 0.0,
+            "latency": self.latency.to_dict(),
+        }
+
+
+class _Uploader:
+    # one process's share of the load: a source file, hard links so
+    # concurrent uploads have distinct names, and the shared result
+    def __init__(self, options, process_index, work_dir):
+        self.options = options
+        self.sizes = SizeDistribution(options["sizes"])
+        self.client = ClientCore(options["host"], options["port"])
+        self.work_dir = work_dir
+        self.prefix = f"load-p{process_index}"
+        self.source = make_file(
+            os.path.join(work_dir, f"{self.prefix}.bin"), self.sizes.max_size, options["kind"]
+        )
+        self.rng = random.Random(options["seed"] + process_index if options["seed"] is not None else None)
+        self.result = LoadResult()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._links = 0
+
+    def _link(self):
+        path = getattr(self._local, "path", None)
+        if path is None:
+            with self._lock:
+                self._links += 1
+                path = os.path.join(self.work_dir, f"{self.prefix}-w{self._links}.bin")
+            try:
+                os.link(self.source, path)
+            except OSError:
+                shutil.copyfile(self.source, path)
+            self._local.path = path
+        return path
+
+    def upload(self, since=None):
+        # `since`: scheduled arrival (open loop); default now (closed loop)
+        with self._lock:
+            size = self.sizes.sample(self.rng)
+        start = time.perf_counter() if since is None else since
+        try:
+            metrics = self.client.send_file(self._link(), length=size, ack=self.options["ack"])
+        except Exception as e:
+            with self._lock:
+                self.result.errors[type(e).__name__] += 1
+            return
+        latency = time.perf_counter() - start
+        with self._lock:
+            if self.options["ack"] and metrics.server_status != "Success":
+                self.result.errors[f"server: {metrics.server_status or 'no acknowledgement'}"] += 1
+                return
+            self.result.latency.add(latency)
+            self.result.bytes_sent += metrics.bytes_sent
+            self.result.completed += 1
+
+    def closed_loop(self, workers, requests, deadline):
+        remaining = [requests]
+
+        def take():
+            with self._lock:
+                if remaining[0] is not None:
+                    if remaining[0] <= 0:
+                        return False
+                    remaining[0] -= 1
+            return time.perf_counter() < deadline
+
+        def run():
+            while take():
+                self.upload()
+
+        threads = [threading.Thread(target=run) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def open_loop(self, rate, requests, deadline, arrival, max_in_flight):
+        arrivals = random.Random(self.rng.random())  # the workers share self.rng
+        with ThreadPoolExecutor(max_in_flight) as pool:
+            next_arrival = time.perf_counter()
+            sent = 0
+            while next_arrival < deadline and (requests is None or sent < requests):
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.upload, next_arrival)
+                sent += 1
+                next_arrival += arrivals.expovariate(rate) if arrival == "poisson" else 1 / rate
+
+
+def _share(total, parts, index):
+    # `total` split as evenly as possible; None stays None
+    if total is None:
+        return None
+    return total // parts + (1 if index < total % parts else 0)
+
+
+def _process_main(options, index, barrier, results):
+    work_dir = tempfile.mkdtemp(prefix="load-", dir=options["work_dir"])
+    try:
+        uploader = _Uploader(options, index, work_dir)
+        processes = options["processes"]
+        requests = _share(options["requests"], processes, index)
+        barrier.wait()  # every process starts sending at the same moment
+        uploader.result.started = time.time()
+        deadline = time.perf_counter() + options["duration"]
+        if options["rate"]:
+            uploader.open_loop(
+                options["rate"] / processes, requests, deadline,
+                options["arrival"], options["max_in_flight"],
+            )
+        else:
+            workers = _share(options["concurrency"], processes, index)
+            if workers:
+                uploader.closed_loop(workers, requests, deadline)
+        uploader.result.finished = time.time()
+        results.put((index, uploader.result))
+    except Exception as e:
+        failed = LoadResult()
+        failed.errors[f"process: {type(e).__name__}: {e}"] += 1
+        results.put((index, failed))
+        barrier.abort()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_load(host, port, sizes="1M", concurrency=8, rate=None, processes=None, duration=DEFAULT_DURATION,
+             requests=None, arrival="poisson", max_in_flight=DEFAULT_MAX_IN_FLIGHT, kind="sparse",
+             ack=True, seed=None, work_dir=None):
+    """Run one load test; returns the merged LoadResult.
+
+    Closed loop with `concurrency` uploaders unless `rate` (uploads per
+    second) is given. The run ends after `duration` seconds or, if set,
+    `requests` uploads, whichever comes first.
+    """
+    SizeDistribution(sizes)  # fail early on a bad spec
+    if arrival not in ARRIVALS:
+        raise ValueError(f"Unknown arrival process {arrival!r}, expected one of {ARRIVALS}")
+    if processes is None:
+        processes = min(os.cpu_count() or 1, concurrency if not rate else os.cpu_count() or 1)
+    processes = max(1, processes)
+    options = {
+        "host": host, "port": port, "sizes": sizes, "concurrency": concurrency, "rate": rate,
+        "processes": processes, "duration": duration, "requests": requests, "arrival": arrival,
+        "max_in_flight": max_in_flight, "kind": kind, "ack": ack, "seed": seed, "work_dir": work_dir,
+    }
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = [
+        context.Process(target=_process_main, args=(options, index, barrier, results), daemon=True)
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    total = _collect(workers, results, barrier)
+    for worker in workers:
+        worker.join()
+    return total
+
+
+def _collect(workers, results, barrier):
+    # Merge each worker's result. A worker killed outright (OOM killer,
+    # segfault) never reports, so a dead one counts as an error instead of
+    # being waited for
+    total = LoadResult()
+    reported = set()
+    while len(reported) < len(workers):
+        try:
+            index, result = results.get(timeout=RESULT_POLL_INTERVAL)
+        except queue.Empty:
+            for index, worker in enumerate(workers):
+                if index not in reported and worker.exitcode not in (None, 0):
+                    reported.add(index)
+                    total.errors[f"process {index}: exited with code {worker.exitcode}"] += 1
+                    barrier.abort()  # the others may be waiting for it to start
+            continue
+        if index not in reported:
+            reported.add(index)
+            total.merge(result)
+    return total
+
+
+def format_report(result, out=None):
+    out = out or sys.stdout
+    report = result.to_dict()
+    latency = report["latency"]
+    print(
+        f"uploads: {report['completed']} completed, {report['error_count']} errors "
+        f"in {report['wall_time']:.2f} s ({report['requests_per_s']:.1f}/s)",
+        file=out,
+    )
+    for name, count in sorted(report["errors"].items(), key=lambda item: -item[1]):
+        print(f"  {count:8d}  {name}", file=out)
+    print(
+        f"throughput: {report['throughput_mb_s']:.2f} MB/s aggregate "
+        f"({report['bytes_sent'] / (1024 * 1024):.1f} MiB sent)",
+        file=out,
+    )
+    print(
+        "latency ms: " + "  ".join(
+            f"{name} {latency[name] * 1000:.2f}" for name in ("min", "mean", "p50", "p90", "p99", "p99.9", "max")
+        ),
+        file=out,
+    )
+    buckets = result.latency.buckets()
+    widest = max((count for _, count in buckets), default=0)
+    for bound, count in buckets:
+        label = f"<= {bound * 1000:g} ms" if bound != float("inf") else "> 1000 s"
+        bar = "#" * max(1, round(40 * count / widest))
+        print(f"  {label:>14} | {bar} {count}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--concurrency", type=int, default=8, help="closed loop: uploaders in total")
+    mode.add_argument("--rate", type=float, help="open loop: uploads per second in total")
+    parser.add_argument("--arrival", choices=ARRIVALS, default="poisson", help="open-loop arrival process")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="open loop: concurrent uploads per process")
+    parser.add_argument("--processes", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="seconds to run")
+    parser.add_argument("--requests", type=int, help="stop after this many uploads in total")
+    parser.add_argument("--sizes", default="1M",
+                        help="file sizes: 1M, uniform:1K-10M, lognormal:256K,1.5[,64M] or mix:1K=70,1M=25,100M=5")
+    parser.add_argument("--kind", choices=FILE_KINDS, default="sparse", help="generated file contents")
+    parser.add_argument("--no-ack", action="store_true", help="do not wait for the server acknowledgement")
+    parser.add_argument("--seed", type=int, help="seed of the size and arrival randomness")
+    parser.add_argument("--work-dir", help="where the source files go (default: system temp)")
+    parser.add_argument("--json", help="also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    result = run_load(
+        args.host, args.port, sizes=args.sizes, concurrency=args.concurrency, rate=args.rate,
+        processes=args.processes, duration=args.duration, requests=args.requests,
+        arrival=args.arrival, max_in_flight=args.max_in_flight, kind=args.kind,
+        ack=not args.no_ack, seed=args.seed, work_dir=args.work_dir,
+    )
+    format_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result.to_dict(), f, indent=2)
+    return 1 if result.errors else 0
@@ -0,0 +1,378 @@
+"""
+Loopback benchmark of ServerCore and ClientCore, without Qt.
+
+The server runs in a child process (so its CPU time and memory can be
+measured on their own) and the clients in threads of this one. Every
+combination of engine, server chunk size, file size and concurrency is one
+case. In a case, `concurrency` workers each upload `repeat` files one after
+the other.
+
+    python -m benchmarks.loopback run --sizes 1K,1M,64M,4G --concurrency 1,8 \\
+        --output bench/current
+    python -m benchmarks.loopback compare bench/baseline.json bench/current.json
+
+`run --baseline FILE` compares the fresh results right away. `compare`
+exits with status 1 when a metric regressed by more than --threshold.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import psutil
+
+from client.client_core import ClientCore
+from server.buffer_pool import DEFAULT_CHUNK_SIZE
+from server.sample_series import SampleSeries
+from .workload import FILE_KINDS, make_file, parse_list, parse_size
+
+
+DEFAULT_SIZES = "1K,1M,64M"
+DEFAULT_CHUNK_SIZES = str(DEFAULT_CHUNK_SIZE)
+DEFAULT_CONCURRENCY = "1,8"
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.10  # relative change that counts as a regression
+RSS_POLL_INTERVAL = 0.01
+
+# Result columns, in CSV order
+CASE_KEYS = ("engine", "chunk_size", "file_size", "file_kind", "concurrency")
+COLUMNS = CASE_KEYS + (
+    "transfers", "errors", "total_bytes", "wall_time", "throughput_mb_s",
+    "latency_p50_ms", "latency_p99_ms", "latency_max_ms",
+    "server_cpu_s_per_gb", "client_cpu_s_per_gb", "server_peak_rss_mb",
+)
+# metric -> True when higher is better
+METRICS = {
+    "throughput_mb_s": True,
+    "latency_p50_ms": False,
+    "latency_p99_ms": False,
+    "server_cpu_s_per_gb": False,
+    "server_peak_rss_mb": False,
+}
+
+
+def _serve(pipe, save_dir, engine, chunk_size, db_url):
+    # Child process: one ServerCore until the parent says stop
+    from db import database
+    from server.server_core import ServerCore
+
+    database.configure(db_url)
+    server = ServerCore("127.0.0.1", 0, save_dir, engine=engine, chunk_size=chunk_size)
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    while not server.is_running:
+        time.sleep(0.01)
+    pipe.send(server.server_socket.getsockname()[1])
+    pipe.recv()
+    server.stop()
+    thread.join(timeout=5)
+    pipe.send("stopped")
+
+
+class ServerProcess:
+    """ServerCore in a child process, with its CPU time and peak RSS."""
+
+    def __init__(self, save_dir, engine, chunk_size, db_url):
+        self.save_dir = save_dir
+        context = multiprocessing.get_context("spawn")
+        self._pipe, child_pipe = context.Pipe()
+        self._process = context.Process(
+            target=_serve, args=(child_pipe, save_dir, engine, chunk_size, db_url), daemon=True
+        )
+        self._process.start()
+        if not self._pipe.poll(60):
+            self._process.kill()
+            raise RuntimeError("benchmark server did not start")
+        self.port = self._pipe.recv()
+        self.psutil_process = psutil.Process(self._process.pid)
+        self.peak_rss = 0
+        self._polling = None
+
+    def cpu_time(self):
+        times = self.psutil_process.cpu_times()
+        return times.user + times.system
+
+    def watch_rss(self):
+        # polls RSS until stop_watching; returns nothing, see peak_rss
+        self.peak_rss = 0
+        self._polling = threading.Event()
+
+        def poll(stop):
+            while not stop.is_set():
+                try:
+                    self.peak_rss = max(self.peak_rss, self.psutil_process.memory_info().rss)
+                except psutil.Error:
+                    return
+                stop.wait(RSS_POLL_INTERVAL)
+
+        threading.Thread(target=poll, args=(self._polling,), daemon=True).start()
+
+    def stop_watching(self):
+        if self._polling is not None:
+            self._polling.set()
+            self._polling = None
+
+    def stop(self):
+        self.stop_watching()
+        try:
+            self._pipe.send("stop")
+            if self._pipe.poll(10):
+                self._pipe.recv()
+        finally:
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.kill()
+
+
+def run_case(server, source, concurrency, repeat, ack=True):
+    """Upload `source` concurrency * repeat times; returns the measurements."""
+    # one hard link per worker, so concurrent uploads have distinct names
+    names = []
+    for worker in range(concurrency):
+        link = os.path.join(os.path.dirname(source), f"w{worker}-{os.path.basename(source)}")
+        try:
+            os.link(source, link)
+        except OSError:
+            shutil.copyfile(source, link)
+        names.append(link)
+
+    latencies = SampleSeries(capacity=max(concurrency * repeat, 1))
+    errors = []
+    total_bytes = 0
+    lock = threading.Lock()
+
+    def worker(path):
+        nonlocal total_bytes
+        client = ClientCore("127.0.0.1", server.port)
+        for _ in range(repeat):
+            try:
+                metrics = client.send_file(path, ack=ack)
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            with lock:
+                if ack and metrics.server_status != "Success":
+                    errors.append(f"server status {metrics.server_status}")
+                latencies.append(metrics.total_wall_time)
+                total_bytes += metrics.bytes_sent
+
+    server.watch_rss()
+    server_cpu = server.cpu_time()
+    client_cpu = time.process_time()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(path,)) for path in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - start
+    server_cpu = server.cpu_time() - server_cpu
+    client_cpu = time.process_time() - client_cpu
+    server.stop_watching()
+
+    for path in names:
+        os.remove(path)
+        received = os.path.join(server.save_dir, os.path.basename(path))
+        if os.path.exists(received):
+            os.remove(received)
+
+    gigabytes = total_bytes / 1024 ** 3
+    p50, p99 = latencies.percentiles((50, 99))
+    return {
+        "transfers": concurrency * repeat,
+        "errors": len(errors),
+        "total_bytes": total_bytes,
+        "wall_time": wall_time,
+        "throughput_mb_s": total_bytes / wall_time / (1024 * 1024) if wall_time > 0 else 0.0,
+        "latency_p50_ms": p50 * 1000,
+        "latency_p99_ms": p99 * 1000,
+        "latency_max_ms": (latencies.max if latencies else 0.0) * 1000,
+        "server_cpu_s_per_gb": server_cpu / gigabytes if gigabytes else 0.0,
+        "client_cpu_s_per_gb": client_cpu / gigabytes if gigabytes else 0.0,
+        "server_peak_rss_mb": server.peak_rss / (1024 * 1024),
+        "error_samples": errors[:5],
+    }
+
+
+def run_benchmark(sizes, chunk_sizes=(DEFAULT_CHUNK_SIZE,), concurrency=(1,), engines=("threaded",),
+                  kind="sparse", repeat=DEFAULT_REPEAT, ack=True, work_dir=None, db_url=None,
+                  progress=print):
+    """Run every case; returns a list of result dicts (see COLUMNS)."""
+    root = tempfile.mkdtemp(prefix="loopback-bench-", dir=work_dir)
+    source_dir = os.path.join(root, "src")
+    save_dir = os.path.join(root, "received")
+    os.makedirs(source_dir)
+    db_url = db_url or f"sqlite:///{os.path.join(root, 'metrics.db')}"
+    results = []
+    try:
+        for engine in engines:
+            for chunk_size in chunk_sizes:
+                server = ServerProcess(save_dir, engine, chunk_size, db_url)
+                try:
+                    for size in sizes:
+                        source = make_file(os.path.join(source_dir, f"bench-{size}.bin"), size, kind)
+                        try:
+                            for level in concurrency:
+                                case = dict(zip(CASE_KEYS, (engine, chunk_size, size, kind, level)))
+                                case.update(run_case(server, source, level, repeat, ack))
+                                results.append(case)
+                                if progress is not None:
+                                    progress(_describe(case))
+                        finally:
+                            os.remove(source)
+                finally:
+                    server.stop()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def _describe(case):
+    return (
+        f"{case['engine']:8} chunk={case['chunk_size']:>8} size={case['file_size']:>11} "
+        f"x{case['concurrency']:<3} {case['throughput_mb_s']:9.1f} MB/s  "
+        f"p50 {case['latency_p50_ms']:8.2f} ms  p99 {case['latency_p99_ms']:8.2f} ms  "
+        f"cpu {case['server_cpu_s_per_gb']:6.2f} s/GB  rss {case['server_peak_rss_mb']:7.1f} MB"
+        + (f"  errors {case['errors']}" if case["errors"] else "")
+    )
+
+
+def write_results(results, prefix, meta=None):
+    """Write prefix.json (with run metadata) and prefix.csv; returns both paths."""
+    directory = os.path.dirname(prefix)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    json_path, csv_path = prefix + ".json", prefix + ".csv"
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta or run_metadata(), "results": results}, f, indent=2)
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+    return json_path, csv_path
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["results"] if isinstance(data, dict) else data
+
+
+def run_metadata():
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Per-metric changes of the cases present in both runs.
+
+    Returns a list of dicts (case keys, metric, baseline, current, change,
+    regression); `change` is relative, positive when the metric got better.
+    """
+    previous = {tuple(row[key] for key in CASE_KEYS): row for row in baseline}
+    changes = []
+    for row in current:
+        old = previous.get(tuple(row[key] for key in CASE_KEYS))
+        if old is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = old.get(metric), row.get(metric)
+            if before is None or after is None or before == 0:
+                continue
+            change = (after - before) / before
+            if not higher_is_better:
+                change = -change
+            changes.append({
+                **{key: row[key] for key in CASE_KEYS},
+                "metric": metric,
+                "baseline": before,
+                "current": after,
+                "change": change,
+                "regression": change < -threshold,
+            })
+    return changes
+
+
+def print_comparison(changes, out=sys.stdout):
+    regressions = [c for c in changes if c["regression"]]
+    for c in changes:
+        flag = "REGRESSION" if c["regression"] else ""
+        print(
+            f"{c['engine']:8} chunk={c['chunk_size']:>8} size={c['file_size']:>11} x{c['concurrency']:<3} "
+            f"{c['metric']:20} {c['baseline']:12.3f} -> {c['current']:12.3f} ({c['change']:+7.1%}) {flag}",
+            file=out,
+        )
+    print(f"{len(regressions)} regression(s) in {len(changes)} comparisons", file=out)
+    return regressions
+
+
+def _run_command(args):
+    results = run_benchmark(
+        sizes=parse_list(args.sizes, parse_size),
+        chunk_sizes=parse_list(args.chunk_sizes, parse_size),
+        concurrency=parse_list(args.concurrency),
+        engines=parse_list(args.engines, str.strip),
+        kind=args.kind,
+        repeat=args.repeat,
+        ack=not args.no_ack,
+        work_dir=args.work_dir,
+        db_url=args.db_url,
+    )
+    json_path, csv_path = write_results(results, args.output)
+    print(f"results written to {json_path} and {csv_path}")
+    if args.baseline:
+        if print_comparison(compare(load_results(args.baseline), results, args.threshold)):
+            return 1
+    return 0
+
+
+def _compare_command(args):
+    changes = compare(load_results(args.baseline), load_results(args.current), args.threshold)
+    return 1 if print_comparison(changes) else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loopback", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmark sweep")
+    run.add_argument("--sizes", default=DEFAULT_SIZES, help="file sizes, e.g. 1K,1M,64M,4G")
+    run.add_argument("--chunk-sizes", default=DEFAULT_CHUNK_SIZES, help="server receive chunk sizes (64K-4M)")
+    run.add_argument("--concurrency", default=DEFAULT_CONCURRENCY, help="simultaneous uploads, e.g. 1,8,32")
+    run.add_argument("--engines", default="threaded", help="server engines: threaded,asyncio")
+    run.add_argument("--kind", choices=FILE_KINDS, default="sparse", help="generated file contents")
+    run.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="uploads per worker and case")
+    run.add_argument("--no-ack", action="store_true", help="do not wait for the server acknowledgement")
+    run.add_argument("--work-dir", help="where source and received files go (default: system temp)")
+    run.add_argument("--db-url", help="metrics database of the server (default: throwaway SQLite)")
+    run.add_argument("--output", default="benchmark_results", help="path prefix of the .json/.csv results")
+    run.add_argument("--baseline", help="results JSON to compare against")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="relative regression threshold")
+    run.set_defaults(handler=_run_command)
+
+    check = commands.add_parser("compare", help="compare two result files")
+    check.add_argument("baseline")
+    check.add_argument("current")
+    check.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="relative regression threshold")
+    check.set_defaults(handler=_compare_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Workload pieces shared by the loopback benchmark and the load generator:
+size parsing, generated source files, file-size distributions and a
+mergeable latency histogram.
+"""
+
+import bisect
+import math
+import os
+import random
+
+
+FILE_KINDS = ("sparse", "random")
+
+
+_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+_RANDOM_BLOCK = 1024 * 1024
+
+
+def parse_size(text):
+    """'64K', '1M', '4G' or a plain byte count -> bytes."""
+    text = text.strip().upper()
+    if text.endswith("B"):
+        text = text[:-1]  # "64KB"
+    unit = text[-1:] if text[-1:] in _UNITS else ""
+    number = text[:len(text) - len(unit)]
+    try:
+        return int(float(number) * _UNITS[unit])
+    except ValueError:
+        raise ValueError(f"invalid size {text!r}") from None
+
+
+def parse_list(text, convert=int):
+    return [convert(item) for item in text.split(",") if item.strip()]
+
+
+def make_file(path, size, kind="sparse"):
+    """Create a benchmark source file of `size` bytes.
+
+    "sparse" files are holes (zeros) and cost no disk space or time even at
+    several GB. "random" files repeat one random 1 MiB block, which is
+    enough to defeat compression.
+    """
+    with open(path, "wb") as f:
+        if kind == "sparse":
+            f.truncate(size)
+        elif kind == "random":
+            block = os.urandom(min(size, _RANDOM_BLOCK))
+            remaining = size
+            while remaining > 0:
+                remaining -= f.write(block[:remaining])
+        else:
+            raise ValueError(f"Unknown file kind {kind!r}, expected one of {FILE_KINDS}")
+    return path
+
+
+class SizeDistribution:
+    """File sizes to upload, parsed from a spec:
+
+        1M                        every file 1 MiB
+        uniform:1K-10M            uniform between the bounds
+        lognormal:256K,1.5[,64M]  median, sigma and an upper cap
+                                  (default median * e^(3 sigma))
+        mix:1K=70,1M=25,100M=5    weighted choice of fixed sizes
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        kind, _, args = spec.partition(":")
+        if not args:
+            kind, args = "fixed", spec
+        self.kind = kind.strip().lower()
+        if self.kind == "fixed":
+            self.sizes = [parse_size(args)]
+            self.max_size = self.sizes[0]
+        elif self.kind == "uniform":
+            low, _, high = args.partition("-")
+            self.low, self.high = parse_size(low), parse_size(high)
+            if self.low > self.high:
+                raise ValueError(f"empty size range in {spec!r}")
+            self.max_size = self.high
+        elif self.kind == "lognormal":
+            parts = args.split(",")
+            if len(parts) not in (2, 3):
+                raise ValueError(f"lognormal needs MEDIAN,SIGMA[,MAX], got {spec!r}")
+            self.median, self.sigma = parse_size(parts[0]), float(parts[1])
+            self.max_size = (
+                parse_size(parts[2]) if len(parts) == 3
+                else int(self.median * math.exp(3 * self.sigma))
+            )
+        elif self.kind == "mix":
+            self.sizes, self.weights = [], []
+            for item in args.split(","):
+                size, _, weight = item.partition("=")
+                self.sizes.append(parse_size(size))
+                self.weights.append(float(weight or 1))
+            if min(self.weights) < 0 or not sum(self.weights):
+                raise ValueError(f"mix weights must be positive in {spec!r}")
+            self.max_size = max(self.sizes)
+        else:
+            raise ValueError(f"Unknown size distribution {spec!r}")
+
+    def sample(self, rng=random) -> int:
+        if self.kind == "fixed":
+            return self.sizes[0]
+        if self.kind == "uniform":
+            return rng.randint(self.low, self.high)
+        if self.kind == "lognormal":
+            size = int(rng.lognormvariate(math.log(max(self.median, 1)), self.sigma))
+            return min(max(size, 1), self.max_size)
+        return rng.choices(self.sizes, self.weights)[0]
+
+
+def _latency_bounds():
+    # 1-2-5 steps from 0.1 ms to 1000 s
+    bounds = []
+    decade = 1e-4
+    while decade < 1e3:
+        bounds.extend((decade, 2 * decade, 5 * decade))
+        decade *= 10
+    bounds.append(1e3)
+    return bounds
+
+
+class LatencyHistogram:
+    """Fixed log-scale buckets of latencies in seconds.
+
+    Constant memory whatever the request count, and histograms from several
+    processes merge by adding counts. Percentiles are bucket upper bounds,
+    i.e. accurate to the 1-2-5 step.
+    """
+
+    BOUNDS = _latency_bounds()
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)  # last bucket: above 1000 s
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, latency: float) -> None:
+        self.counts[bisect.bisect_left(self.BOUNDS, latency)] += 1
+        self.count += 1
+        self.total += latency
+        self.min = min(self.min, latency)
+        self.max = max(self.max, latency)
+
+    def merge(self, other) -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * q / 100) or 1
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                bound = self.BOUNDS[index] if index < len(self.BOUNDS) else self.max
+                return min(max(bound, self.min), self.max)
+        return self.max
+
+    def buckets(self):
+        """(upper bound in seconds, count) of the non-empty buckets."""
+        return [
+            (self.BOUNDS[i] if i < len(self.BOUNDS) else math.inf, count)
+            for i, count in enumerate(self.counts) if count
+        ]
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            **{f"p{q:g}": self.percentile(q) for q in (50, 90, 99, 99.9)},
+            "buckets": [[bound if bound != math.inf else None, count] for bound, count in self.buckets()],
+        }
@@ -1,26 +1,100 @@
+from PyQt5.QtCore import QObject, pyqtSignal
 from PyQt5.QtWidgets import QFileDialog
 from client.client_view import ClientWindow
 from client.client_core import ClientCore
+from client.client_model import ClientModel
+from client.transfer_manager import DEFAULT_MAX_WORKERS, DONE, TransferManager
 
-class ClientController:
-    def __init__(self, window: ClientWindow, client_core: ClientCore):
+
+class ClientController(QObject):
+    # emitted from worker threads; Qt queues them to the GUI thread
+    progress_signal = pyqtSignal(dict)  # TransferJob.progress()
+    finished_signal = pyqtSignal(dict)  # TransferJob.progress() of an ended job
+
+    def __init__(self, window: ClientWindow, client_core: ClientCore, model: ClientModel = None,
+                 max_workers=DEFAULT_MAX_WORKERS):
+        super().__init__()
         self.window = window
         self.client_core = client_core
-        self.selected_path = None
+        self.model = model or ClientModel()
+        self.selected_paths = []
+
+        self.transfers = TransferManager(client_core, max_workers)
+        self.transfers.on_progress = self.progress_signal.emit
+        self.transfers.on_finished = self.finished_signal.emit
+        self.progress_signal.connect(self.update_progress)
+        self.finished_signal.connect(self.transfer_finished)
 
-        self.window.select_button.clicked.connect(self.select_file_or_directory)
+        self.window.select_files_action.triggered.connect(self.select_files)
+        self.window.select_directory_action.triggered.connect(self.select_directory)
         self.window.send_button.clicked.connect(self.send_to_server)
+        self.window.cancel_button.clicked.connect(self.cancel_selected)
 
-    def select_file_or_directory(self):
-        path, _ = QFileDialog.getOpenFileName(self.window, "Select File")
+    def select_files(self):
+        paths, _ = QFileDialog.getOpenFileNames(self.window, "Select Files")
+        if paths:
+            self._select(paths, f"Selected: {paths[0]}" if len(paths) == 1 else f"Selected: {len(paths)} files")
+
+    def select_directory(self):
+        # queued as one job, sent by ClientCore.send_directory
+        path = QFileDialog.getExistingDirectory(self.window, "Select Directory")
         if path:
-            self.selected_path = path
-            self.window.status_label.setText(f"Selected: {path}")
-            self.window.send_button.setEnabled(True)
+            self._select([path], f"Selected directory: {path}")
+
+    def _select(self, paths, status):
+        self.selected_paths = paths
+        self.model.set_selected_path(paths[0])
+        self.window.status_label.setText(status)
+        self.window.send_button.setEnabled(True)
 
     def send_to_server(self):
-        if self.selected_path:
-            self.window.status_label.setText("Sending...")
-            # Call client_core to send file
-            self.client_core.send_file(self.selected_path)
-            self.window.status_label.setText("Sent!")
+        # only queues the files; the GUI thread never waits on the network
+        for path in self.selected_paths:
+            job_id = self.transfers.submit(path)
+            job = self.transfers.jobs[job_id]
+            self.window.add_transfer_row(job.progress())
+            self._log(f"Queued {path}")
+        self.selected_paths = []
+        self.window.send_button.setEnabled(False)
+        self._update_status()
+
+    def cancel_selected(self):
+        for job_id in self.window.selected_job_ids():
+            if self.transfers.cancel(job_id):
+                self._log(f"Cancelling transfer {job_id}")
+
+    def update_progress(self, progress: dict):
+        self.model.add_metric(progress["job_id"], progress)
+        self.window.update_transfer_row(progress)
+
+    def transfer_finished(self, progress: dict):
+        self.update_progress(progress)
+        if progress["state"] == DONE:
+            self._log(
+                f"Sent {progress['file_name']}: {progress['bytes_sent']} bytes in "
+                f"{progress['elapsed']:.2f} s ({progress['rate']:.2f} MB/s)"
+            )
+            metrics = progress["metrics"]
+            if metrics and metrics["acknowledged"]:
+                self._log(
+                    f"  server: {metrics['server_status']}, total {metrics['total_wall_time']:.3f} s = "
+                    f"network {metrics['network_time']:.3f} s + server {metrics['server_time']:.3f} s "
+                    f"(receive {metrics['server_receive_time']:.3f} s, disk {metrics['server_disk_time']:.3f} s, "
+                    f"commit {metrics['server_commit_time']:.3f} s)"
+                )
+        else:
+            error = f" ({progress['error']})" if progress["error"] else ""
+            self._log(f"Transfer of {progress['file_name']} {progress['state']}{error}")
+        self._update_status()
+
+    def shutdown(self):
+        # cancels what is left and waits for the workers to let go
+        self.transfers.shutdown(wait=True)
+
+    def _update_status(self):
+        active = len(self.transfers.active())
+        self.window.status_label.setText(f"Sending {active} file(s)..." if active else "Status: Idle")
+
+    def _log(self, message):
+        self.model.add_log(message)
+        self.window.log_box.append(message)
@@ -1,17 +1,81 @@
+import errno
+import hashlib
+import io
+import os
 import socket
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from client.client_model import ClientTransferMetrics
+from common.checksum import StreamingChecksum
+from common.compression import (
+    BLOCK_HEADER,
+    CODEC_IDS,
+    END_OF_BLOCKS,
+    compress_blocks,
+    make_compressor,
+)
+from common.protocol import (
+    ACK_FRAME,
+    ACK_STATUS_NAMES,
+    ACK_STORED_FILE,
+    ACK_STORED_METRICS,
+    DEDUP_PARAMS,
+    EXT_CHECKSUM,
+    EXT_COMPRESSION,
+    EXT_DEDUP,
+    EXT_FILE_ID,
+    EXT_RANGE,
+    EXT_TRANSFER_ID,
+    FLAG_ACK,
+    FLAG_DEDUP,
+    FLAG_RANGE,
+    FLAG_RESUMABLE,
+    FLAG_SESSION,
+    RESUME_REPLY,
+    FileHeader,
+    ProtocolError,
+    dedup_chunk_count,
+    pack_range,
+)
+
+
+# Files up to this size are sent in one sendall together with the header
+SMALL_SEND_SIZE = 64 * 1024
+# Read buffer of the copy loop used when sendfile is unavailable
+SEND_BUFFER_SIZE = 1024 * 1024
+# Directory uploads read files up to this size ahead of the socket ...
+PREFETCH_MAX_SIZE = 1024 * 1024
+# ... and coalesce their frames into sends of about this size
+SESSION_BATCH_SIZE = 256 * 1024
+# Fixed chunk size of deduplicated uploads
+DEFAULT_DEDUP_CHUNK_SIZE = 1024 * 1024
+# Smallest byte range worth its own connection in send_file_parallel
+MIN_STREAM_RANGE_SIZE = 1024 * 1024
+# Linux caps a single sendfile call at 0x7ffff000 bytes
+MAX_SENDFILE_COUNT = 0x7FFFF000
+_SENDFILE_UNSUPPORTED = {
+    errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK, errno.EOPNOTSUPP,
+}
+
 
 class ClientCore:
     def __init__(self, host = None, port = 5000):
         self.host = host or socket.gethostname() 
-        self.port = 5000
+        self.port = port
         self.client_socket = None
         self.is_running = False
 
     def connect(self):
-        self.client_socket = socket.socket()
-        self.client_socket.connect((self.host, self.port))
+        self.client_socket = self._open_socket()
         print("I m connecting to the server")
 
+    def _open_socket(self):
+        sock = socket.socket()
+        sock.connect((self.host, self.port))
+        return sock
+
     def chat(self):
         self.connect()
         message = input(" -> ")
@@ -29,19 +93,466 @@ class ClientCore:
 
         self.client_socket.close()
 
-    def send_file(self, file_path):
-        import os
-        self.connect()
+    def send_file(self, file_path, offset=0, length=None, use_sendfile=True,
+                  compression=None, checksum=None, on_sent=None, ack=False):
+        # offset/length select a byte range of the file; the header announces
+        # the number of file bytes that follow. `compression` is an optional
+        # CompressionPolicy deciding whether the payload is compressed.
+        # `checksum` names an algorithm from common.checksum; its digest of
+        # the sent bytes follows the payload as a trailer. The bytes are then
+        # hashed as they pass through the send buffer instead of sendfile.
+        # `on_sent(n)` is called as file bytes go out; an exception raised
+        # from it aborts the transfer. With `ack` the server confirms the
+        # stored file with its timings, after an fsync and the commit of its
+        # metrics row (up to 5 s), so it is off unless asked for. Returns
+        # ClientTransferMetrics.
+        start = time.perf_counter()
+        first_byte = None
+        bytes_sent = 0
+
+        def sent(n):
+            nonlocal first_byte, bytes_sent
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            bytes_sent += n
+            if on_sent is not None:
+                on_sent(n)
+
         file_name = os.path.basename(file_path)
         file_size = os.path.getsize(file_path)
         file_type = os.path.splitext(file_path)[1].lower()
-        # Send metadata header: <file_name>|<file_size>|<file_type>\n
-        header = f"{file_name}|{file_size}|{file_type}\n"
-        self.client_socket.sendall(header.encode())
+        if offset < 0 or offset > file_size:
+            raise ValueError(f"offset {offset} outside of {file_path} ({file_size} bytes)")
+        count = file_size - offset if length is None else min(length, file_size - offset)
         with open(file_path, 'rb') as f:
-            while True:
-                bytes_read = f.read(4096)
-                if not bytes_read:
-                    break
-                self.client_socket.sendall(bytes_read)
-        self.client_socket.close()
+            codec = self._choose_codec(compression, f, offset, count, file_type)
+            digest = StreamingChecksum(checksum) if checksum else None
+            header = FileHeader(
+                file_name, count, file_type, flags=FLAG_ACK if ack else 0,
+                extensions=_payload_extensions(codec, digest),
+            ).encode()
+            # a socket per call, so one ClientCore can send from many threads
+            sock = self._open_socket()
+            connected = time.perf_counter()
+            acknowledgement = None
+            try:
+                if codec:
+                    self._send_compressed(
+                        sock, f, offset, count, codec, compression.level,
+                        prefix=header, checksum=digest, on_sent=sent,
+                    )
+                elif count <= SMALL_SEND_SIZE or not use_sendfile:
+                    # the header goes out together with the first chunk so
+                    # small files leave in a single send
+                    f.seek(offset)
+                    first = f.read(min(count, SMALL_SEND_SIZE))
+                    if digest is not None:
+                        digest.update(first)
+                    sock.sendall(header + first)
+                    sent(len(first))
+                    self._send_range(
+                        sock, f, offset + len(first), count - len(first),
+                        use_sendfile, checksum=digest, on_sent=sent,
+                    )
+                else:
+                    sock.sendall(header)
+                    self._send_range(
+                        sock, f, offset, count, use_sendfile, checksum=digest, on_sent=sent
+                    )
+                if digest is not None:
+                    sock.sendall(digest.digest())
+                last_byte = time.perf_counter()
+                if ack:
+                    acknowledgement = _receive_ack(sock)
+            finally:
+                sock.close()
+
+        end = time.perf_counter()
+        first_byte = first_byte or last_byte
+        return ClientTransferMetrics(
+            file_name=file_name,
+            file_size=count,
+            file_type=file_type,
+            bytes_sent=bytes_sent,
+            connect_time=connected - start,
+            time_to_first_byte=first_byte - start,
+            send_time=last_byte - first_byte,
+            total_wall_time=end - start,
+            ack_wait_time=end - last_byte if ack else None,
+            ack=acknowledgement,
+        )
+
+    def _choose_codec(self, compression, f, offset, count, file_type):
+        if compression is None:
+            return None
+        sample = None
+        if compression.probe:
+            f.seek(offset)
+            sample = f.read(min(count, compression.probe_size))
+        return compression.choose(file_type, sample)
+
+    def _send_compressed(self, sock, f, offset, count, codec, level=None, prefix=b"", checksum=None,
+                         on_sent=None):
+        # Stream the range through the compressor as framed blocks; returns
+        # the number of file bytes read
+        compressor = make_compressor(codec, level)
+        pending = bytearray(prefix)
+        total = count
+        f.seek(offset)
+        while count > 0:
+            chunk = f.read(min(SEND_BUFFER_SIZE, count))
+            if not chunk:
+                break  # file shrank while sending
+            count -= len(chunk)
+            if checksum is not None:
+                checksum.update(chunk)
+            out = compressor.compress(chunk)
+            if out:
+                pending += BLOCK_HEADER.pack(len(out))
+                pending += out
+                sock.sendall(pending)
+                pending.clear()
+            if on_sent is not None:
+                on_sent(len(chunk))
+        out = compressor.flush()
+        if out:
+            pending += BLOCK_HEADER.pack(len(out))
+            pending += out
+        pending += END_OF_BLOCKS
+        sock.sendall(pending)
+        return total - count
+
+    def send_file_parallel(self, file_path, streams=4, use_sendfile=True):
+        # Split the file into `streams` byte ranges sent over as many
+        # connections; the server reassembles them into one file
+        file_name = os.path.basename(file_path)
+        file_size = os.path.getsize(file_path)
+        file_type = os.path.splitext(file_path)[1].lower()
+        streams = max(1, min(streams, -(-file_size // MIN_STREAM_RANGE_SIZE), 0xFFFF))
+        transfer_id = uuid.uuid4().bytes
+        range_size = -(-file_size // streams)
+
+        def send_stream(index):
+            offset = min(index * range_size, file_size)
+            length = min(range_size, file_size - offset)
+            header = FileHeader(
+                file_name, length, file_type,
+                flags=FLAG_RANGE,
+                extensions={
+                    EXT_TRANSFER_ID: transfer_id,
+                    EXT_RANGE: pack_range(offset, file_size, index, streams),
+                },
+            ).encode()
+            sock = self._open_socket()
+            try:
+                with open(file_path, 'rb') as f:
+                    sock.sendall(header)
+                    self._send_range(sock, f, offset, length, use_sendfile)
+            finally:
+                sock.close()
+
+        with ThreadPoolExecutor(max_workers=streams) as pool:
+            futures = [pool.submit(send_stream, index) for index in range(streams)]
+            for future in futures:
+                future.result()
+
+    def send_file_resumable(self, file_path, retries=3, retry_delay=1.0, use_sendfile=True):
+        # The server answers the header with how many bytes it already holds
+        # durably; after a dropped connection only the remainder is resent.
+        # Returns the offset the last attempt resumed from.
+        attempt = 0
+        while True:
+            try:
+                return self._send_resumable_once(file_path, use_sendfile)
+            except OSError as e:
+                attempt += 1
+                if attempt > retries:
+                    raise
+                print(f"Transfer of {file_path} interrupted ({e}), retrying")
+                time.sleep(retry_delay)
+
+    def _send_resumable_once(self, file_path, use_sendfile):
+        file_name = os.path.basename(file_path)
+        file_size = os.path.getsize(file_path)
+        file_type = os.path.splitext(file_path)[1].lower()
+        header = FileHeader(
+            file_name, file_size, file_type,
+            flags=FLAG_RESUMABLE,
+            extensions={EXT_FILE_ID: file_identity(file_path)},
+        ).encode()
+
+        sock = self._open_socket()
+        try:
+            sock.sendall(header)
+            (offset,) = RESUME_REPLY.unpack(_recv_exact(sock, RESUME_REPLY.size))
+            if offset > file_size:
+                raise ProtocolError(f"server resume offset {offset} past end of file")
+            with open(file_path, 'rb') as f:
+                self._send_range(sock, f, offset, file_size - offset, use_sendfile)
+            return offset
+        finally:
+            sock.close()
+
+    def send_directory(self, dir_path, in_flight=8, use_sendfile=True, compression=None, checksum=None,
+                       on_sent=None):
+        # Upload every file below dir_path over one session connection.
+        # Files are walked lazily and up to `in_flight` of them are read (and
+        # compressed) ahead while earlier ones are on the wire. `on_sent(n)`
+        # works as in send_file; read-ahead files count once they are
+        # queued for the socket. Returns the file count.
+        files = self._read_ahead(iter_files(dir_path), in_flight, compression, checksum)
+        sent = 0
+        batch = bytearray()
+        sock = self._open_socket()
+        try:
+            for path, name, file_type, size, payload, codec in files:
+                digest = StreamingChecksum(checksum) if checksum else None
+                header = FileHeader(
+                    name, size, file_type,
+                    flags=FLAG_SESSION, extensions=_payload_extensions(codec, digest),
+                ).encode()
+                batch += header
+                if payload is not None:
+                    batch += payload
+                    if len(batch) >= SESSION_BATCH_SIZE:
+                        sock.sendall(batch)
+                        batch.clear()
+                    if on_sent is not None:
+                        on_sent(size)
+                    sent += 1
+                    continue
+
+                with open(path, 'rb') as f:
+                    if codec:
+                        done = self._send_compressed(
+                            sock, f, 0, size, codec, compression.level,
+                            prefix=bytes(batch), checksum=digest, on_sent=on_sent,
+                        )
+                    else:
+                        sock.sendall(batch)
+                        done = self._send_range(
+                            sock, f, 0, size, use_sendfile, checksum=digest, on_sent=on_sent
+                        )
+                batch.clear()
+                if done != size:
+                    raise ProtocolError(f"{path} changed size while sending")
+                if digest is not None:
+                    batch += digest.digest()
+                sent += 1
+            if batch:
+                sock.sendall(batch)
+        finally:
+            files.close()
+            sock.close()
+        return sent
+
+    def _read_ahead(self, files, in_flight, compression=None, checksum=None):
+        with ThreadPoolExecutor(max_workers=max(1, in_flight)) as pool:
+            pending = deque()
+            for path, name in files:
+                pending.append(pool.submit(_load_session_file, path, name, compression, checksum))
+                if len(pending) >= in_flight:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def send_file_dedup(self, file_path, chunk_size=DEFAULT_DEDUP_CHUNK_SIZE, use_sendfile=True):
+        # Send the chunk manifest, then only the chunks the server does not
+        # already store. Returns the number of payload bytes actually sent.
+        file_name = os.path.basename(file_path)
+        file_size = os.path.getsize(file_path)
+        file_type = os.path.splitext(file_path)[1].lower()
+        digests = chunk_digests(file_path, chunk_size)
+        if len(digests) != dedup_chunk_count(file_size, chunk_size):
+            raise ProtocolError(f"{file_path} changed size while hashing")
+        header = FileHeader(
+            file_name, file_size, file_type,
+            flags=FLAG_DEDUP,
+            extensions={EXT_DEDUP: DEDUP_PARAMS.pack(chunk_size)},
+        ).encode()
+
+        sock = self._open_socket()
+        try:
+            sock.sendall(header + b"".join(digests))
+            needed = _recv_exact(sock, -(-len(digests) // 8))
+
+            # adjacent missing chunks go out as one range
+            ranges = []
+            for i in range(len(digests)):
+                if needed[i // 8] & (0x80 >> (i % 8)):
+                    offset = i * chunk_size
+                    length = min(chunk_size, file_size - offset)
+                    if ranges and ranges[-1][0] + ranges[-1][1] == offset:
+                        ranges[-1][1] += length
+                    else:
+                        ranges.append([offset, length])
+
+            sent = 0
+            with open(file_path, 'rb') as f:
+                for offset, length in ranges:
+                    if self._send_range(sock, f, offset, length, use_sendfile) != length:
+                        raise ProtocolError(f"{file_path} changed size while sending")
+                    sent += length
+            return sent
+        finally:
+            sock.close()
+
+    def _send_range(self, sock, f, offset, count, use_sendfile=True, checksum=None, on_sent=None):
+        # Returns the number of bytes sent; less than count if the file shrank.
+        # With a checksum the bytes must pass through Python, so no sendfile.
+        total = count
+        if count <= 0:
+            return 0
+        if use_sendfile and checksum is None:
+            sent = self._sendfile(sock, f, offset, count, on_sent)
+            offset += sent
+            count -= sent
+            if count <= 0:
+                return total
+
+        # Fallback: copy through one large reusable buffer
+        buf = bytearray(min(SEND_BUFFER_SIZE, count))
+        view = memoryview(buf)
+        f.seek(offset)
+        while count > 0:
+            n = f.readinto(view[:min(len(view), count)])
+            if not n:
+                break  # file shrank while sending
+            if checksum is not None:
+                checksum.update(view[:n])
+            sock.sendall(view[:n])
+            count -= n
+            if on_sent is not None:
+                on_sent(n)
+        return total - count
+
+    def _sendfile(self, sock, f, offset, count, on_sent=None):
+        """Send with os.sendfile; returns the bytes sent (0 if unsupported)."""
+        if not hasattr(os, "sendfile"):
+            return 0
+        try:
+            sock_fd = sock.fileno()
+            file_fd = f.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return 0
+
+        # progress reports need the kernel copy split into smaller calls
+        step = MAX_SENDFILE_COUNT if on_sent is None else SEND_BUFFER_SIZE
+        total = 0
+        while count > 0:
+            try:
+                sent = os.sendfile(sock_fd, file_fd, offset, min(count, step))
+            except OSError as e:
+                if total == 0 and e.errno in _SENDFILE_UNSUPPORTED:
+                    return 0
+                raise
+            if sent == 0:
+                break  # end of file
+            total += sent
+            offset += sent
+            count -= sent
+            if on_sent is not None:
+                on_sent(sent)
+        return total
+
+
+def file_identity(file_path):
+    """Stable id of a file's current contents: name, size and mtime."""
+    stat = os.stat(file_path)
+    key = f"{os.path.basename(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+def iter_files(root):
+    """Yield (path, name) for every regular file below root.
+
+    `name` is the path relative to root with "/" separators.
+    """
+    pending_dirs = [root]
+    while pending_dirs:
+        current = pending_dirs.pop()
+        with os.scandir(current) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.is_dir(follow_symlinks=False):
+                    pending_dirs.append(entry.path)
+                elif entry.is_file():
+                    name = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                    yield entry.path, name
+
+
+def chunk_digests(file_path, chunk_size=DEFAULT_DEDUP_CHUNK_SIZE):
+    """SHA-256 of every fixed-size chunk of the file, in order."""
+    digests = []
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(file_path, 'rb') as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            digests.append(hashlib.sha256(view[:n]).digest())
+    return digests
+
+
+def _load_session_file(path, name, compression=None, checksum=None):
+    # Runs on a read-ahead thread: small files are read (compressed and
+    # hashed) into their wire payload here; large ones only get a codec
+    # decision
+    file_type = os.path.splitext(path)[1].lower()
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        if size > PREFETCH_MAX_SIZE:
+            codec = None
+            if compression is not None:
+                sample = f.read(compression.probe_size) if compression.probe else None
+                codec = compression.choose(file_type, sample)
+            return path, name, file_type, size, None, codec
+        data = f.read()
+
+    codec = compression.choose(file_type, data[:compression.probe_size]) if compression else None
+    payload = compress_blocks(data, codec, compression.level) if codec else data
+    if checksum:
+        digest = StreamingChecksum(checksum)
+        digest.update(data)
+        payload += digest.digest()
+    return path, name, file_type, len(data), payload, codec
+
+
+def _payload_extensions(codec, checksum):
+    extensions = {}
+    if codec:
+        extensions[EXT_COMPRESSION] = bytes([CODEC_IDS[codec]])
+    if checksum is not None:
+        extensions[EXT_CHECKSUM] = bytes([checksum.algorithm_id])
+    return extensions
+
+
+def _receive_ack(sock):
+    # End our side so a server reading to EOF finishes, then wait for the
+    # acknowledgement; a server without FLAG_ACK support just closes
+    try:
+        sock.shutdown(socket.SHUT_WR)
+        data = _recv_exact(sock, ACK_FRAME.size)
+    except (ConnectionError, OSError):
+        return None
+    status, stored, bytes_received, receive_time, disk_time, commit_time, server_time = ACK_FRAME.unpack(data)
+    return {
+        "status": ACK_STATUS_NAMES.get(status, f"unknown ({status})"),
+        "bytes_received": bytes_received,
+        "file_synced": bool(stored & ACK_STORED_FILE),
+        "metrics_committed": bool(stored & ACK_STORED_METRICS),
+        "receive_time": receive_time,
+        "disk_time": disk_time,
+        "commit_time": commit_time,
+        "server_time": server_time,
+    }
+
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("server closed the connection")
+        data += chunk
+    return data
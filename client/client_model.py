@@ -1,3 +1,6 @@
+from typing import Optional
+
+
 class ClientModel:
     def __init__(self):
         self.selected_path = None
@@ -12,3 +15,107 @@ class ClientModel:
 
     def add_log(self, message):
         self.logs.append(message)
+
+
+class ClientTransferMetrics:
+    """The client's view of one upload, plus the server's acknowledgement.
+
+    Mirrors server_model.FileTransferMetrics: times are in seconds, rates in
+    MB/s. The server_* fields stay None when the server sent no
+    acknowledgement (an older server, or the connection dropped).
+    """
+
+    __slots__ = (
+        "file_name", "file_size", "file_type", "bytes_sent", "connect_time",
+        "time_to_first_byte", "send_time", "ack_wait_time", "total_wall_time",
+        "server_status", "server_bytes_received", "server_file_synced",
+        "server_metrics_committed", "server_receive_time", "server_disk_time",
+        "server_commit_time", "server_time",
+    )
+
+    def __init__(
+        self,
+        file_name: str,
+        file_size: int,
+        file_type: str,
+        bytes_sent: int,
+        connect_time: float,
+        time_to_first_byte: float,
+        send_time: float,
+        total_wall_time: float,
+        ack_wait_time: Optional[float] = None,
+        ack: Optional[dict] = None,
+    ):
+        self.file_name = file_name
+        self.file_size = file_size
+        self.file_type = file_type
+        self.bytes_sent = bytes_sent
+        # start -> connected
+        self.connect_time = connect_time
+        # start -> first payload bytes accepted by the socket
+        self.time_to_first_byte = time_to_first_byte
+        # first -> last payload byte
+        self.send_time = send_time
+        # last payload byte -> acknowledgement received
+        self.ack_wait_time = ack_wait_time
+        # start -> acknowledgement (or close without one)
+        self.total_wall_time = total_wall_time
+        ack = ack or {}
+        self.server_status = ack.get("status")
+        self.server_bytes_received = ack.get("bytes_received")
+        self.server_file_synced = ack.get("file_synced")
+        self.server_metrics_committed = ack.get("metrics_committed")
+        self.server_receive_time = ack.get("receive_time")
+        self.server_disk_time = ack.get("disk_time")
+        self.server_commit_time = ack.get("commit_time")
+        self.server_time = ack.get("server_time")
+
+    @property
+    def acknowledged(self):
+        return self.server_status is not None
+
+    @property
+    def send_rate(self):
+        if self.send_time > 0:
+            return self.bytes_sent / self.send_time / (1024 * 1024)
+        return 0.0
+
+    @property
+    def end_to_end_throughput(self):
+        # file bytes over the whole connect-to-commit time
+        if self.total_wall_time > 0:
+            return self.bytes_sent / self.total_wall_time / (1024 * 1024)
+        return 0.0
+
+    @property
+    def network_time(self):
+        # client wall time the server does not account for: connection
+        # setup, propagation and buffering in both socket stacks
+        if self.server_time is None:
+            return None
+        return max(self.total_wall_time - self.server_time, 0.0)
+
+    def to_dict(self):
+        return {
+            "file_name": self.file_name,
+            "file_size": self.file_size,
+            "file_type": self.file_type,
+            "bytes_sent": self.bytes_sent,
+            "connect_time": self.connect_time,
+            "time_to_first_byte": self.time_to_first_byte,
+            "send_time": self.send_time,
+            "send_rate": self.send_rate,
+            "ack_wait_time": self.ack_wait_time,
+            "total_wall_time": self.total_wall_time,
+            "end_to_end_throughput": self.end_to_end_throughput,
+            "acknowledged": self.acknowledged,
+            "server_status": self.server_status,
+            "server_bytes_received": self.server_bytes_received,
+            "server_file_synced": self.server_file_synced,
+            "server_metrics_committed": self.server_metrics_committed,
+            "server_receive_time": self.server_receive_time,
+            "server_disk_time": self.server_disk_time,
+            "server_commit_time": self.server_commit_time,
+            "server_time": self.server_time,
+            "network_time": self.network_time,
+        }
@@ -1,4 +1,20 @@
-from PyQt5.QtWidgets import QMainWindow, QPushButton, QLabel, QTextEdit, QFileDialog, QVBoxLayout, QWidget
+from PyQt5.QtWidgets import (
+    QMainWindow,
+    QPushButton,
+    QLabel,
+    QMenu,
+    QTextEdit,
+    QFileDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QWidget,
+    QTableWidget,
+    QTableWidgetItem,
+    QAbstractItemView,
+)
+
+TRANSFER_COLUMNS = ("#", "File", "Sent", "Rate (MB/s)", "ETA", "Status")
+
 
 class ClientWindow(QMainWindow):
     def __init__(self):
@@ -7,18 +23,66 @@ class ClientWindow(QMainWindow):
         self.setGeometry(200, 200, 900, 600)
 
         self.select_button = QPushButton("Select File/Directory")
+        select_menu = QMenu(self.select_button)
+        self.select_files_action = select_menu.addAction("Files...")
+        self.select_directory_action = select_menu.addAction("Directory...")
+        self.select_button.setMenu(select_menu)
         self.send_button = QPushButton("Send to Server")
         self.send_button.setEnabled(False)
+        self.cancel_button = QPushButton("Cancel Selected")
         self.status_label = QLabel("Status: Idle")
+
+        self.transfers_table = QTableWidget(0, len(TRANSFER_COLUMNS))
+        self.transfers_table.setHorizontalHeaderLabels(TRANSFER_COLUMNS)
+        self.transfers_table.verticalHeader().setVisible(False)
+        self.transfers_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.transfers_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.transfer_rows = {}  # job_id -> row
+
         self.log_box = QTextEdit()
         self.log_box.setReadOnly(True)
 
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.select_button)
+        buttons.addWidget(self.send_button)
+        buttons.addWidget(self.cancel_button)
+
         layout = QVBoxLayout()
-        layout.addWidget(self.select_button)
-        layout.addWidget(self.send_button)
+        layout.addLayout(buttons)
         layout.addWidget(self.status_label)
+        layout.addWidget(self.transfers_table)
         layout.addWidget(self.log_box)
 
         container = QWidget()
         container.setLayout(layout)
         self.setCentralWidget(container)
+
+    def add_transfer_row(self, progress: dict):
+        row = self.transfers_table.rowCount()
+        self.transfers_table.insertRow(row)
+        for column in range(len(TRANSFER_COLUMNS)):
+            self.transfers_table.setItem(row, column, QTableWidgetItem())
+        self.transfer_rows[progress["job_id"]] = row
+        self.update_transfer_row(progress)
+
+    def update_transfer_row(self, progress: dict):
+        row = self.transfer_rows.get(progress["job_id"])
+        if row is None:
+            return
+        eta = progress["eta"]
+        cells = (
+            str(progress["job_id"]),
+            progress["file_name"],
+            f"{progress['bytes_sent'] / (1024 * 1024):.1f} / {progress['file_size'] / (1024 * 1024):.1f} MiB",
+            f"{progress['rate']:.2f}",
+            f"{eta:.1f} s" if eta is not None else "-",
+            progress["state"],
+        )
+        for column, text in enumerate(cells):
+            item = self.transfers_table.item(row, column)
+            if item.text() != text:
+                item.setText(text)
+
+    def selected_job_ids(self):
+        rows = {index.row() for index in self.transfers_table.selectionModel().selectedRows()}
+        return [job_id for job_id, row in self.transfer_rows.items() if row in rows]
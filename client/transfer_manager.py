@@ -0,0 +1,175 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from client.client_core import iter_files
+
+
+DEFAULT_MAX_WORKERS = 2          # files sent at the same time
+DEFAULT_PROGRESS_INTERVAL = 0.1  # seconds between progress reports of a job
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class TransferCancelled(Exception):
+    """Raised inside a running send to abort it."""
+
+
+class TransferJob:
+    __slots__ = (
+        "job_id", "file_path", "file_size", "options", "state", "bytes_sent",
+        "start_time", "end_time", "error", "metrics", "future", "cancel_event", "_last_report",
+    )
+
+    def __init__(self, job_id, file_path, options):
+        self.job_id = job_id
+        self.file_path = file_path
+        self.file_size = _path_size(file_path)
+        self.options = options
+        self.state = QUEUED
+        self.bytes_sent = 0
+        self.start_time = None
+        self.end_time = None
+        self.error = None
+        self.metrics = None  # ClientTransferMetrics of a finished send
+        self.future = None
+        self.cancel_event = threading.Event()
+        self._last_report = 0.0
+
+    def progress(self) -> dict:
+        """bytes, rate (MB/s) and ETA (s, None if unknown) of the job."""
+        elapsed = 0.0
+        if self.start_time is not None:
+            elapsed = (self.end_time or time.monotonic()) - self.start_time
+        rate = self.bytes_sent / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+        eta = None
+        if self.state == RUNNING and rate > 0:
+            eta = (self.file_size - self.bytes_sent) / (rate * 1024 * 1024)
+        return {
+            "job_id": self.job_id,
+            "file_path": self.file_path,
+            "file_name": os.path.basename(self.file_path),
+            "file_size": self.file_size,
+            "bytes_sent": self.bytes_sent,
+            "elapsed": elapsed,
+            "rate": rate,
+            "eta": eta,
+            "state": self.state,
+            "error": str(self.error) if self.error is not None else None,
+            "metrics": self.metrics.to_dict() if self.metrics is not None else None,
+        }
+
+
+class TransferManager:
+    """Queue of uploads sent by a pool of worker threads.
+
+    Jobs run `max_workers` at a time through `ClientCore.send_file` (one
+    connection each), or `ClientCore.send_directory` for a directory, which
+    is sent whole over one session connection. Progress is reported through `on_progress` at most
+    every `progress_interval` seconds per job, and every job ends with one
+    `on_finished` call whatever its outcome. Both callbacks run on worker
+    threads (or the caller's, for jobs cancelled before they started).
+    """
+
+    def __init__(self, client_core, max_workers=DEFAULT_MAX_WORKERS,
+                 progress_interval=DEFAULT_PROGRESS_INTERVAL, **send_options):
+        self.client_core = client_core
+        self.max_workers = max_workers
+        self.progress_interval = progress_interval
+        self.send_options = send_options  # defaults for send_file
+        self.jobs = {}  # job_id -> TransferJob, in submission order
+        self.on_progress: Optional[Callable[[dict], None]] = None  # function(progress dict)
+        self.on_finished: Optional[Callable[[dict], None]] = None  # function(progress dict)
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="transfer")
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, file_path, **send_options) -> int:
+        """Queue one file; returns its job id."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("transfer manager is shut down")
+            job = TransferJob(next(self._job_ids), file_path, {**self.send_options, **send_options})
+            self.jobs[job.job_id] = job
+            job.future = self._executor.submit(self._run, job)
+        return job.job_id
+
+    def cancel(self, job_id) -> bool:
+        """Cancel a queued or running job; False if it already ended."""
+        job = self.jobs.get(job_id)
+        if job is None or job.state not in (QUEUED, RUNNING):
+            return False
+        job.cancel_event.set()
+        if job.future.cancel():
+            # never started, so no worker will report it
+            job.state = CANCELLED
+            self._notify(self.on_finished, job)
+        return True
+
+    def active(self):
+        return [job for job in self.jobs.values() if job.state in (QUEUED, RUNNING)]
+
+    def shutdown(self, wait=True, cancel=True):
+        """Stop taking jobs; with `cancel`, abort the queued and running ones."""
+        with self._lock:
+            self._closed = True
+        if cancel:
+            for job in list(self.jobs.values()):
+                self.cancel(job.job_id)
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            job.state = CANCELLED
+            self._notify(self.on_finished, job)
+            return
+        job.state = RUNNING
+        job.start_time = time.monotonic()
+
+        def on_sent(n):
+            if job.cancel_event.is_set():
+                raise TransferCancelled(job.file_path)
+            job.bytes_sent += n
+            now = time.monotonic()
+            if now - job._last_report >= self.progress_interval:
+                job._last_report = now
+                self._notify(self.on_progress, job)
+
+        try:
+            if os.path.isdir(job.file_path):
+                # no per-file metrics; send_directory returns a file count
+                self.client_core.send_directory(job.file_path, on_sent=on_sent, **job.options)
+            else:
+                job.metrics = self.client_core.send_file(job.file_path, on_sent=on_sent, **job.options)
+        except TransferCancelled:
+            job.state = CANCELLED
+        except Exception as e:
+            job.state = FAILED
+            job.error = e
+        else:
+            job.state = DONE
+        finally:
+            job.end_time = time.monotonic()
+        self._notify(self.on_finished, job)
+
+    def _notify(self, callback, job):
+        if callback is not None:
+            try:
+                callback(job.progress())
+            except Exception as e:
+                print(f"[WARN] transfer callback failed: {e}")
+
+
+def _path_size(path):
+    # a directory counts every file send_directory will upload
+    if os.path.isdir(path):
+        return sum(os.path.getsize(file_path) for file_path, _ in iter_files(path))
+    return os.path.getsize(path)
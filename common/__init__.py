@@ -0,0 +1 @@
+from .protocol import FileHeader, ProtocolError, parse_header
@@ -0,0 +1,72 @@
+import hashlib
+import time
+import zlib
+
+from .protocol import ProtocolError
+
+
+# Algorithm ids carried in the EXT_CHECKSUM header extension
+CHECKSUM_IDS = {
+    "crc32": 1,
+    "adler32": 2,
+    "md5": 3,
+    "sha1": 4,
+    "sha256": 5,
+    "blake2b": 6,
+}
+CHECKSUM_NAMES = {algorithm_id: name for name, algorithm_id in CHECKSUM_IDS.items()}
+
+
+class StreamingChecksum:
+    """Checksum updated chunk by chunk, timing its own cost."""
+
+    def __init__(self, algorithm: str):
+        if algorithm not in CHECKSUM_IDS:
+            raise ValueError(f"Unknown checksum {algorithm!r}, expected one of {tuple(CHECKSUM_IDS)}")
+        self.algorithm = algorithm
+        self.bytes_hashed = 0
+        self.seconds = 0.0
+        if algorithm == "crc32":
+            self._value = 0
+            self._func = zlib.crc32
+        elif algorithm == "adler32":
+            self._value = 1
+            self._func = zlib.adler32
+        else:
+            self._hash = hashlib.new(algorithm)
+
+    @classmethod
+    def from_id(cls, algorithm_id: int) -> "StreamingChecksum":
+        if algorithm_id not in CHECKSUM_NAMES:
+            raise ProtocolError(f"unsupported checksum id {algorithm_id}")
+        return cls(CHECKSUM_NAMES[algorithm_id])
+
+    @property
+    def algorithm_id(self) -> int:
+        return CHECKSUM_IDS[self.algorithm]
+
+    @property
+    def digest_size(self) -> int:
+        if self.algorithm in ("crc32", "adler32"):
+            return 4
+        return self._hash.digest_size
+
+    def update(self, data) -> None:
+        start = time.perf_counter()
+        if self.algorithm in ("crc32", "adler32"):
+            self._value = self._func(data, self._value)
+        else:
+            self._hash.update(data)
+        self.seconds += time.perf_counter() - start
+        self.bytes_hashed += len(data)
+
+    def digest(self) -> bytes:
+        if self.algorithm in ("crc32", "adler32"):
+            return self._value.to_bytes(4, "big")
+        return self._hash.digest()
+
+    @property
+    def ms_per_mb(self) -> float:
+        if not self.bytes_hashed:
+            return 0.0
+        return self.seconds * 1000 / (self.bytes_hashed / (1024 * 1024))
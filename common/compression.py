@@ -0,0 +1,104 @@
+import bz2
+import lzma
+import struct
+import zlib
+from typing import Optional
+
+from .protocol import ProtocolError
+
+
+# Codec ids carried in the EXT_COMPRESSION header extension
+CODEC_IDS = {"zlib": 1, "lzma": 2, "bz2": 3}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODEC_IDS.items()}
+
+# A compressed payload is a series of blocks, length(4) + data, ended by an
+# empty block, so its end is known without the compressed size up front
+BLOCK_HEADER = struct.Struct("!I")
+END_OF_BLOCKS = BLOCK_HEADER.pack(0)
+
+# Extensions whose contents are already compressed
+INCOMPRESSIBLE_TYPES = frozenset({
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".lzma", ".zst", ".7z", ".rar",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+    ".mp3", ".aac", ".ogg", ".flac", ".opus",
+    ".mp4", ".mkv", ".mov", ".avi", ".webm",
+    ".docx", ".xlsx", ".pptx", ".jar", ".apk",
+})
+
+
+class CompressionPolicy:
+    """Decides per file whether and how the client compresses the payload.
+
+    Files whose extension is in `skip_types` are sent raw. With probe=True
+    the first `probe_size` bytes are compressed first and the file is sent
+    raw unless they shrink to at most `max_ratio` of their size.
+    """
+
+    def __init__(
+        self,
+        codec: str = "zlib",
+        level: Optional[int] = None,
+        probe: bool = False,
+        probe_size: int = 64 * 1024,
+        max_ratio: float = 0.9,
+        skip_types=INCOMPRESSIBLE_TYPES,
+    ):
+        if codec not in CODEC_IDS:
+            raise ValueError(f"Unknown codec {codec!r}, expected one of {tuple(CODEC_IDS)}")
+        self.codec = codec
+        self.level = level
+        self.probe = probe
+        self.probe_size = probe_size
+        self.max_ratio = max_ratio
+        self.skip_types = frozenset(skip_types)
+
+    def choose(self, file_type: str, sample: Optional[bytes] = None) -> Optional[str]:
+        """Codec name for this file, or None to send it uncompressed."""
+        if file_type.lower() in self.skip_types:
+            return None
+        if self.probe and sample:
+            # a fast zlib pass is a good enough predictor for every codec
+            ratio = len(zlib.compress(sample, 1)) / len(sample)
+            if ratio > self.max_ratio:
+                return None
+        return self.codec
+
+
+def make_compressor(codec: str, level: Optional[int] = None):
+    if codec == "zlib":
+        return zlib.compressobj(6 if level is None else level)
+    if codec == "lzma":
+        return lzma.LZMACompressor(preset=level)
+    if codec == "bz2":
+        return bz2.BZ2Compressor(9 if level is None else level)
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+class Decompressor:
+    def __init__(self, codec_id: int):
+        codec = CODEC_NAMES.get(codec_id)
+        if codec == "zlib":
+            self._impl = zlib.decompressobj()
+        elif codec == "lzma":
+            self._impl = lzma.LZMADecompressor()
+        elif codec == "bz2":
+            self._impl = bz2.BZ2Decompressor()
+        else:
+            raise ProtocolError(f"unsupported compression codec id {codec_id}")
+        self.codec = codec
+
+    def decompress(self, data) -> bytes:
+        return self._impl.decompress(data)
+
+    def flush(self) -> bytes:
+        # only zlib keeps output back until flushed
+        return self._impl.flush() if self.codec == "zlib" else b""
+
+
+def compress_blocks(data: bytes, codec: str, level: Optional[int] = None) -> bytes:
+    """Whole in-memory payload as framed blocks, end marker included."""
+    compressor = make_compressor(codec, level)
+    compressed = compressor.compress(data) + compressor.flush()
+    if not compressed:
+        return END_OF_BLOCKS
+    return BLOCK_HEADER.pack(len(compressed)) + compressed + END_OF_BLOCKS
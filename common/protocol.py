@@ -0,0 +1,194 @@
+import struct
+from typing import Optional
+
+
+# Binary header layout (network byte order):
+#   magic(4) version(1) flags(2) file_size(8) name_len(2) type_len(2) ext_len(2)
+#   followed by name, type and an extension block of `ext_len` bytes.
+# The magic starts with 0x89, which can never start a UTF-8 text header, so a
+# legacy "<file_name>|<file_size>|<file_type>\n" header is detected from the
+# first byte.
+MAGIC = b"\x89FTA"
+VERSION = 1
+_FIXED = struct.Struct("!4sBHQHHH")
+FIXED_HEADER_SIZE = _FIXED.size
+
+# Upper bound for a legacy header without a newline before we give up
+MAX_LEGACY_HEADER_SIZE = 64 * 1024
+
+# Extension block entries: tag(1) length(2) value
+_EXT = struct.Struct("!BH")
+
+# Header flags
+FLAG_RANGE = 0x0001      # payload is one byte range of a multi-stream transfer
+FLAG_RESUMABLE = 0x0002  # server replies with the committed offset first
+FLAG_SESSION = 0x0004    # another header (or EOF) follows file_size payload bytes
+FLAG_DEDUP = 0x0008      # payload is a chunk manifest, then only the chunks asked for
+FLAG_ACK = 0x0010        # server answers with an ACK_FRAME once the file is stored
+
+# Extension tags
+EXT_TRANSFER_ID = 1  # 16 raw bytes shared by every stream of a transfer
+EXT_RANGE = 2        # offset(8) total_size(8) stream_index(2) stream_count(2)
+EXT_FILE_ID = 3      # stable identity of the file being resumed
+EXT_COMPRESSION = 4  # codec id(1); the payload is framed compressed blocks
+EXT_DEDUP = 5        # chunk_size(4) of a deduplicated upload
+EXT_CHECKSUM = 6     # algorithm id(1); the file's digest follows the payload
+
+_RANGE = struct.Struct("!QQHH")
+
+# Server -> client reply to a resumable header: bytes already committed
+RESUME_REPLY = struct.Struct("!Q")
+
+# Server -> client acknowledgement of a FLAG_ACK upload, sent once the file
+# is fsynced and its metrics row committed (or the commit wait timed out):
+#   status(1) stored(1) bytes_received(8), then seconds as doubles:
+#   receive_time (header to last payload byte), disk_time (writes + fsync),
+#   commit_time (metrics row), server_time (header to acknowledgement)
+ACK_FRAME = struct.Struct("!BBQdddd")
+ACK_OK = 0
+ACK_INCOMPLETE = 1
+ACK_CHECKSUM_MISMATCH = 2
+ACK_STATUS_NAMES = {ACK_OK: "Success", ACK_INCOMPLETE: "Failed", ACK_CHECKSUM_MISMATCH: "Checksum mismatch"}
+ACK_STORED_FILE = 0x01     # file data fsynced
+ACK_STORED_METRICS = 0x02  # metrics row committed to the database
+
+# Deduplicated uploads: the manifest is one SHA-256 digest per fixed-size
+# chunk; the server answers with a bitmap of the chunks it needs (bit i of
+# byte i // 8, most significant bit first)
+DEDUP_PARAMS = struct.Struct("!I")
+DEDUP_DIGEST_SIZE = 32
+MIN_DEDUP_CHUNK_SIZE = 4 * 1024
+MAX_DEDUP_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class FileHeader:
+    def __init__(
+        self,
+        file_name: str,
+        file_size: Optional[int],
+        file_type: str,
+        flags: int = 0,
+        extensions: Optional[dict] = None,
+        version: int = VERSION,
+        legacy: bool = False,
+    ):
+        self.file_name = file_name
+        self.file_size = file_size  # None when a legacy header was malformed
+        self.file_type = file_type
+        self.flags = flags
+        self.extensions = extensions or {}  # tag -> bytes
+        self.version = version
+        self.legacy = legacy
+
+    def encode(self) -> bytes:
+        name = self.file_name.encode()
+        file_type = self.file_type.encode()
+        ext = b"".join(
+            _EXT.pack(tag, len(value)) + value
+            for tag, value in sorted(self.extensions.items())
+        )
+        if max(len(name), len(file_type), len(ext)) > 0xFFFF:
+            raise ProtocolError("header field longer than 65535 bytes")
+        fixed = _FIXED.pack(
+            MAGIC, self.version, self.flags, self.file_size,
+            len(name), len(file_type), len(ext),
+        )
+        return fixed + name + file_type + ext
+
+    def encode_legacy(self) -> bytes:
+        return f"{self.file_name}|{self.file_size}|{self.file_type}\n".encode()
+
+
+def pack_range(offset: int, total_size: int, stream_index: int, stream_count: int) -> bytes:
+    return _RANGE.pack(offset, total_size, stream_index, stream_count)
+
+
+def unpack_range(value: bytes):
+    """Returns (offset, total_size, stream_index, stream_count)."""
+    if len(value) != _RANGE.size:
+        raise ProtocolError("malformed range extension")
+    return _RANGE.unpack(value)
+
+
+def dedup_chunk_count(file_size: int, chunk_size: int) -> int:
+    return -(-file_size // chunk_size)
+
+
+def parse_header(data, eof: bool = False):
+    """Parse a binary or legacy header from the start of `data`.
+
+    Returns (header, consumed_bytes), or None when more data is needed.
+    With eof=True a legacy header may end without a newline, as the old
+    server accepted.
+    """
+    # `data` may be a memoryview over a receive buffer; only the header
+    # fields are copied out of it
+    if not len(data) and not eof:
+        return None
+    prefix = bytes(data[:len(MAGIC)])
+    if prefix and (prefix == MAGIC or MAGIC.startswith(prefix)):
+        if len(data) < FIXED_HEADER_SIZE:
+            if eof:
+                raise ProtocolError("connection closed inside binary header")
+            return None
+        return _parse_binary(data, eof)
+    return _parse_legacy(data, eof)
+
+
+def _parse_binary(data, eof):
+    magic, version, flags, file_size, name_len, type_len, ext_len = _FIXED.unpack_from(data)
+    data = bytes(data[:FIXED_HEADER_SIZE + name_len + type_len + ext_len])
+    if version != VERSION:
+        raise ProtocolError(f"unsupported header version {version}")
+    end = FIXED_HEADER_SIZE + name_len + type_len + ext_len
+    if len(data) < end:
+        if eof:
+            raise ProtocolError("connection closed inside binary header")
+        return None
+
+    pos = FIXED_HEADER_SIZE
+    file_name = data[pos:pos + name_len].decode(errors="ignore")
+    pos += name_len
+    file_type = data[pos:pos + type_len].decode(errors="ignore")
+    pos += type_len
+
+    extensions = {}
+    while pos < end:
+        if pos + _EXT.size > end:
+            raise ProtocolError("truncated header extension")
+        tag, length = _EXT.unpack_from(data, pos)
+        pos += _EXT.size
+        if pos + length > end:
+            raise ProtocolError("truncated header extension")
+        extensions[tag] = data[pos:pos + length]
+        pos += length
+
+    header = FileHeader(file_name, file_size, file_type, flags, extensions, version)
+    return header, end
+
+
+def _parse_legacy(data, eof):
+    data = bytes(data[:MAX_LEGACY_HEADER_SIZE + 1])
+    newline = data.find(b"\n")
+    if newline == -1:
+        if not eof:
+            if len(data) > MAX_LEGACY_HEADER_SIZE:
+                raise ProtocolError("legacy header too long")
+            return None
+        raw, consumed = data, len(data)
+    else:
+        raw, consumed = data[:newline], newline + 1
+
+    try:
+        file_name, file_size_str, file_type = raw.decode(errors="ignore").split('|')
+        file_size = int(file_size_str)
+    except Exception:
+        file_name = "unknown"
+        file_type = ""
+        file_size = None
+
+    return FileHeader(file_name, file_size, file_type, legacy=True), consumed
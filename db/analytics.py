@@ -0,0 +1,183 @@
+'''
+Historical queries over transfer_metrics.
+
+Dashboards read the hourly/daily rollups (transfer_rollups), which
+update_rollups keeps current as metrics rows are inserted; percentiles
+and exports go to the raw table through its timestamp/file_type/status
+indexes.
+
+'''
+
+import math
+from datetime import datetime, timezone
+
+from sqlalchemy import case, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from db.transfer_metrics_model import TransferMetrics, TransferRollup
+
+
+PERIODS = ("hour", "day")
+_SUMMED = ("transfer_count", "failed_count", "total_bytes", "throughput_sum")
+
+
+def bucket_start(timestamp, period):
+    """Start of the hour/day (UTC) that `timestamp` falls in."""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)  # stored as UTC
+    timestamp = timestamp.astimezone(timezone.utc)
+    if period == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if period == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown period {period!r}, expected one of {PERIODS}")
+
+
+def update_rollups(db, rows):
+    """Add metrics rows (TransferMetrics column dicts) to the rollups.
+
+    Rows are grouped per bucket first, so a batch costs one upsert per
+    (period, bucket, file type) rather than one per row.
+    """
+    deltas = {}
+    for row in rows:
+        timestamp = row.get("timestamp") or datetime.now(timezone.utc)
+        failed = row.get("transfer_status") != "Success"
+        size = (row.get("file_size") or 0) - (row.get("transfer_byte_difference") or 0)
+        throughput = row.get("throughput") or 0.0
+        for period in PERIODS:
+            key = (period, bucket_start(timestamp, period), row.get("file_type") or "")
+            delta = deltas.setdefault(key, dict.fromkeys(_SUMMED, 0) | {"throughput_max": 0.0})
+            delta["transfer_count"] += 1
+            delta["failed_count"] += failed
+            delta["total_bytes"] += max(size, 0)
+            delta["throughput_sum"] += throughput
+            delta["throughput_max"] = max(delta["throughput_max"], throughput)
+
+    for (period, start, file_type), delta in deltas.items():
+        _upsert_rollup(db, dict(delta, period=period, bucket_start=start, file_type=file_type))
+
+
+def _upsert_rollup(db, values):
+    table = TransferRollup.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = insert(table).values(**values)
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=["period", "bucket_start", "file_type"],
+            set_={
+                **{name: table.c[name] + excluded[name] for name in _SUMMED},
+                "throughput_max": case(
+                    (excluded.throughput_max > table.c.throughput_max, excluded.throughput_max),
+                    else_=table.c.throughput_max,
+                ),
+            },
+        )
+        db.execute(statement)
+        return
+
+    # Other backends: read-modify-write inside the caller's transaction
+    rollup = db.scalars(
+        select(TransferRollup).where(
+            TransferRollup.period == values["period"],
+            TransferRollup.bucket_start == values["bucket_start"],
+            TransferRollup.file_type == values["file_type"],
+        ).with_for_update()
+    ).first()
+    if rollup is None:
+        db.add(TransferRollup(**values))
+        return
+    for name in _SUMMED:
+        setattr(rollup, name, getattr(rollup, name) + values[name])
+    rollup.throughput_max = max(rollup.throughput_max, values["throughput_max"])
+
+
+def rebuild_rollups(db, batch_size=1000):
+    """Recompute every rollup from the raw table (e.g. for rows stored
+    before rollups existed)."""
+    db.query(TransferRollup).delete()
+    batch = []
+    for row in export_transfers(db, batch_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            update_rollups(db, batch)
+            batch.clear()
+    if batch:
+        update_rollups(db, batch)
+
+
+def rollups(db, period="hour", since=None, until=None, file_type=None):
+    """Rollup buckets, oldest first, as dicts with the derived averages."""
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period {period!r}, expected one of {PERIODS}")
+    query = select(TransferRollup).where(TransferRollup.period == period)
+    if since is not None:
+        query = query.where(TransferRollup.bucket_start >= bucket_start(since, period))
+    if until is not None:
+        query = query.where(TransferRollup.bucket_start < until)
+    if file_type is not None:
+        query = query.where(TransferRollup.file_type == file_type)
+    result = []
+    for rollup in db.scalars(query.order_by(TransferRollup.bucket_start, TransferRollup.file_type)):
+        count = rollup.transfer_count
+        result.append({
+            "period": rollup.period,
+            "bucket_start": rollup.bucket_start,
+            "file_type": rollup.file_type or None,
+            "transfer_count": count,
+            "failed_count": rollup.failed_count,
+            "failure_rate": rollup.failed_count / count if count else 0.0,
+            "total_bytes": rollup.total_bytes,
+            "throughput_avg": rollup.throughput_sum / count if count else 0.0,
+            "throughput_max": rollup.throughput_max,
+        })
+    return result
+
+
+def _filtered(query, since=None, until=None, file_type=None, status=None):
+    if since is not None:
+        query = query.where(TransferMetrics.timestamp >= since)
+    if until is not None:
+        query = query.where(TransferMetrics.timestamp < until)
+    if file_type is not None:
+        query = query.where(TransferMetrics.file_type == file_type)
+    if status is not None:
+        query = query.where(TransferMetrics.transfer_status == status)
+    return query
+
+
+def throughput_percentile(db, q, since=None, until=None, file_type=None, status="Success"):
+    """q-th percentile (0-100) of per-transfer average throughput, in MB/s.
+
+    e.g. throughput_percentile(db, 95, since=week_ago, file_type=".iso")
+    """
+    if not 0 <= q <= 100:
+        raise ValueError("q must be between 0 and 100")
+    if db.get_bind().dialect.name == "postgresql":
+        query = select(func.percentile_cont(q / 100).within_group(TransferMetrics.throughput))
+        return db.scalar(_filtered(query, since, until, file_type, status))
+
+    query = _filtered(select(TransferMetrics.throughput), since, until, file_type, status)
+    values = sorted(db.scalars(query.execution_options(yield_per=10000)))
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100
+    low = math.floor(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def export_transfers(db, since=None, until=None, file_type=None, status=None, batch_size=1000):
+    """Stream matching transfers as column dicts, oldest first.
+
+    Rows are fetched `batch_size` at a time (yield_per), so exports of the
+    whole table run in constant memory.
+    """
+    columns = TransferMetrics.__table__.columns
+    query = _filtered(select(*columns), since, until, file_type, status)
+    query = query.order_by(TransferMetrics.timestamp, TransferMetrics.id)
+    for row in db.execute(query.execution_options(yield_per=batch_size)):
+        yield dict(row._mapping)
+
@@ -1,4 +1,7 @@
-from sqlalchemy import Column, Integer, BigInteger, Float, Text, DateTime, func
+from sqlalchemy import (
+    Column, Integer, BigInteger, Boolean, Float, Text, DateTime, ForeignKey, LargeBinary,
+    UniqueConstraint, func,
+)
 from sqlalchemy.orm import DeclarativeBase
 
 
@@ -11,19 +14,76 @@ class TransferMetrics(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     file_name = Column(Text, nullable=False)
     file_size = Column(BigInteger, nullable=False)
-    file_type = Column(Text)
+    file_type = Column(Text, index=True)
 
     total_transfer_time = Column(Float, nullable=False)
     throughput = Column(Float, nullable=False)
     peak_throughput = Column(Float, nullable=False)
+    throughput_p50 = Column(Float)
+    throughput_p95 = Column(Float)
+    throughput_p99 = Column(Float)
 
     transfer_byte_difference = Column(Integer)
-    transfer_status = Column(Text, nullable=False)
+    transfer_status = Column(Text, nullable=False, index=True)
 
     cpu_usage_avg = Column(Float)
     cpu_usage_peak = Column(Float)
     ram_usage_avg = Column(Float)
     ram_usage_peak = Column(Float)
 
-    timestamp = Column(DateTime(timezone=True), default=func.now())
+    checksum_algorithm = Column(Text)
+    checksum_ok = Column(Boolean)
+    checksum_ms_per_mb = Column(Float)
 
+    timestamp = Column(DateTime(timezone=True), default=func.now(), index=True)
+
+    @classmethod
+    def values_from_metrics_dict(cls, metrics_dict):
+        # FileTransferMetrics.to_dict() carries extra, non-persisted keys
+        columns = cls.__table__.columns.keys()
+        return {k: v for k, v in metrics_dict.items() if k in columns}
+
+    @classmethod
+    def from_metrics_dict(cls, metrics_dict):
+        return cls(**cls.values_from_metrics_dict(metrics_dict))
+
+
+
+class TransferSample(Base):
+    """A block of time-series points of one transfer (see server.time_series).
+
+    `data` packs up to a few thousand little-endian float64 points: (t, value)
+    for the raw tier, (t, mean, min, max) for the downsampled tiers.
+    """
+    __tablename__ = 'transfer_samples'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    transfer_id = Column(
+        Integer, ForeignKey('transfer_metrics.id', ondelete='CASCADE'), nullable=False, index=True
+    )
+    series = Column(Text, nullable=False)   # throughput, cpu or ram
+    tier = Column(Text, nullable=False)     # raw, 1s or 1min
+    block_index = Column(Integer, nullable=False)
+    start_time = Column(Float, nullable=False)  # unix time of the first point
+    sample_count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+
+class TransferRollup(Base):
+    """Per-period, per-file-type totals, kept current by db.analytics.
+
+    Sums rather than averages are stored so a batch of new transfers can be
+    added with a single upsert; see db.analytics.rollups for derived values.
+    """
+    __tablename__ = 'transfer_rollups'
+    __table_args__ = (UniqueConstraint('period', 'bucket_start', 'file_type'),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    period = Column(Text, nullable=False)  # hour or day
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    file_type = Column(Text, nullable=False)  # "" when unknown
+    transfer_count = Column(Integer, nullable=False)
+    failed_count = Column(Integer, nullable=False)
+    total_bytes = Column(BigInteger, nullable=False)
+    throughput_sum = Column(Float, nullable=False)
+    throughput_max = Column(Float, nullable=False)
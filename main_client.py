@@ -10,5 +10,6 @@ if __name__ == "__main__":
     window = ClientWindow()
     client_core = ClientCore()
     controller = ClientController(window, client_core)
+    app.aboutToQuit.connect(controller.shutdown)
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
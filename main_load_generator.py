@@ -0,0 +1,6 @@
+import sys
+from benchmarks.load_generator import main
+
+
+if __name__ == "__main__":
+    sys.exit(main())
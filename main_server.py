@@ -1,15 +1,23 @@
 import sys
-from PyQt5.QtWidgets import QApplication
-from server.server_gui import ServerWindow
-from dotenv import load_dotenv
 
 
-if not load_dotenv() :
-    print("No .env file found or failed to load")
+def main_gui():
+    from PyQt5.QtWidgets import QApplication
+    from dotenv import load_dotenv
+    from server.server_gui import ServerWindow
 
-
-if __name__ == "__main__":
+    if not load_dotenv():
+        print("No .env file found or failed to load")
     app = QApplication(sys.argv)
     window = ServerWindow()
     window.show()
-    sys.exit(app.exec_())
+    return app.exec_()
+
+
+if __name__ == "__main__":
+    # --headless: no Qt at all, see server/headless.py for the options
+    if "--headless" in sys.argv[1:]:
+        from server.headless import main
+
+        sys.exit(main([arg for arg in sys.argv[1:] if arg != "--headless"]))
+    sys.exit(main_gui())
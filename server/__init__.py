@@ -1 +1,11 @@
-from .server_core import ServerCore
\ No newline at end of file
+def __getattr__(name):
+    # ServerCore loads on first use, so importing a light module such as
+    # server.log_pipeline does not pull in the whole server
+    if name == "ServerCore":
+        from .server_core import ServerCore
+
+        return ServerCore
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["ServerCore"]
@@ -0,0 +1,42 @@
+import threading
+
+
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+
+class BufferPool:
+    """Receive buffers shared by all connections of a server.
+
+    Connections borrow a preallocated bytearray for their lifetime and fill it
+    with recv_into, so the receive loop allocates nothing per chunk. Up to
+    `max_idle` returned buffers are kept for reuse.
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, max_idle: int = 64):
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(
+                f"chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE} bytes"
+            )
+        self.chunk_size = chunk_size
+        self.max_idle = max_idle
+        self.allocated = 0  # buffers created over the pool's lifetime
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bytearray:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self.allocated += 1
+        return bytearray(self.chunk_size)
+
+    def release(self, buf: bytearray) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(buf)
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
@@ -0,0 +1,53 @@
+import numpy as np
+
+
+DEFAULT_CHART_WINDOW = 10000  # samples shown per chart
+
+
+class ChartBuffer:
+    """Preallocated ring buffer of the latest `window` samples of N series.
+
+    Appending is O(1) and never allocates; `view` returns the samples in
+    order together with their running sample numbers, ready for setData.
+    """
+
+    def __init__(self, series_count: int, window: int = DEFAULT_CHART_WINDOW):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.window = window
+        self._data = np.zeros((series_count, window), dtype=np.float64)
+        self.total = 0  # samples appended since the last clear
+
+    def append(self, *values) -> None:
+        self._data[:, self.total % self.window] = values
+        self.total += 1
+
+    def extend(self, samples) -> None:
+        # samples: sequence of N-tuples; written with at most two slice copies
+        rows = np.asarray(samples, dtype=np.float64).reshape(-1, len(self._data)).T
+        count = rows.shape[1]
+        if count > self.window:
+            self.total += count - self.window
+            rows = rows[:, -self.window:]
+            count = self.window
+        start = self.total % self.window
+        first = min(count, self.window - start)
+        self._data[:, start:start + first] = rows[:, :first]
+        self._data[:, :count - first] = rows[:, first:]
+        self.total += count
+
+    def clear(self) -> None:
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.window)
+
+    def view(self):
+        """(x, [series...]) of the retained samples, oldest first."""
+        n = len(self)
+        x = np.arange(self.total - n, self.total, dtype=np.float64)
+        if self.total <= self.window:
+            return x, [row[:n].copy() for row in self._data]
+        split = self.total % self.window
+        # one concatenate per series, only when a frame is drawn
+        return x, [np.concatenate((row[split:], row[:split])) for row in self._data]
@@ -0,0 +1,49 @@
+import hashlib
+import os
+import uuid
+
+
+class ChunkStore:
+    """Content-addressed chunks on disk, shared by all deduplicated uploads.
+
+    A chunk with SHA-256 digest d is stored at `<root>/<d[:2]>/<d>`, so the
+    directory tree itself is the hash index.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, digest: bytes) -> str:
+        name = digest.hex()
+        return os.path.join(self.root, name[:2], name)
+
+    def has(self, digest: bytes) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def put(self, digest: bytes, data) -> None:
+        if hashlib.sha256(data).digest() != digest:
+            raise ValueError(f"chunk does not match digest {digest.hex()}")
+        path = self.path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write-then-rename so concurrent uploads of the same chunk are safe
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def read(self, digest: bytes) -> bytes:
+        path = self.path(digest)
+        with open(path, "rb") as f:
+            data = f.read()
+        if hashlib.sha256(data).digest() != digest:
+            # damaged or replaced on disk: drop it so the next upload sends
+            # the chunk again
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            raise ValueError(f"stored chunk does not match digest {digest.hex()}")
+        return data
@@ -0,0 +1,163 @@
+"""
+Headless server: ServerCore without Qt, configured by flags or environment.
+
+    python main_server.py --headless --port 5000 --save-dir /data/received
+    SERVER_PORT=5000 SERVER_ENGINE=asyncio python -m server.headless
+
+Flags win over environment variables, which win over .env. The database is
+the usual db.database choice (DATABASE_URL, POSTGRES_*, else SQLite) unless
+--db-url is given; it is only connected when the first metrics are stored.
+Startup logs how long imports took and when the server was listening;
+--check prints those timings as JSON and exits instead of serving.
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+from .log_pipeline import LogPipeline
+
+
+log = logging.getLogger(__name__)
+
+ENV_PREFIX = "SERVER_"
+DEFAULT_PORT = 5000
+DEFAULT_SAVE_DIR = "received_files"
+DEFAULT_ENGINE = "threaded"
+START_TIMEOUT = 30.0  # seconds to wait for the socket to listen
+
+
+def _env(name, default=None):
+    return os.environ.get(ENV_PREFIX + name, default)
+
+
+def parse_args(argv=None):
+    # .env is only read if present; python-dotenv is not imported otherwise
+    if os.path.exists(".env"):
+        from dotenv import load_dotenv
+
+        load_dotenv(".env")
+    parser = argparse.ArgumentParser(description="File transfer server without the GUI.")
+    parser.add_argument("--host", default=_env("HOST"),
+                        help="address to bind (env SERVER_HOST, default: this host's name)")
+    parser.add_argument("--port", type=int, default=_env("PORT", DEFAULT_PORT),
+                        help=f"port to listen on (env SERVER_PORT, default {DEFAULT_PORT})")
+    parser.add_argument("--save-dir", default=_env("SAVE_DIR", DEFAULT_SAVE_DIR),
+                        help=f"where received files go (env SERVER_SAVE_DIR, default {DEFAULT_SAVE_DIR})")
+    parser.add_argument("--engine", choices=("threaded", "asyncio"), default=_env("ENGINE", DEFAULT_ENGINE),
+                        help=f"connection engine (env SERVER_ENGINE, default {DEFAULT_ENGINE})")
+    parser.add_argument("--db-url", default=os.environ.get("DATABASE_URL"),
+                        help="SQLAlchemy URL of the metrics database (env DATABASE_URL)")
+    parser.add_argument("--log-level", default=_env("LOG_LEVEL", "INFO"),
+                        help="logging level (env SERVER_LOG_LEVEL, default INFO)")
+    parser.add_argument("--check", action="store_true",
+                        help="start, print the startup timings as JSON and exit")
+    return parser.parse_args(argv)
+
+
+class HeadlessServer:
+    """ServerCore on a background thread, until stop() or a signal."""
+
+    def __init__(self, host=None, port=DEFAULT_PORT, save_dir=DEFAULT_SAVE_DIR, engine=DEFAULT_ENGINE):
+        started = time.perf_counter()
+        from .server_core import ServerCore
+
+        self.import_time = time.perf_counter() - started
+        self.server_core = ServerCore(host, port, save_dir, engine=engine)
+        self.startup_time = None  # seconds from construction, imports included, to listening
+        self.error = None
+        self._created = started
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self, timeout=START_TIMEOUT):
+        """Start listening; returns once the socket accepts connections."""
+        self._thread = threading.Thread(target=self._serve, name="server", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server_core.is_running:
+            if not self._thread.is_alive():
+                raise RuntimeError(f"server failed to start: {self.error}")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"server did not start within {timeout} s")
+            time.sleep(0.001)
+        self.startup_time = time.perf_counter() - self._created
+
+    def _serve(self):
+        try:
+            self.server_core.start()
+        except Exception as e:
+            self.error = e
+            if self.server_core.is_running:
+                log.exception("Server failed")
+        finally:
+            self._stopped.set()
+
+    @property
+    def address(self):
+        return self.server_core.server_socket.getsockname()
+
+    def wait(self):
+        # short waits so signal handlers run promptly on every platform
+        while not self._stopped.wait(0.5):
+            pass
+
+    def stop(self):
+        if not self._stopped.is_set():
+            self.server_core.stop()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+
+def timings(server):
+    """Startup timings in milliseconds."""
+    return {
+        "import_ms": server.import_time * 1000,
+        "startup_ms": server.startup_time * 1000,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.db_url:
+        # read by db.database when the first metrics batch is written
+        os.environ["DATABASE_URL"] = args.db_url
+    pipeline = LogPipeline(level=args.log_level.upper())
+    pipeline.start()
+    try:
+        server = HeadlessServer(args.host, args.port, args.save_dir, args.engine)
+        try:
+            server.start()
+        except RuntimeError as e:
+            log.error("%s", e)
+            return 1
+        report = timings(server)
+        host, port = server.address[:2]
+        log.info(
+            "Ready on %s:%s in %.1f ms (imports %.1f ms)", host, port, report["startup_ms"], report["import_ms"]
+        )
+        if args.check:
+            server.stop()
+            print(json.dumps(report))
+            return 0
+
+        def request_stop(signum, frame):
+            log.info("Received signal %s, stopping", signum)
+            server.server_core.stop()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+        server.wait()
+        server.stop()
+        return 0
+    finally:
+        pipeline.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
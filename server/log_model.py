@@ -0,0 +1,90 @@
+from collections import deque
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QSortFilterProxyModel, Qt
+from PyQt5.QtGui import QColor
+
+from .log_pipeline import DEFAULT_LOG_LINES, LogFilter
+
+
+LOG_COLUMNS = ("Time", "Level", "Transfer", "Message")
+_LEVEL_COLORS = {"WARNING": QColor(180, 110, 0), "ERROR": QColor(200, 0, 0), "CRITICAL": QColor(200, 0, 0)}
+
+
+class LogModel(QAbstractTableModel):
+    """The last `max_lines` log entries, appended a batch at a time.
+
+    Each batch is one row insertion (plus one removal of the oldest rows once
+    full), so views relayout once per batch instead of once per line.
+    """
+
+    def __init__(self, max_lines=DEFAULT_LOG_LINES, parent=None):
+        super().__init__(parent)
+        self.max_lines = max_lines
+        self.entries = deque()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(LOG_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return LOG_COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entries[index.row()]
+        if role == Qt.DisplayRole:
+            column = index.column()
+            if column == 0:
+                return entry.time_text
+            if column == 1:
+                return entry.levelname
+            if column == 2:
+                return entry.transfer_id
+            return entry.message
+        if role == Qt.ForegroundRole:
+            return _LEVEL_COLORS.get(entry.levelname)
+        return None
+
+    def append(self, entries):
+        if not entries:
+            return
+        entries = entries[-self.max_lines:]
+        overflow = len(self.entries) + len(entries) - self.max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self.entries.popleft()
+            self.endRemoveRows()
+        first = len(self.entries)
+        self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+        self.entries.extend(entries)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.entries.clear()
+        self.endResetModel()
+
+
+class LogFilterProxy(QSortFilterProxyModel):
+    """Shows the LogModel rows that pass a LogFilter (level, transfer id)."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.log_filter = LogFilter()
+
+    def set_min_level(self, level):
+        self.log_filter.min_level = level
+        self.invalidateFilter()
+
+    def set_transfer_id(self, transfer_id):
+        self.log_filter.transfer_id = transfer_id.strip()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        return self.log_filter.accepts(self.sourceModel().entries[source_row])
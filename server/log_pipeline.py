@@ -0,0 +1,160 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from collections import deque
+
+
+LOGGER_NAME = "server"  # parent of every server.* module logger
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s [%(transfer_id)s] %(message)s"
+DEFAULT_MAX_QUEUE = 10000  # records waiting for the listener thread
+DEFAULT_LOG_LINES = 5000   # lines kept by the GUI log view
+
+
+class LogEntry:
+    """What a log view needs of a record, detached from the record."""
+
+    __slots__ = ("created", "level", "levelname", "name", "transfer_id", "message")
+
+    def __init__(self, created, level, levelname, name, transfer_id, message):
+        self.created = created
+        self.level = level
+        self.levelname = levelname
+        self.name = name
+        self.transfer_id = transfer_id
+        self.message = message
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(
+            record.created, record.levelno, record.levelname, record.name,
+            getattr(record, "transfer_id", ""), record.getMessage(),
+        )
+
+    @property
+    def time_text(self):
+        return time.strftime("%H:%M:%S", time.localtime(self.created)) + f".{int(self.created % 1 * 1000):03d}"
+
+
+class LogFilter:
+    """Level and transfer-id filter of a log view; "" matches every transfer."""
+
+    def __init__(self, min_level=logging.NOTSET, transfer_id=""):
+        self.min_level = min_level
+        self.transfer_id = transfer_id
+
+    def accepts(self, entry) -> bool:
+        if entry.level < self.min_level:
+            return False
+        return not self.transfer_id or entry.transfer_id == self.transfer_id
+
+
+class LogFeed(logging.Handler):
+    """Handler that keeps entries until a consumer (the GUI) drains them.
+
+    At most `capacity` entries wait; when the consumer falls behind, the
+    oldest are dropped rather than letting the backlog grow.
+    """
+
+    def __init__(self, capacity=DEFAULT_LOG_LINES, level=logging.NOTSET):
+        super().__init__(level)
+        self.capacity = capacity
+        self.dropped = 0
+        self._pending = deque(maxlen=capacity)
+        self._pending_lock = threading.Lock()
+
+    def emit(self, record):
+        entry = LogEntry.from_record(record)
+        with self._pending_lock:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append(entry)
+
+    def drain(self):
+        """Entries emitted since the last drain, oldest first."""
+        with self._pending_lock:
+            if not self._pending:
+                return []
+            entries = list(self._pending)
+            self._pending.clear()
+        return entries
+
+
+class _TransferIdDefault(logging.Filter):
+    # records logged without extra={"transfer_id": ...} still format
+    def filter(self, record):
+        if not hasattr(record, "transfer_id"):
+            record.transfer_id = ""
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    # never blocks the logging thread: a full queue drops the record
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    # stop() may find the queue full; wait for room for the sentinel
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class LogPipeline:
+    """Server logging through a bounded queue.
+
+    Loggers under `LOGGER_NAME` only enqueue records; one listener thread
+    formats them and hands them to `handlers` (console, LogFeed, ...), so a
+    slow console or GUI never stalls a connection.
+    """
+
+    def __init__(self, handlers=None, level=logging.INFO, max_queue=DEFAULT_MAX_QUEUE):
+        if handlers is None:
+            handlers = [logging.StreamHandler()]
+        formatter = logging.Formatter(LOG_FORMAT)
+        for handler in handlers:
+            if handler.formatter is None:
+                handler.setFormatter(formatter)
+        self.handlers = handlers
+        self.level = level
+        self.queue_handler = _DroppingQueueHandler(queue.Queue(max_queue))
+        self.queue_handler.addFilter(_TransferIdDefault())
+        self.listener = _QueueListener(
+            self.queue_handler.queue, *handlers, respect_handler_level=True
+        )
+        self._started = False
+
+    @property
+    def dropped(self):
+        return self.queue_handler.dropped
+
+    def start(self):
+        if self._started:
+            return
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.setLevel(self.level)
+        logger.addHandler(self.queue_handler)
+        logger.propagate = False
+        self.listener.start()
+        self._started = True
+        atexit.register(self.stop)
+
+    def stop(self):
+        # flushes what is queued, then detaches from the logger
+        if not self._started:
+            return
+        self._started = False
+        atexit.unregister(self.stop)
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.removeHandler(self.queue_handler)
+        logger.propagate = True
+        self.listener.stop()
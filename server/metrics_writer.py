@@ -0,0 +1,328 @@
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from .time_series import sample_rows
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 0.5  # seconds a row may wait for its batch to fill
+DEFAULT_MAX_QUEUE = 10000
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_DELAY = 0.5
+
+_WAKE = object()  # queued by stop() so the writer thread notices at once
+
+
+class MetricsWriter:
+    """Write-behind queue that stores TransferMetrics rows in bulk inserts.
+
+    A row may come with the transfer's time series, stored as TransferSample
+    blocks linked to the new row's id. `submit` only enqueues, so finishing
+    a transfer never waits on the database. A background thread flushes once
+    `batch_size` rows are queued or `flush_interval` has passed. Batches that
+    still fail after `retries` attempts, and rows submitted while the queue
+    is full or after stop(), are appended to a JSON-lines journal and
+    replayed after the next successful insert; replayed rows the database
+    still refuses, and unreadable lines, go to `rejected_path`.
+    `on_stored(committed)` callbacks let a caller learn when its row was
+    committed (True) or journaled instead (False).
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        journal_path,
+        batch_size=DEFAULT_BATCH_SIZE,
+        flush_interval=DEFAULT_FLUSH_INTERVAL,
+        max_queue=DEFAULT_MAX_QUEUE,
+        retries=DEFAULT_RETRIES,
+        retry_delay=DEFAULT_RETRY_DELAY,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.session_factory = session_factory  # context manager yielding a Session
+        self.journal_path = journal_path
+        self.rejected_path = journal_path + ".rejected"  # journaled rows the database refused
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.rows_written = 0
+        self.rows_spilled = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._journal_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._closed = False
+
+    def submit(self, metrics_dict: dict, series=None, on_stored=None) -> None:
+        # `series` is TransferProbe.time_series(); blocks are encoded on the
+        # writer thread. `on_stored` is called on the writer thread.
+        row = dict(metrics_dict)  # cut down to the table's columns in _insert
+        # stamp completion time now; the insert may happen much later
+        row.setdefault("timestamp", datetime.now(timezone.utc))
+        item = (row, series, on_stored)
+        with self._thread_lock:
+            queued = not self._closed
+            if queued:
+                self._start_thread()
+                try:
+                    self._queue.put_nowait(item)
+                except queue.Full:
+                    queued = False
+        if not queued:
+            # queue full, or stopped and nothing left to write it
+            self._spill([item])
+
+    def start(self) -> None:
+        with self._thread_lock:
+            self._closed = False
+            self._start_thread()
+
+    def _start_thread(self):
+        # called with _thread_lock held
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def flush(self) -> None:
+        """Block until every row submitted so far was written or spilled."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self) -> None:
+        # The thread drains the queue before it exits
+        with self._thread_lock:
+            self._closed = True  # later rows go to the journal until start()
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._stop.set()
+            try:
+                self._queue.put_nowait(_WAKE)  # end a wait for the first row
+            except queue.Full:
+                pass  # busy anyway, it will see the stop flag
+            thread.join()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        # nothing may end this thread early: flush() and every later row
+        # depend on it
+        self._replay_journal()
+        while True:
+            batch = self._next_batch()
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception:
+                    # not even the journal took them
+                    log.exception("%d metrics rows lost", len(batch))
+                    _notify_stored(batch, False)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+            elif self._stop.is_set():
+                return
+
+    def _next_batch(self):
+        # Wait for a first row, then collect until the batch is full, the
+        # flush interval is over or a row with an on_stored waiter arrives
+        # (plus whatever is queued behind it); during shutdown take what is
+        # queued
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            if self._stop.is_set():
+                timeout = 0
+            elif deadline is None:
+                timeout = self.flush_interval
+            else:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+            try:
+                row = self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait()
+            except queue.Empty:
+                if batch or self._stop.is_set():
+                    break
+                continue
+            if row is _WAKE:
+                self._queue.task_done()
+                continue
+            batch.append(row)
+            if row[2] is not None:
+                # someone waits for this row: take what is already queued
+                # along, then write without waiting for the interval
+                self._take_queued(batch)
+                break
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def _take_queued(self, batch):
+        while len(batch) < self.batch_size:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if row is _WAKE:
+                self._queue.task_done()
+                continue
+            batch.append(row)
+
+    def _write_batch(self, batch):
+        for attempt in range(self.retries):
+            try:
+                self._insert(batch)
+            except Exception as e:
+                log.warning("storing %d metrics rows failed (attempt %d): %s", len(batch), attempt + 1, e)
+                if attempt + 1 < self.retries and not self._stop.is_set():
+                    time.sleep(self.retry_delay * (2 ** attempt))
+                continue
+            self.rows_written += len(batch)
+            _notify_stored(batch, True)
+            self._replay_journal()
+            return
+        self._spill(batch)
+
+    def _insert(self, items):
+        # SQLAlchemy and the models load with the first rows to store, not
+        # when the server starts
+        from sqlalchemy import insert
+
+        from db.analytics import update_rollups
+        from db.transfer_metrics_model import TransferMetrics, TransferSample
+
+        rows = [TransferMetrics.values_from_metrics_dict(row) for row, _, _ in items]
+        with self.session_factory() as db:
+            # rollups change in the same transaction as the rows they count
+            update_rollups(db, rows)
+            if not any(series for _, series, _ in items):
+                db.execute(insert(TransferMetrics), rows)
+                return
+            # the sample blocks need the ids of the rows just inserted
+            ids = db.scalars(
+                insert(TransferMetrics).returning(TransferMetrics.id, sort_by_parameter_order=True),
+                rows,
+            ).all()
+            samples = [
+                sample
+                for transfer_id, (_, series, _) in zip(ids, items) if series
+                for sample in sample_rows(transfer_id, series)
+            ]
+            if samples:
+                db.execute(insert(TransferSample), samples)
+
+    def _spill(self, items):
+        with self._journal_lock:
+            _append_journal(self.journal_path, [_journal_line(item) for item in items])
+            self.rows_spilled += len(items)
+        log.warning("%d metrics rows spilled to %s", len(items), self.journal_path)
+        _notify_stored(items, False)
+
+    def _replay_journal(self):
+        # Runs after a successful insert, so the database is up. The journal
+        # is read `batch_size` lines at a time; lines that do not parse (a
+        # write torn by a crash) and rows the database refuses one at a time
+        # go to rejected_path instead of blocking the rest forever. If the
+        # replay breaks off, the journal is kept and replayed whole later, so
+        # rows stored before the break are stored twice.
+        with self._journal_lock:
+            if not os.path.exists(self.journal_path):
+                return
+            replayed = rejected = 0
+            try:
+                with open(self.journal_path, encoding="utf-8") as f:
+                    lines = (line for line in f if line.strip())
+                    while True:
+                        batch = list(itertools.islice(lines, self.batch_size))
+                        if not batch:
+                            break
+                        refused = self._replay_lines(batch)
+                        if refused:
+                            _append_journal(self.rejected_path, refused)
+                        self.rows_written += len(batch) - len(refused)
+                        replayed += len(batch) - len(refused)
+                        rejected += len(refused)
+                os.remove(self.journal_path)
+            except Exception:
+                log.exception("replaying the metrics journal failed, it is kept for the next attempt")
+                return
+        if replayed:
+            log.info("replayed %d journaled metrics rows", replayed)
+        if rejected:
+            log.error("%d journaled metrics rows were refused, moved to %s", rejected, self.rejected_path)
+
+    def _replay_lines(self, lines):
+        # returns the lines that could not be stored
+        items = []
+        refused = []
+        for line in lines:
+            try:
+                items.append((_item_from_json(line), line))
+            except Exception as e:
+                log.warning("unreadable metrics journal line: %s", e)
+                refused.append(line)
+        if not items:
+            return refused
+        try:
+            self._insert([item for item, _ in items])
+        except Exception as e:
+            log.warning("replaying %d journaled metrics rows failed (%s), retrying row by row", len(items), e)
+            for item, line in items:
+                try:
+                    self._insert([item])
+                except Exception as e:
+                    log.warning("journaled metrics row for %s refused: %s", item[0].get("file_name"), e)
+                    refused.append(line)
+        return refused
+
+
+def _notify_stored(items, committed):
+    for _, _, on_stored in items:
+        if on_stored is not None:
+            try:
+                on_stored(committed)
+            except Exception as e:
+                log.warning("metrics stored callback failed: %s", e)
+
+
+def _append_journal(path, lines):
+    with open(path, "a", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line.rstrip("\n") + "\n")  # a torn last line has no newline
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _journal_line(item):
+    row, series, _ = item
+    return json.dumps({"metrics": row, "series": series}, default=_json_default)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"cannot journal {type(value).__name__}")
+
+
+def _item_from_json(line):
+    item = json.loads(line)
+    row = item["metrics"]
+    if row.get("timestamp"):
+        row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+    return row, item["series"], None
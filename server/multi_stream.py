@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from common.protocol import ProtocolError
+
+
+DEFAULT_STREAM_EXPIRY = 60.0  # seconds an incomplete transfer waits for its missing streams
+
+
+class MultiStreamTransfer:
+    """One logical file received as N byte ranges over N connections."""
+
+    def __init__(self, transfer_id, file_name, file_type, file_path, total_size, stream_count):
+        self.transfer_id = transfer_id
+        self.file_name = file_name
+        self.file_type = file_type
+        self.file_path = file_path
+        self.total_size = total_size
+        self.stream_count = stream_count
+        self.start_time = time.time()
+        self.bytes_received = 0
+        self.stream_bytes = [0] * stream_count
+        self.stream_expected = [0] * stream_count
+        self.stream_times = [0.0] * stream_count
+        self.finished_streams = 0  # ended, cleanly or not
+        self.failed_streams = 0
+        self.active_streams = 0  # connected and not ended yet
+        self.joined = set()  # indices of the streams that connected
+        self.probe = None  # resource sampler probe shared by all streams
+        # result True once the first stream created the target file, False
+        # if it could not
+        self.allocated = Future()
+        self._expiry_timer = None
+        self._lock = threading.Lock()
+
+    def add_bytes(self, n: int) -> int:
+        with self._lock:
+            self.bytes_received += n
+            self.probe.bytes_received = self.bytes_received
+            return self.bytes_received
+
+    def stream_finished(self, index: int, received: int, expected: int, elapsed: float,
+                        failed: bool = False) -> bool:
+        """Record an ended stream; True once every stream has ended."""
+        with self._lock:
+            self.stream_bytes[index] = received
+            self.stream_expected[index] = expected
+            self.stream_times[index] = elapsed
+            self.finished_streams += 1
+            self.active_streams -= 1
+            if failed:
+                self.failed_streams += 1
+            return self.finished_streams == self.stream_count
+
+    @property
+    def failed(self) -> bool:
+        # a stream broke off, or some never connected
+        return bool(self.failed_streams) or self.finished_streams < self.stream_count
+
+    @property
+    def stream_throughputs(self):
+        # MB/s of each stream over its own lifetime
+        return [
+            (received / elapsed) / (1024 * 1024) if elapsed > 0 else 0.0
+            for received, elapsed in zip(self.stream_bytes, self.stream_times)
+        ]
+
+
+class MultiStreamRegistry:
+    """Transfers currently being reassembled, keyed by transfer id.
+
+    A transfer leaves the registry once all its streams ended, or when it
+    sat `expiry` seconds with no stream connected and some still missing;
+    `on_expired(transfer)` then finalizes it.
+    """
+
+    def __init__(self, expiry=DEFAULT_STREAM_EXPIRY):
+        self.expiry = expiry
+        self.on_expired = None  # function(transfer), on a timer thread
+        self._transfers = {}
+        self._lock = threading.Lock()
+
+    def join(self, transfer_id, index, file_name, file_type, file_path, total_size, stream_count, begin_probe):
+        """Register a connected stream; returns (transfer, created).
+
+        The stream that created the transfer must preallocate the target
+        file (outside this lock) and resolve `transfer.allocated`; the others
+        must describe the same transfer.
+        """
+        created = False
+        with self._lock:
+            transfer = self._transfers.get(transfer_id)
+            if transfer is None:
+                created = True
+                transfer = MultiStreamTransfer(
+                    transfer_id, file_name, file_type, file_path, total_size, stream_count
+                )
+                transfer.probe = begin_probe()
+                self._transfers[transfer_id] = transfer
+            elif (file_name, total_size, stream_count) != (
+                transfer.file_name, transfer.total_size, transfer.stream_count
+            ):
+                raise ProtocolError(
+                    f"stream {index} of transfer {transfer_id} does not match its first stream "
+                    f"({file_name!r}, {total_size} bytes, {stream_count} streams)"
+                )
+            if index in transfer.joined:
+                raise ProtocolError(f"stream {index} of transfer {transfer_id} is already connected")
+            transfer.joined.add(index)
+            if transfer._expiry_timer is not None:
+                transfer._expiry_timer.cancel()
+                transfer._expiry_timer = None
+            transfer.active_streams += 1
+            return transfer, created
+
+    def leave(self, transfer, index, received, expected, elapsed, failed=False) -> bool:
+        """Record an ended stream; True if the caller should finalize the transfer."""
+        done = transfer.stream_finished(index, received, expected, elapsed, failed)
+        with self._lock:
+            if self._transfers.get(transfer.transfer_id) is not transfer:
+                return False  # expired meanwhile
+            if done:
+                del self._transfers[transfer.transfer_id]
+                return True
+            if transfer.active_streams == 0 and transfer._expiry_timer is None:
+                # nobody is connected: give the missing streams `expiry` seconds
+                timer = threading.Timer(self.expiry, self._expire, (transfer,))
+                timer.daemon = True
+                transfer._expiry_timer = timer
+                timer.start()
+        return False
+
+    def _expire(self, transfer):
+        with self._lock:
+            if self._transfers.get(transfer.transfer_id) is not transfer or transfer.active_streams:
+                return
+            del self._transfers[transfer.transfer_id]
+            transfer._expiry_timer = None
+        if self.on_expired is not None:
+            self.on_expired(transfer)
+
+    def __len__(self):
+        return len(self._transfers)
+
+
+def preallocate(file_path, size):
+    with open(file_path, "wb") as f:
+        if size and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError:
+                pass  # filesystem without fallocate support
+        f.truncate(size)
+
+
+def open_range_writer(file_path, offset):
+    """Open `file_path` for writing at `offset`; returns (fd, write)."""
+    fd = os.open(file_path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+    position = offset
+
+    if hasattr(os, "pwrite"):
+        def write(data):
+            nonlocal position
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(fd, view, position)
+                position += written
+                view = view[written:]
+    else:
+        # no positional writes (Windows): this descriptor is private to the
+        # stream, so its own file position serves the same purpose
+        os.lseek(fd, offset, os.SEEK_SET)
+
+        def write(data):
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+
+    return fd, write
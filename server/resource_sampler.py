@@ -0,0 +1,221 @@
+import itertools
+import threading
+import time
+from array import array
+
+import psutil
+
+from .sample_series import SampleSeries
+from .time_series import RAW_TIER, SERIES, TIERS, Downsampler
+
+
+DEFAULT_SAMPLE_INTERVAL = 0.01  # seconds between samples (100 Hz)
+DEFAULT_CAPACITY = 65536        # samples kept, ~11 minutes at the default rate
+
+
+class TransferProbe:
+    """Byte counter of one transfer, read by the sampler thread.
+
+    The receive loop only bumps `bytes_received`; throughput samples are
+    appended by the sampler, and the CPU/RAM samples covering the transfer are
+    filled in when it ends. Every series is also downsampled into the
+    time_series tiers as it is recorded.
+    """
+
+    def __init__(self, start_index: int, transfer_id: str = "", file_name=None,
+                 file_size=None, client_address=None):
+        self.transfer_id = transfer_id
+        self.file_name = file_name
+        self.file_size = file_size
+        self.client_address = client_address
+        self.start_time = time.time()
+        self.start_index = start_index
+        self.end_index = None
+        self.bytes_received = 0
+        self.throughput_samples = SampleSeries()
+        self.throughput_times = SampleSeries()
+        self.cpu_samples = SampleSeries()
+        self.ram_samples = SampleSeries()
+        self.sample_times = []  # times of cpu_samples/ram_samples
+        self.downsamplers = {
+            name: [Downsampler(resolution) for resolution in TIERS.values()] for name in SERIES
+        }
+
+    def add(self, n: int) -> None:
+        self.bytes_received += n
+
+    def info(self) -> dict:
+        return {
+            "transfer_id": self.transfer_id,
+            "file_name": self.file_name,
+            "file_size": self.file_size,
+            "client_address": self.client_address,
+            "start_time": self.start_time,
+        }
+
+    def record(self, t, throughput, cpu, ram):
+        self.throughput_samples.append(throughput)
+        self.throughput_times.append(t)
+        for name, value in (("throughput", throughput), ("cpu", cpu), ("ram", ram)):
+            for downsampler in self.downsamplers[name]:
+                downsampler.add(t, value)
+
+    def time_series(self):
+        """{series: {tier: points}} for storing, see server.time_series."""
+        raw = {
+            "throughput": list(zip(self.throughput_times.values(), self.throughput_samples.values())),
+            "cpu": list(zip(self.sample_times, self.cpu_samples.values())),
+            "ram": list(zip(self.sample_times, self.ram_samples.values())),
+        }
+        return {
+            name: {
+                RAW_TIER: raw[name],
+                **{
+                    tier: downsampler.points()
+                    for tier, downsampler in zip(TIERS, self.downsamplers[name])
+                },
+            }
+            for name in SERIES
+        }
+
+
+class ResourceSampler:
+    """Process and system resources sampled on one thread for all transfers.
+
+    Samples go into a ring buffer indexed by a running sample count; sample i
+    lives at slot i % capacity. A transfer records the indices it spans, so N
+    concurrent transfers share one stream of psutil calls. Transfers longer
+    than the buffer keep only the most recent `capacity` samples. With no
+    transfer active the thread sleeps instead of sampling.
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL, capacity: int = DEFAULT_CAPACITY):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.interval = interval
+        self.capacity = capacity
+        self.on_sample = None  # function(probe, throughput, cpu, ram), once per active transfer
+        self.count = 0  # samples taken so far
+        self.times = array("d", [0.0]) * capacity
+        self.cpu = array("d", [0.0]) * capacity         # process CPU %
+        self.ram = array("d", [0.0]) * capacity         # process RAM %
+        self.system_cpu = array("d", [0.0]) * capacity
+        self.system_ram = array("d", [0.0]) * capacity
+        self.process = psutil.Process()
+        # the first cpu_percent call only sets the reference point
+        self.process.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None)
+        self._probes = set()
+        self._transfer_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._busy = threading.Event()  # set while a transfer is active
+        self._thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+        self._stop.clear()
+        with self._lock:
+            if not self._probes:
+                self._busy.clear()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._busy.set()  # wake a parked thread
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        # parked while no transfer is active; begin() wakes it
+        while True:
+            self._busy.wait()
+            if self._stop.is_set():
+                return
+            self.sample()
+            if self._stop.wait(self.interval):
+                return
+
+    def sample(self) -> None:
+        now = time.time()
+        cpu = self.process.cpu_percent(interval=None)
+        ram = self.process.memory_percent()
+        system_cpu = psutil.cpu_percent(interval=None)
+        system_ram = psutil.virtual_memory().percent
+        with self._lock:
+            slot = self.count % self.capacity
+            self.times[slot] = now
+            self.cpu[slot] = cpu
+            self.ram[slot] = ram
+            self.system_cpu[slot] = system_cpu
+            self.system_ram[slot] = system_ram
+            self.count += 1
+            # recorded under the lock, so a probe that end() returned is
+            # never appended to while its series are being read
+            readings = []
+            for probe in self._probes:
+                elapsed = now - probe.start_time
+                throughput = probe.bytes_received / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+                probe.record(now, throughput, cpu, ram)
+                readings.append((probe, throughput))
+
+        if self.on_sample is not None:
+            for probe, throughput in readings:
+                self.on_sample(probe, throughput, cpu, ram)
+
+    def begin(self, file_name=None, file_size=None, client_address=None) -> TransferProbe:
+        # Without the thread (e.g. handle_client called directly), or while
+        # it is parked and its last sample is stale, sample inline so every
+        # transfer starts with a current reading
+        if not self.is_running or not self._busy.is_set():
+            self.sample()
+        with self._lock:
+            # include the latest sample taken before the transfer started
+            probe = TransferProbe(
+                max(self.count - 1, 0), str(next(self._transfer_ids)),
+                file_name, file_size, client_address,
+            )
+            self._probes.add(probe)
+            self._busy.set()
+        return probe
+
+    def end(self, probe: TransferProbe) -> TransferProbe:
+        if not self.is_running:
+            self.sample()
+        with self._lock:
+            self._probes.discard(probe)
+            if not self._probes:
+                self._busy.clear()
+            probe.end_index = self.count
+            probe.cpu_samples = SampleSeries(self._window(self.cpu, probe.start_index, probe.end_index))
+            probe.ram_samples = SampleSeries(self._window(self.ram, probe.start_index, probe.end_index))
+            times = self._window(self.times, probe.start_index, probe.end_index)
+            # SampleSeries keeps only its latest `capacity` values
+            probe.sample_times = times[len(times) - len(probe.cpu_samples):]
+        return probe
+
+    def samples(self, start: int, end: int):
+        """(times, cpu, ram, system_cpu, system_ram) for sample indices [start, end)."""
+        with self._lock:
+            return tuple(
+                self._window(series, start, end)
+                for series in (self.times, self.cpu, self.ram, self.system_cpu, self.system_ram)
+            )
+
+    def _window(self, series, start, end):
+        start = max(start, self.count - self.capacity, 0)
+        end = min(end, self.count)
+        return [series[i % self.capacity] for i in range(start, end)]
+
+    @property
+    def active_transfers(self) -> int:
+        return len(self._probes)
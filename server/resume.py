@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import time
+
+from common.protocol import ProtocolError
+
+
+DEFAULT_CHECKPOINT_BYTES = 16 * 1024 * 1024
+PARTIAL_DIR = ".partial"  # inside save_dir
+TAKEOVER_TIMEOUT = 10.0  # seconds a reconnect waits for the connection it replaces
+
+
+class ResumeStore:
+    """Partial files and their manifests for resumable transfers.
+
+    A transfer with file id X is received into `<save_dir>/.partial/X.part`.
+    `X.json` records the file identity and how many bytes of the part file
+    have been fsynced; a reconnecting client continues from that offset.
+    """
+
+    def __init__(self, save_dir, takeover_timeout=TAKEOVER_TIMEOUT):
+        self.partial_dir = os.path.join(save_dir, PARTIAL_DIR)
+        self.takeover_timeout = takeover_timeout
+        self._active = {}  # file id -> abort function of the connection holding it
+        self._released = threading.Condition()
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+    def part_path(self, file_id):
+        return os.path.join(self.partial_dir, file_id + ".part")
+
+    def manifest_path(self, file_id):
+        return os.path.join(self.partial_dir, file_id + ".json")
+
+    def begin(self, file_id, file_name, file_type, file_size, abort=None):
+        """Claim `file_id` for one connection; returns the committed offset.
+
+        A connection still holding the claim, typically one left half-open
+        by the very drop the client reconnects after, is aborted and waited
+        for. `abort` is how a later reconnect ends this connection.
+        """
+        deadline = time.monotonic() + self.takeover_timeout
+        with self._released:
+            while file_id in self._active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ProtocolError(f"transfer {file_id} is already in progress")
+                holder_abort = self._active[file_id]
+                if holder_abort is not None:
+                    holder_abort()
+                self._released.wait(remaining)
+            self._active[file_id] = abort
+
+        try:
+            committed = 0
+            manifest = self._load_manifest(file_id)
+            part_path = self.part_path(file_id)
+            if (
+                manifest is not None
+                and manifest.get("file_name") == file_name
+                and manifest.get("file_size") == file_size
+                and os.path.exists(part_path)
+            ):
+                committed = min(int(manifest.get("committed", 0)), os.path.getsize(part_path))
+
+            # anything past the last checkpoint was never made durable
+            with open(part_path, "ab") as f:
+                f.truncate(committed)
+            if committed == 0:
+                self._write_manifest(file_id, file_name, file_type, file_size, 0)
+            return committed
+        except Exception:
+            self.end(file_id)
+            raise
+
+    def checkpoint(self, file_id, f, committed):
+        # data first, then the manifest that vouches for it
+        f.flush()
+        os.fsync(f.fileno())
+        manifest = self._load_manifest(file_id) or {}
+        self._write_manifest(
+            file_id,
+            manifest.get("file_name"),
+            manifest.get("file_type"),
+            manifest.get("file_size"),
+            committed,
+        )
+
+    def complete(self, file_id, final_path):
+        os.replace(self.part_path(file_id), final_path)
+        try:
+            os.remove(self.manifest_path(file_id))
+        except FileNotFoundError:
+            pass
+
+    def end(self, file_id):
+        with self._released:
+            self._active.pop(file_id, None)
+            self._released.notify_all()
+
+    def _load_manifest(self, file_id):
+        try:
+            with open(self.manifest_path(file_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_manifest(self, file_id, file_name, file_type, file_size, committed):
+        path = self.manifest_path(file_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "file_name": file_name,
+                    "file_type": file_type,
+                    "file_size": file_size,
+                    "committed": committed,
+                },
+                f,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
@@ -0,0 +1,108 @@
+import math
+from array import array
+
+_NOT_LOADED = object()
+np = _NOT_LOADED  # numpy once _numpy() ran, None if it is not installed
+
+
+DEFAULT_SERIES_CAPACITY = 8192
+
+
+def _numpy():
+    # numpy takes longer to import than the rest of the server, and is only
+    # needed for percentiles at the end of a transfer
+    global np
+    if np is _NOT_LOADED:
+        try:
+            import numpy
+        except ImportError:  # numpy comes with pyqtgraph; headless installs may lack it
+            numpy = None
+        np = numpy
+    return np
+
+
+class SampleSeries:
+    """Bounded series of float samples with running statistics.
+
+    The latest `capacity` samples are kept in an array('d') ring buffer;
+    count, min, max, mean and variance cover every sample ever appended
+    (Welford's algorithm), so memory stays fixed on long transfers.
+    Percentiles are computed over the retained samples.
+    """
+
+    __slots__ = ("capacity", "count", "min", "max", "mean", "_m2", "_buffer", "_next")
+
+    def __init__(self, values=(), capacity: int = DEFAULT_SERIES_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.count = 0
+        self.min = 0.0
+        self.max = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._buffer = array("d")
+        self._next = 0  # ring slot written next once the buffer is full
+        self.extend(values)
+
+    def append(self, value: float) -> None:
+        value = float(value)
+        self.count += 1
+        if self.count == 1:
+            self.min = self.max = value
+        elif value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        if len(self._buffer) < self.capacity:
+            self._buffer.append(value)
+        else:
+            self._buffer[self._next] = value
+            self._next = (self._next + 1) % self.capacity
+
+    def extend(self, values) -> None:
+        for value in values:
+            self.append(value)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def values(self) -> array:
+        """Retained samples, oldest first."""
+        return self._buffer[self._next:] + self._buffer[:self._next]
+
+    def percentiles(self, qs):
+        # Linearly interpolated, like numpy.percentile; zeros when empty
+        if not self._buffer:
+            return [0.0 for _ in qs]
+        np = _numpy()
+        if np is not None:
+            data = np.frombuffer(self._buffer, dtype=np.float64)
+            return [float(v) for v in np.percentile(data, qs)]
+        ordered = sorted(self._buffer)
+        last = len(ordered) - 1
+        result = []
+        for q in qs:
+            position = last * q / 100
+            low = math.floor(position)
+            high = min(low + 1, last)
+            result.append(ordered[low] + (ordered[high] - ordered[low]) * (position - low))
+        return result
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def __iter__(self):
+        return iter(self.values())
+
+    def __bool__(self):
+        return self.count > 0
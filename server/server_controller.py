@@ -1,30 +1,78 @@
-from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
 from .server_core import ServerCore
+from .buffer_pool import DEFAULT_CHUNK_SIZE
+from .signal_bridge import DEFAULT_EMIT_INTERVAL_MS, DEFAULT_MAX_SAMPLES, SampleCoalescer
+from .log_pipeline import DEFAULT_LOG_LINES, LogFeed, LogPipeline
+import logging
 import threading
 
 
 class ServerController(QObject):
     # Qt signals for the view
-    realtime_signal = pyqtSignal(float, float, float)  # throughput, cpu, ram
+    # {transfer_id: [(throughput, cpu, ram, bytes_received), ...]} of the
+    # samples since the last batch
+    realtime_signal = pyqtSignal(dict)
+    transfer_started_signal = pyqtSignal(dict)  # TransferProbe.info()
     metrics_signal = pyqtSignal(dict)  # final metrics dict
+    session_signal = pyqtSignal(dict)  # summary of a multi-file session
+    log_signal = pyqtSignal(list)  # LogEntry batch, oldest first
 
-    def __init__(self, host=None, port=5000, save_dir="received_files"):
+    def __init__(
+        self,
+        host=None,
+        port=5000,
+        save_dir="received_files",
+        engine="threaded",
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        realtime_mode="all",
+        realtime_max_samples=DEFAULT_MAX_SAMPLES,
+        realtime_interval_ms=DEFAULT_EMIT_INTERVAL_MS,
+        log_level=logging.INFO,
+        log_lines=DEFAULT_LOG_LINES,
+    ):
         super().__init__()
-        self.server_core = ServerCore(host, port, save_dir)
+        # server logs go to the console and, in batches, to the view
+        self.log_feed = LogFeed(log_lines)
+        self.log_pipeline = LogPipeline([logging.StreamHandler(), self.log_feed], level=log_level)
+        self.log_pipeline.start()
+        self.server_core = ServerCore(host, port, save_dir, engine=engine, chunk_size=chunk_size)
         self.server_thread = None
+        # Worker threads only push samples; this timer, on the controller's
+        # (GUI) thread, emits them as one batch at a bounded rate
+        self.realtime_samples = SampleCoalescer(realtime_mode, realtime_max_samples)
+        self.realtime_timer = QTimer(self)
+        self.realtime_timer.timeout.connect(self._emit_realtime_batch)
+        self.realtime_timer.start(realtime_interval_ms)
         self._setup_callbacks()
 
     def _setup_callbacks(self):
         # Connect ServerCore callbacks to Qt signals
         self.server_core.on_realtime_metrics = self._emit_realtime_metrics
+        self.server_core.on_transfer_started = self._emit_transfer_started
         self.server_core.on_final_metrics = self._emit_final_metrics
+        self.server_core.on_session_metrics = self._emit_session_metrics
 
-    def _emit_realtime_metrics(self, throughput, cpu, ram):
-        self.realtime_signal.emit(throughput, cpu, ram)
+    def _emit_realtime_metrics(self, transfer_id, throughput, cpu, ram, bytes_received):
+        # called on sampler/worker threads: no Qt call here
+        self.realtime_samples.push((throughput, cpu, ram, bytes_received), key=transfer_id)
+
+    def _emit_transfer_started(self, info):
+        self.transfer_started_signal.emit(info)
+
+    def _emit_realtime_batch(self):
+        batch = self.realtime_samples.drain()
+        if batch:
+            self.realtime_signal.emit(batch)
+        entries = self.log_feed.drain()
+        if entries:
+            self.log_signal.emit(entries)
 
     def _emit_final_metrics(self, metrics_dict):
         self.metrics_signal.emit(metrics_dict)
 
+    def _emit_session_metrics(self, session_dict):
+        self.session_signal.emit(session_dict)
+
 
     def start_server(self):
         if self.server_thread is None or not self.server_thread.is_alive():
@@ -1,51 +1,163 @@
-
+import functools
+import logging
 import socket
 import os
 import threading
 import time
-import psutil
-from .server_model import FileTransferMetrics
+from concurrent.futures import Future
+from concurrent.futures import wait as wait_futures
+from .server_model import FileTransferMetrics, SessionMetrics
+from .buffer_pool import BufferPool, DEFAULT_CHUNK_SIZE
+from .chunk_store import ChunkStore
+from .metrics_writer import MetricsWriter
+from .multi_stream import DEFAULT_STREAM_EXPIRY, MultiStreamRegistry, open_range_writer, preallocate
+from .resource_sampler import DEFAULT_SAMPLE_INTERVAL, ResourceSampler
+from .resume import DEFAULT_CHECKPOINT_BYTES, PARTIAL_DIR, ResumeStore
+from common.checksum import StreamingChecksum
+from common.compression import BLOCK_HEADER, CODEC_NAMES, Decompressor
+from common.protocol import (
+    ACK_CHECKSUM_MISMATCH,
+    ACK_FRAME,
+    ACK_INCOMPLETE,
+    ACK_OK,
+    ACK_STORED_FILE,
+    ACK_STORED_METRICS,
+    DEDUP_DIGEST_SIZE,
+    DEDUP_PARAMS,
+    EXT_CHECKSUM,
+    EXT_COMPRESSION,
+    EXT_DEDUP,
+    EXT_FILE_ID,
+    EXT_RANGE,
+    EXT_TRANSFER_ID,
+    FLAG_ACK,
+    FLAG_DEDUP,
+    FLAG_RANGE,
+    FLAG_RESUMABLE,
+    FLAG_SESSION,
+    MAX_DEDUP_CHUNK_SIZE,
+    MIN_DEDUP_CHUNK_SIZE,
+    RESUME_REPLY,
+    ProtocolError,
+    dedup_chunk_count,
+    parse_header,
+    unpack_range,
+)
 from typing import Callable, Optional
-from db.database import SessionLocal, get_session
-from db.transfer_metrics_model import TransferMetrics
 
 
-class ServerCore:
-    on_realtime_metrics: Optional[Callable[[float, float, float], None]] = None
-    on_final_metrics: Optional[Callable[[dict], None]] = None
+log = logging.getLogger(__name__)
+
+ENGINES = ("threaded", "asyncio")
+DEFAULT_ACK_COMMIT_TIMEOUT = 5.0
+
+# I/O requests yielded by ServerCore._serve_connection. The connection logic is
+# written once as a generator; each engine performs the requested I/O in its
+# own way (blocking calls on a thread, or awaits on the event loop).
+_RECV_INTO = "recv_into"  # arg: writable memoryview, result: bytes read (0 on EOF)
+_SENDALL = "sendall"      # arg: bytes, result: None
+_BLOCKING = "blocking"    # arg: callable, result: its return value
+_WAIT = "wait"            # arg: (concurrent Future, timeout), result: None once done or timed out
+
+# Server bookkeeping inside save_dir, out of reach of uploaded file names
+_CHUNK_DIR = ".chunks"
+_JOURNAL_NAME = ".metrics_journal.jsonl"
+_RESERVED_NAMES = (_CHUNK_DIR, PARTIAL_DIR)
 
 
-    def __init__(self, host=None, port=5000, save_dir="received_files"):
+class ServerCore:
+    on_realtime_metrics: Optional[Callable[[str, float, float, float, int], None]] = None
+    on_transfer_started: Optional[Callable[[dict], None]] = None
+    on_final_metrics: Optional[Callable[[dict], None]] = None
+    on_session_metrics: Optional[Callable[[dict], None]] = None
+
+
+    def __init__(
+        self,
+        host=None,
+        port=5000,
+        save_dir="received_files",
+        engine="threaded",
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        checkpoint_bytes=DEFAULT_CHECKPOINT_BYTES,
+        sample_interval=DEFAULT_SAMPLE_INTERVAL,
+        ack_commit_timeout=DEFAULT_ACK_COMMIT_TIMEOUT,
+        stream_expiry=DEFAULT_STREAM_EXPIRY,
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
         self.host = host or socket.gethostname()
         self.port = port
+        self.engine = engine
         self.server_socket = None
         self.is_running = False
         self.save_dir = save_dir
+        # receive buffers shared by every connection (recv_into, no per-chunk allocation)
+        self.buffer_pool = BufferPool(chunk_size)
+        # multi-stream transfers whose ranges are still arriving; one whose
+        # missing streams have not connected for `stream_expiry` s fails
+        self._multi_streams = MultiStreamRegistry(stream_expiry)
+        self._multi_streams.on_expired = self._finish_range_transfer
+        # how often resumable transfers fsync and record their offset
+        self.checkpoint_bytes = checkpoint_bytes
+        # longest an acknowledged upload waits for its metrics row
+        self.ack_commit_timeout = ack_commit_timeout
+        # one thread samples CPU/RAM for every transfer; receive loops only
+        # count bytes
+        self.resource_sampler = ResourceSampler(sample_interval)
+        self.resource_sampler.on_sample = self._emit_realtime
         # self.sessionLocal = SessionLocal()
 
+        # Event loop state, only used by the asyncio engine
+        self._loop = None
+        self._accept_task = None
 
         # Callbacks for metrics reporting
-        self.on_realtime_metrics = None  # function(throughput, cpu, ram)
+        self.on_realtime_metrics = None  # function(transfer_id, throughput, cpu, ram, bytes_received)
+        self.on_transfer_started = None  # function(transfer_dict), see TransferProbe.info
         self.on_final_metrics = None     # function(metrics_dict)
+        self.on_session_metrics = None   # function(session_dict), per session connection
 
         if not os.path.exists(self.save_dir):
             os.makedirs(self.save_dir)
+        self.resume_store = ResumeStore(self.save_dir)
+        self.chunk_store = ChunkStore(os.path.join(self.save_dir, _CHUNK_DIR))
+        # metrics rows are stored in bulk by a background thread; rows the
+        # database refuses wait in the journal
+        self.metrics_writer = MetricsWriter(
+            _db_session, os.path.join(self.save_dir, _JOURNAL_NAME)
+        )
 
 
     def start(self):
         self.server_socket = socket.socket()
         self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(5)
-        print(f"Server is listening on {self.host}:{self.port}")
+        if self.engine == "asyncio":
+            # a single event loop serves every connection, so let the kernel
+            # queue bursts of uploaders instead of refusing them
+            self.server_socket.listen(socket.SOMAXCONN)
+        else:
+            self.server_socket.listen(5)
+        log.info("Server is listening on %s:%s (pid %s)", self.host, self.port, os.getpid())
         self.is_running = True
-        print('PID server:', os.getpid())
+        self.resource_sampler.start()
+        self.metrics_writer.start()
+
+        if self.engine == "asyncio":
+            # the threaded engine never needs asyncio, so only this one loads it
+            import asyncio
+
+            self.server_socket.setblocking(False)
+            asyncio.run(self._accept_loop_async())
+            return
 
         while self.is_running:
             try:
                 conn, addr = self.server_socket.accept()
             except OSError:
                 break
-            print(f"Connection from {addr}")
+            log.info("Connection from %s", _format_address(addr))
+            _enable_keepalive(conn)
 
             client_thread = threading.Thread(
                 target=self.handle_client,
@@ -53,137 +165,728 @@ class ServerCore:
                 daemon=True
             )
             client_thread.start()
-            print(f"Active connections {threading.active_count() - 1}")
+            log.debug("Active connections %d", threading.active_count() - 1)
 
-    def handle_client(self, conn, addr):
+    async def _accept_loop_async(self):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._accept_task = asyncio.current_task()
+        client_tasks = set()
         try:
-            
-            header_bytes = b""
-            while True:
-                byte = conn.recv(1)
-                if byte == b"\n" or not byte:
+            while self.is_running:
+                try:
+                    conn, addr = await loop.sock_accept(self.server_socket)
+                except OSError:
                     break
-                header_bytes += byte
+                log.info("Connection from %s", _format_address(addr))
+                _enable_keepalive(conn)
+
+                task = loop.create_task(self._handle_client_async(conn, addr))
+                client_tasks.add(task)
+                task.add_done_callback(client_tasks.discard)
+                log.debug("Active connections %d", len(client_tasks))
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop = None
+            self._accept_task = None
+            self.server_socket.close()
 
-            header = header_bytes.decode(errors="ignore")
+    def handle_client(self, conn, addr):
+        steps = self._serve_connection(addr, functools.partial(_abort_connection, conn))
+        result = None
+        error = None
+        try:
+            while True:
+                if error is None:
+                    op, arg = steps.send(result)
+                else:
+                    op, arg = steps.throw(error)
+                error = None
+                try:
+                    if op == _RECV_INTO:
+                        result = conn.recv_into(arg)
+                    elif op == _SENDALL:
+                        result = conn.sendall(arg)
+                    elif op == _WAIT:
+                        wait_futures([arg[0]], timeout=arg[1])
+                        result = None
+                    else:
+                        result = arg()
+                except Exception as e:
+                    error = e
+        except StopIteration:
+            pass
+        finally:
+            conn.close()
 
-            try:
-                file_name, file_size_str, file_type = header.split('|')
-                expected_size = int(file_size_str)
-            except Exception:
-                file_name = "unknown"
-                file_type = ""
-                expected_size = None
-
-            print(f"Receiving file: {file_name} from {addr}")
-            file_path = os.path.join(self.save_dir, file_name)
-
-            
-            start_time = time.time()
-            bytes_received = 0
-            throughput_samples = []
-            cpu_samples = []
-            ram_samples = []
-            last_sample_time = start_time
-
-            process = psutil.Process()
-            cpu_samples.append(process.cpu_percent(interval=None))
-            ram_samples.append(process.memory_percent())
-
-            
-            sample_interval = 0.001
+    async def _handle_client_async(self, conn, addr):
+        import asyncio
 
-            with open(file_path, "wb") as f:
-                while True:
-                    data = conn.recv(4096)
-                    if not data:
-                        break
+        loop = asyncio.get_running_loop()
+        conn.setblocking(False)
+        steps = self._serve_connection(addr, lambda: loop.call_soon_threadsafe(_abort_connection, conn))
+        result = None
+        error = None
+        try:
+            while True:
+                if error is None:
+                    op, arg = steps.send(result)
+                else:
+                    op, arg = steps.throw(error)
+                error = None
+                try:
+                    if op == _RECV_INTO:
+                        result = await loop.sock_recv_into(conn, arg)
+                    elif op == _SENDALL:
+                        result = await loop.sock_sendall(conn, arg)
+                    elif op == _WAIT:
+                        # no executor thread is held while waiting
+                        await asyncio.wait([asyncio.wrap_future(arg[0])], timeout=arg[1])
+                        result = None
+                    else:
+                        result = await loop.run_in_executor(None, arg)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error = e
+        except StopIteration:
+            pass
+        finally:
+            steps.close()
+            conn.close()
 
-                    f.write(data)
-                    bytes_received += len(data)
-
-                    now = time.time()
-                    if now - last_sample_time >= sample_interval:
-                        elapsed = now - start_time
-                        if elapsed > 0:
-                            current_throughput = (
-                                bytes_received / elapsed / (1024 * 1024)
-                            )  # MB/s
-                        else:
-                            current_throughput = 0.0
-
-                        cpu_val = process.cpu_percent(interval=None)
-                        ram_val = process.memory_percent()
-
-                        throughput_samples.append(current_throughput)
-                        cpu_samples.append(cpu_val)
-                        ram_samples.append(ram_val)
-
-                        last_sample_time = now
-
-                        if self.on_realtime_metrics is not None:
-                            try:
-                                self.on_realtime_metrics(
-                                    float(current_throughput),
-                                    float(cpu_val),
-                                    float(ram_val),
-                                )
-                            except Exception as e:
-                                print(f"[WARN] realtime metrics callback failed: {e}")
-
-            stop_time = time.time()
-            total_transfer_time = stop_time - start_time
-
-            if total_transfer_time > 0:
-                avg_throughput = (bytes_received / total_transfer_time) / (1024 * 1024)
+    def _serve_connection(self, addr, abort=None):
+        # `abort()` ends this connection from any thread, waking a pending recv
+        buf = self.buffer_pool.acquire()
+        inbound = _Inbound(memoryview(buf))
+        try:
+            header = yield from self._read_header(inbound)
+
+            if header.flags & FLAG_SESSION:
+                yield from self._receive_session(addr, header, inbound)
+            elif header.flags & FLAG_RANGE:
+                yield from self._receive_range(addr, header, inbound)
+            elif header.flags & FLAG_DEDUP:
+                yield from self._receive_dedup(addr, header, inbound)
+            elif header.flags & FLAG_RESUMABLE:
+                yield from self._receive_resumable(addr, header, inbound, abort)
             else:
-                avg_throughput = 0.0
+                yield from self._receive_file(addr, header, inbound)
 
-            peak_throughput = max(throughput_samples) if throughput_samples else avg_throughput
-            transfer_byte_difference = (
-                expected_size - bytes_received
-                if expected_size is not None
-                else 0
-            )
-            transfer_status = (
-                "Success"
-                if expected_size is not None and expected_size == bytes_received
-                else "Failed"
-            )
+        except Exception as e:
+            log.error("Error handling client %s: %s", _format_address(addr), e)
 
-            metrics = FileTransferMetrics(
-                file_name=file_name,
-                file_size=expected_size if expected_size is not None else bytes_received,
-                file_type=file_type,
-                total_transfer_time=total_transfer_time,
-                throughput=avg_throughput,
-                peak_throughput=peak_throughput,
-                transfer_byte_difference=transfer_byte_difference,
-                transfer_status=transfer_status,
-                cpu_usage_samples=cpu_samples,
-                ram_usage_samples=ram_samples,
+        finally:
+            inbound.view.release()
+            self.buffer_pool.release(buf)
+
+    def _read_header(self, inbound, allow_eof=False):
+        # Read the header from as few recv calls as possible; anything
+        # received past its end stays buffered as the start of the payload.
+        # With allow_eof, a clean EOF before the header returns None.
+        while True:
+            if allow_eof and inbound.eof and inbound.start == inbound.end:
+                return None
+            parsed = parse_header(inbound.unread(), eof=inbound.eof)
+            if parsed is not None:
+                header, consumed = parsed
+                inbound.start += consumed
+                return header
+            inbound.compact()
+            if inbound.end == len(inbound.view):
+                raise ProtocolError("header does not fit in the receive buffer")
+            n = yield _RECV_INTO, inbound.view[inbound.end:]
+            inbound.end += n
+            inbound.eof = not n
+
+    def _receive_session(self, addr, header, inbound):
+        # One connection carrying many files: each header is followed by
+        # exactly file_size payload bytes, then the next header or EOF
+        log.info("Session from %s", _format_address(addr))
+        session_start = time.time()
+        file_count = 0
+        failed_count = 0
+        total_bytes = 0
+
+        while header is not None:
+            if not header.flags & FLAG_SESSION or header.file_size is None:
+                raise ProtocolError("session frames need a binary header with FLAG_SESSION")
+            metrics = yield from self._receive_file(addr, header, inbound, limit=header.file_size)
+            file_count += 1
+            total_bytes += metrics.file_size - metrics.transfer_byte_difference
+            if metrics.transfer_status != "Success":
+                # a short payload means EOF, which ends the loop below
+                failed_count += 1
+            header = yield from self._read_header(inbound, allow_eof=True)
+
+        summary = SessionMetrics(
+            client_address=_format_address(addr),
+            file_count=file_count,
+            failed_count=failed_count,
+            total_bytes=total_bytes,
+            total_time=time.time() - session_start,
+        )
+        if self.on_session_metrics is not None:
+            try:
+                self.on_session_metrics(summary.to_dict())
+            except Exception as e:
+                log.warning("session metrics callback failed: %s", e)
+
+    def _receive_file(self, addr, header, inbound, limit=None):
+        file_name = header.file_name
+        file_type = header.file_type
+        expected_size = header.file_size
+
+        file_path = self._target_path(file_name)
+
+        codec_id = header.extensions.get(EXT_COMPRESSION)
+        checksum_id = header.extensions.get(EXT_CHECKSUM)
+        checksum = StreamingChecksum.from_id(checksum_id[0]) if checksum_id else None
+        if checksum is not None:
+            # a trailer follows the payload, so it must end at file_size
+            limit = expected_size
+
+        # a single upload may ask to be told when the file is durable
+        want_ack = bool(header.flags & FLAG_ACK) and not header.flags & FLAG_SESSION
+        server_start = time.perf_counter()
+        disk_time = 0.0
+
+        probe = self._begin_transfer(addr, file_name, expected_size)
+        log.info("Receiving file: %s from %s", file_name, _format_address(addr), extra=_extra(probe))
+        try:
+            with open(file_path, "wb") as f:
+                def timed_write(data):
+                    nonlocal disk_time
+                    started = time.perf_counter()
+                    f.write(data)
+                    disk_time += time.perf_counter() - started
+
+                def hashed_write(data):
+                    # hash the very buffers that are written, no second pass
+                    checksum.update(data)
+                    write_file(data)
+
+                write_file = timed_write if want_ack else f.write
+                write = hashed_write if checksum is not None else write_file
+
+                if codec_id:
+                    # compressed payloads delimit themselves, so no limit
+                    wire_bytes = yield from self._receive_compressed(inbound, write, probe.add, codec_id[0])
+                else:
+                    wire_bytes = yield from self._receive_payload(inbound, write, probe.add, limit=limit)
+                receive_time = time.perf_counter() - server_start
+
+                if want_ack:
+                    started = time.perf_counter()
+                    yield _BLOCKING, lambda: (f.flush(), os.fsync(f.fileno()))
+                    disk_time += time.perf_counter() - started
+
+            checksum_ok = None
+            if checksum is not None:
+                trailer = yield from self._read_exact(inbound, checksum.digest_size)
+                checksum_ok = trailer is not None and trailer == checksum.digest()
+                if trailer is not None:
+                    wire_bytes += len(trailer)
+                if not checksum_ok:
+                    log.warning(
+                        "checksum mismatch for %s from %s", file_name, _format_address(addr), extra=_extra(probe)
+                    )
+        finally:
+            self.resource_sampler.end(probe)
+
+        metrics = self._build_metrics(
+            file_name, expected_size, file_type, probe.bytes_received,
+            probe.start_time, time.time(), probe,
+            wire_bytes=wire_bytes,
+            compression=CODEC_NAMES.get(codec_id[0]) if codec_id else None,
+            checksum=checksum, checksum_ok=checksum_ok,
+        )
+        if not want_ack:
+            self._finish_transfer(metrics, probe)
+            return metrics
+
+        # wait (bounded) for the metrics row to be committed, then report
+        # where the server's time went
+        stored = Future()
+        started = time.perf_counter()
+        self._finish_transfer(metrics, probe, stored.set_result)
+        yield _WAIT, (stored, self.ack_commit_timeout)
+        commit_time = time.perf_counter() - started
+
+        if checksum_ok is False:
+            status = ACK_CHECKSUM_MISMATCH
+        elif metrics.transfer_status != "Success":
+            status = ACK_INCOMPLETE
+        else:
+            status = ACK_OK
+        committed = stored.done() and stored.result()
+        stored_flags = ACK_STORED_FILE | (ACK_STORED_METRICS if committed else 0)
+        ack = ACK_FRAME.pack(
+            status, stored_flags, probe.bytes_received,
+            receive_time, disk_time, commit_time, time.perf_counter() - server_start,
+        )
+        try:
+            yield _SENDALL, ack
+        except OSError as e:
+            # the client did not wait for it
+            log.debug("acknowledgement not delivered: %s", e, extra=_extra(probe))
+        return metrics
+
+    def _receive_resumable(self, addr, header, inbound, abort=None):
+        # Tell the client how much of this file is already durable, then
+        # receive the rest into the part file with periodic checkpoints.
+        # A reconnect of the same file calls `abort` to take over.
+        file_id = header.extensions.get(EXT_FILE_ID, b"").hex()
+        if not file_id or header.file_size is None:
+            raise ProtocolError("invalid resumable header")
+
+        file_path = self._target_path(header.file_name)
+        resume_offset = yield _BLOCKING, lambda: self.resume_store.begin(
+            file_id, header.file_name, header.file_type, header.file_size, abort
+        )
+        try:
+            yield _SENDALL, RESUME_REPLY.pack(resume_offset)
+            remaining = header.file_size - resume_offset
+            probe = self._begin_transfer(addr, header.file_name, remaining)
+            log.info(
+                "Receiving file: %s from %s (resuming at byte %d)",
+                header.file_name, _format_address(addr), resume_offset, extra=_extra(probe),
             )
-            
-            # print(f"File saved: {file_path}")
-            # print("Transfer metrics:", metrics.to_dict())
-            with get_session() as db:
-                db.add(TransferMetrics(**metrics.to_dict()))
+            try:
+                with open(self.resume_store.part_path(file_id), "r+b") as f:
+                    f.seek(resume_offset)
+                    while probe.bytes_received < remaining:
+                        limit = min(self.checkpoint_bytes, remaining - probe.bytes_received)
+                        got = yield from self._receive_payload(inbound, f.write, probe.add, limit=limit)
+                        yield _BLOCKING, lambda: self.resume_store.checkpoint(
+                            file_id, f, resume_offset + probe.bytes_received
+                        )
+                        if got < limit:
+                            break  # connection dropped; the client can resume later
+            finally:
+                self.resource_sampler.end(probe)
+
+            if probe.bytes_received == remaining:
+                yield _BLOCKING, lambda: self.resume_store.complete(file_id, file_path)
+        finally:
+            self.resume_store.end(file_id)
+
+        metrics = self._build_metrics(
+            header.file_name, header.file_size, header.file_type, probe.bytes_received,
+            probe.start_time, time.time(), probe, resume_offset=resume_offset,
+        )
+        self._finish_transfer(metrics, probe)
+
+    def _receive_dedup(self, addr, header, inbound):
+        # Chunk manifest in, bitmap of the chunks we lack out, then only those
+        # chunks; the file is rebuilt in manifest order from store and wire
+        params = header.extensions.get(EXT_DEDUP, b"")
+        if len(params) != DEDUP_PARAMS.size or header.file_size is None:
+            raise ProtocolError("invalid deduplicated upload header")
+        (chunk_size,) = DEDUP_PARAMS.unpack(params)
+        if not MIN_DEDUP_CHUNK_SIZE <= chunk_size <= MAX_DEDUP_CHUNK_SIZE:
+            raise ProtocolError(f"unsupported dedup chunk size {chunk_size}")
+        count = dedup_chunk_count(header.file_size, chunk_size)
+
+        file_path = self._target_path(header.file_name)
+
+        manifest = yield from self._read_exact(inbound, count * DEDUP_DIGEST_SIZE)
+        if manifest is None:
+            raise ProtocolError("connection closed inside the chunk manifest")
+        digests = [
+            manifest[i * DEDUP_DIGEST_SIZE:(i + 1) * DEDUP_DIGEST_SIZE] for i in range(count)
+        ]
+
+        # Ask for each missing chunk once, at its first position in the file
+        needed = bytearray(-(-count // 8))
+        requested = set()
+
+        def find_missing():
+            for i, digest in enumerate(digests):
+                if digest not in requested and not self.chunk_store.has(digest):
+                    requested.add(digest)
+                    needed[i // 8] |= 0x80 >> (i % 8)
+
+        yield _BLOCKING, find_missing
+        yield _SENDALL, bytes(needed)
+
+        probe = self._begin_transfer(addr, header.file_name, header.file_size)
+        log.info(
+            "Receiving file: %s from %s (deduplicated, %d chunks, %d needed)",
+            header.file_name, _format_address(addr), count, len(requested), extra=_extra(probe),
+        )
+        wire_bytes = len(manifest)
+        deduplicated = 0
+
+        # hashing and chunk store I/O go through _BLOCKING, off the event loop
+        def store_chunk(f, digest, chunk):
+            self.chunk_store.put(digest, chunk)  # verifies the SHA-256 digest
+            f.write(chunk)
+
+        def copy_stored_chunk(f, digest, length):
+            chunk = self.chunk_store.read(digest)  # ValueError if damaged on disk
+            if len(chunk) != length:
+                raise ProtocolError(f"stored chunk {digest.hex()} has the wrong length")
+            f.write(chunk)
 
-            if self.on_final_metrics is not None:
+        try:
+            with open(file_path, "wb") as f:
+                for i, digest in enumerate(digests):
+                    length = min(chunk_size, header.file_size - i * chunk_size)
+                    if needed[i // 8] & (0x80 >> (i % 8)):
+                        chunk = bytearray()
+                        got = yield from self._receive_payload(
+                            inbound, chunk.extend, lambda n: None, limit=length
+                        )
+                        wire_bytes += got
+                        if got < length:
+                            break
+                        yield _BLOCKING, lambda: store_chunk(f, digest, chunk)
+                    else:
+                        try:
+                            yield _BLOCKING, lambda: copy_stored_chunk(f, digest, length)
+                        except ValueError as e:
+                            # the upload fails short; the bad chunk was dropped,
+                            # so a retry sends it again
+                            log.warning("%s", e, extra=_extra(probe))
+                            break
+                        deduplicated += length
+                    probe.add(length)
+        finally:
+            self.resource_sampler.end(probe)
+
+        metrics = self._build_metrics(
+            header.file_name, header.file_size, header.file_type, probe.bytes_received,
+            probe.start_time, time.time(), probe,
+            wire_bytes=wire_bytes, dedup_bytes_saved=deduplicated,
+        )
+        self._finish_transfer(metrics, probe)
+
+    def _receive_range(self, addr, header, inbound):
+        # One stream of a multi-stream transfer: write the range in place
+        # into the preallocated target file
+        offset, total_size, index, stream_count = unpack_range(header.extensions.get(EXT_RANGE, b""))
+        transfer_id = header.extensions.get(EXT_TRANSFER_ID, b"").hex()
+        if not transfer_id or index >= stream_count or offset + header.file_size > total_size:
+            raise ProtocolError("invalid multi-stream range")
+
+        file_path = self._target_path(header.file_name)
+        transfer, created = self._multi_streams.join(
+            transfer_id, index, header.file_name, header.file_type, file_path,
+            total_size, stream_count,
+            lambda: self._begin_transfer(addr, header.file_name, total_size),
+        )
+        log.info(
+            "Receiving file: %s [stream %d/%d] from %s",
+            header.file_name, index + 1, stream_count, _format_address(addr), extra=_extra(transfer.probe),
+        )
+
+        stream_start = time.time()
+        received = 0
+
+        def on_chunk(n):
+            nonlocal received
+            received += n
+            transfer.add_bytes(n)
+
+        failed = True
+        try:
+            if created:
+                # the first stream creates the target file, off the event loop
+                # and outside the registry lock; the others wait for it
+                allocated = False
                 try:
-                    self.on_final_metrics(metrics.to_dict())
-                except Exception as e:
-                    print(f"[WARN] final metrics callback failed: {e}")
+                    yield _BLOCKING, lambda: preallocate(file_path, total_size)
+                    allocated = True
+                finally:
+                    transfer.allocated.set_result(allocated)
+            else:
+                yield _WAIT, (transfer.allocated, None)
+                if not transfer.allocated.result():
+                    raise ProtocolError(f"target file of transfer {transfer_id} could not be created")
+            fd, write = open_range_writer(file_path, offset)
+            try:
+                yield from self._receive_payload(inbound, write, on_chunk, limit=header.file_size)
+            finally:
+                os.close(fd)
+            failed = received < header.file_size
+        finally:
+            # a broken stream still counts as ended, or the transfer (and its
+            # probe) would wait for it forever
+            elapsed = time.time() - stream_start
+            if self._multi_streams.leave(transfer, index, received, header.file_size, elapsed, failed):
+                self._finish_range_transfer(transfer)
+
+    def _finish_range_transfer(self, transfer):
+        # every stream ended, or the missing ones expired
+        self.resource_sampler.end(transfer.probe)
+        metrics = self._build_metrics(
+            transfer.file_name, transfer.total_size, transfer.file_type,
+            transfer.bytes_received, transfer.start_time, time.time(),
+            transfer.probe, stream_throughputs=transfer.stream_throughputs,
+        )
+        if transfer.failed:
+            metrics.transfer_status = "Failed"
+            log.warning(
+                "multi-stream transfer of %s failed: %d of %d streams ended cleanly",
+                transfer.file_name, transfer.finished_streams - transfer.failed_streams,
+                transfer.stream_count, extra=_extra(transfer.probe),
+            )
+        self._finish_transfer(metrics, transfer.probe)
+
+    def _target_path(self, file_name):
+        # Names may contain "/" (directory uploads) but must stay in save_dir
+        # and away from the chunk store, part files and metrics journal
+        parts = [part for part in file_name.replace("\\", "/").split("/") if part not in ("", ".")]
+        if not parts or ".." in parts or file_name.startswith(("/", "\\")):
+            raise ProtocolError(f"refusing to write outside the save directory: {file_name!r}")
+        top = parts[0].lower()  # case-insensitive file systems
+        if top in _RESERVED_NAMES or top.startswith(_JOURNAL_NAME):
+            raise ProtocolError(f"refusing to write to a reserved name: {file_name!r}")
+        file_path = os.path.join(self.save_dir, *parts)
+        if len(parts) > 1:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        return file_path
+
+    def _receive_payload(self, inbound, write, on_chunk, limit=None):
+        # Stream payload bytes into `write` until EOF, or until `limit` bytes.
+        # Bytes already buffered behind the header are consumed first.
+        # `write` may hit the disk, hash or decompress, so it runs through
+        # _BLOCKING: inline on a connection thread, off the event loop on
+        # asyncio.
+        received = 0
+        buffered = inbound.take(limit)
+        if buffered:
+            yield _BLOCKING, lambda: write(buffered)
+            received += len(buffered)
+            on_chunk(len(buffered))
+
+        # Reads fill the whole buffer; bytes past `limit` (the next frame)
+        # stay buffered in `inbound`
+        while not inbound.eof and (limit is None or received < limit):
+            n = yield _RECV_INTO, inbound.view
+            inbound.end = n
+            if not n:
+                inbound.eof = True
+                break
+            data = inbound.take(None if limit is None else limit - received)
+            yield _BLOCKING, lambda: write(data)
+            received += len(data)
+            on_chunk(len(data))
+        return received
+
+    def _receive_compressed(self, inbound, write, on_chunk, codec_id):
+        # Compressed payloads arrive as length-prefixed blocks ending with an
+        # empty block. `on_chunk` sees decompressed bytes; returns the number
+        # of bytes read off the wire. Decompression happens in `write_block`,
+        # which _receive_payload runs through _BLOCKING.
+        decompressor = Decompressor(codec_id)
+
+        def write_block(data):
+            out = decompressor.decompress(data)
+            if out:
+                write(out)
+                on_chunk(len(out))
+
+        wire_bytes = 0
+        while True:
+            block_header = yield from self._read_exact(inbound, BLOCK_HEADER.size)
+            if block_header is None:
+                break  # connection dropped between blocks
+            wire_bytes += BLOCK_HEADER.size
+            (length,) = BLOCK_HEADER.unpack(block_header)
+            if length == 0:
+                break
+            got = yield from self._receive_payload(inbound, write_block, lambda n: None, limit=length)
+            wire_bytes += got
+            if got < length:
+                break
 
-        except Exception as e:
-            print(f"Error handling client {addr}: {e}")
+        def write_tail():
+            tail = decompressor.flush()
+            if tail:
+                write(tail)
+                on_chunk(len(tail))
+
+        yield _BLOCKING, write_tail
+        return wire_bytes
+
+    def _read_exact(self, inbound, size):
+        # Small control frames; returns None on EOF before `size` bytes
+        data = bytearray()
+        while len(data) < size:
+            chunk = inbound.take(size - len(data))
+            if chunk:
+                data += chunk
+                continue
+            if inbound.eof:
+                return None
+            n = yield _RECV_INTO, inbound.view
+            inbound.end = n
+            inbound.eof = not n
+        return bytes(data)
+
+    def _build_metrics(self, file_name, expected_size, file_type, bytes_received,
+                       start_time, stop_time, probe, stream_throughputs=None,
+                       resume_offset=0, wire_bytes=None, compression=None,
+                       dedup_bytes_saved=0, checksum=None, checksum_ok=None):
+        # bytes_received counts this connection only; a resumed transfer
+        # already had `resume_offset` bytes on disk
+        total_transfer_time = stop_time - start_time
+
+        if total_transfer_time > 0:
+            avg_throughput = (bytes_received / total_transfer_time) / (1024 * 1024)
+        else:
+            avg_throughput = 0.0
+
+        throughput_samples = probe.throughput_samples
+        peak_throughput = throughput_samples.max if throughput_samples else avg_throughput
+        stored_bytes = resume_offset + bytes_received
+        transfer_byte_difference = (
+            expected_size - stored_bytes
+            if expected_size is not None
+            else 0
+        )
+        transfer_status = (
+            "Success"
+            if expected_size is not None and expected_size == stored_bytes
+            and checksum_ok is not False
+            else "Failed"
+        )
+
+        return FileTransferMetrics(
+            file_name=file_name,
+            file_size=expected_size if expected_size is not None else stored_bytes,
+            file_type=file_type,
+            total_transfer_time=total_transfer_time,
+            throughput=avg_throughput,
+            peak_throughput=peak_throughput,
+            transfer_byte_difference=transfer_byte_difference,
+            transfer_status=transfer_status,
+            cpu_usage_samples=probe.cpu_samples,
+            ram_usage_samples=probe.ram_samples,
+            throughput_samples=throughput_samples,
+            transfer_id=probe.transfer_id,
+            stream_throughputs=stream_throughputs,
+            resume_offset=resume_offset,
+            logical_bytes=bytes_received,
+            wire_bytes=bytes_received if wire_bytes is None else wire_bytes,
+            compression=compression,
+            dedup_bytes_saved=dedup_bytes_saved,
+            checksum_algorithm=checksum.algorithm if checksum is not None else None,
+            checksum_ok=checksum_ok,
+            checksum_ms_per_mb=checksum.ms_per_mb if checksum is not None else None,
+        )
+
+    def _finish_transfer(self, metrics, probe, on_stored=None):
+        # Only queued here; completion never waits on the database
+        metrics_dict = metrics.to_dict()
+        self.metrics_writer.submit(metrics_dict, probe.time_series(), on_stored)
+
+        if self.on_final_metrics is not None:
+            try:
+                self.on_final_metrics(metrics_dict)
+            except Exception as e:
+                log.warning("final metrics callback failed: %s", e, extra=_extra(probe))
 
-        finally:
-            conn.close()
+    def _begin_transfer(self, addr, file_name, file_size):
+        probe = self.resource_sampler.begin(file_name, file_size, _format_address(addr))
+        if self.on_transfer_started is not None:
+            try:
+                self.on_transfer_started(probe.info())
+            except Exception as e:
+                log.warning("transfer started callback failed: %s", e, extra=_extra(probe))
+        return probe
+
+    def _emit_realtime(self, probe, throughput, cpu, ram):
+        if self.on_realtime_metrics is not None:
+            try:
+                self.on_realtime_metrics(
+                    probe.transfer_id, float(throughput), float(cpu), float(ram), probe.bytes_received
+                )
+            except Exception as e:
+                log.warning("realtime metrics callback failed: %s", e, extra=_extra(probe))
 
     def stop(self):
         self.is_running = False
-        if self.server_socket:
+        self.resource_sampler.stop()
+        loop = self._loop
+        accept_task = self._accept_task
+        if loop is not None and accept_task is not None:
+            # the accept loop owns the listening socket and closes it on exit
+            loop.call_soon_threadsafe(accept_task.cancel)
+        elif self.server_socket:
+            try:
+                # close() alone does not wake a thread blocked in accept()
+                self.server_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
             self.server_socket.close()
-        print("Server Oprit.")
+        self.metrics_writer.stop()
+        log.info("Server stopped")
+
+
+def _db_session():
+    # db.database (SQLAlchemy, the database driver, .env) loads when the
+    # first metrics batch is written rather than when the server starts
+    from db.database import get_session
+
+    return get_session()
+
+
+def _enable_keepalive(conn):
+    # lets the kernel notice peers that vanished without closing
+    try:
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    except OSError:
+        pass
+
+
+def _abort_connection(conn):
+    # wakes a recv blocked on the connection; already closed is fine
+    try:
+        conn.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+def _format_address(addr):
+    return f"{addr[0]}:{addr[1]}" if isinstance(addr, tuple) else str(addr)
+
+
+def _extra(probe):
+    # tags a log record with its transfer, for filtering in the log view
+    return {"transfer_id": probe.transfer_id}
+
+
+class _Inbound:
+    """Receive buffer of one connection; view[start:end] is not consumed yet."""
+
+    def __init__(self, view):
+        self.view = view
+        self.start = 0
+        self.end = 0
+        self.eof = False
+
+    def unread(self):
+        return self.view[self.start:self.end]
+
+    def take(self, limit=None):
+        # Up to `limit` buffered bytes, marked as consumed
+        available = self.end - self.start
+        n = available if limit is None else min(available, limit)
+        data = self.view[self.start:self.start + n]
+        self.start += n
+        if self.start == self.end:
+            self.start = self.end = 0
+        return data
 
+    def compact(self):
+        # Move unread bytes to the front so the rest of the buffer is free
+        if self.start:
+            n = self.end - self.start
+            self.view[:n] = self.view[self.start:self.end]
+            self.start, self.end = 0, n
@@ -1,3 +1,4 @@
+import logging
 import sys
 import threading
 from PyQt5.QtWidgets import (
@@ -10,14 +11,30 @@ from PyQt5.QtWidgets import (
     QWidget,
     QTabWidget,
     QGridLayout,
+    QTableWidget,
+    QTableWidgetItem,
+    QTableView,
+    QHeaderView,
+    QComboBox,
+    QLineEdit,
+    QHBoxLayout,
 )
-from PyQt5.QtCore import pyqtSignal, QObject
+from PyQt5.QtCore import pyqtSignal, QObject, QTimer
+from server.chart_buffer import ChartBuffer, DEFAULT_CHART_WINDOW
 from server.server_controller import ServerController
+from server.transfer_board import TABLE_COLUMNS, TransferBoard
+from server.log_model import LogFilterProxy, LogModel
 import pyqtgraph as pg
 
 
+log = logging.getLogger(__name__)
+
+CHART_FPS = 30
+LOG_LEVELS = (("All", logging.NOTSET), ("Info", logging.INFO), ("Warning", logging.WARNING), ("Error", logging.ERROR))
+
+
 class ServerWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, chart_window=DEFAULT_CHART_WINDOW, chart_fps=CHART_FPS):
         super().__init__()
         self.setWindowTitle("Server GUI - File Transfer Analyzer")
         self.setGeometry(200, 200, 900, 600)
@@ -28,14 +45,23 @@ class ServerWindow(QMainWindow):
         # --- UI ---
         self._setup_ui()
 
-        self.throughput_data = []
-        self.cpu_data = []
-        self.ram_data = []
-        self.sample_index = 0 
+        # samples land in a ring buffer; the timer redraws at most
+        # chart_fps times per second, whatever the sample rate
+        self.chart_window = chart_window
+        self.chart_data = ChartBuffer(3, chart_window)
+        self.transfer_board = TransferBoard()
+        self.transfer_charts = {}  # transfer_id -> (ChartBuffer, curve)
+        self.charts_dirty = False
+        self.chart_timer = QTimer(self)
+        self.chart_timer.timeout.connect(self.refresh_charts)
+        self.chart_timer.start(int(1000 / chart_fps))
 
         # --- Signals ---
         self.controller.realtime_signal.connect(self.update_realtime_charts)
+        self.controller.transfer_started_signal.connect(self.add_transfer)
+        self.controller.log_signal.connect(self.append_logs)
         self.controller.metrics_signal.connect(self.update_final_metrics)
+        self.controller.session_signal.connect(self.update_session_metrics)
 
     # ==========================
     # UI setup
@@ -51,11 +77,37 @@ class ServerWindow(QMainWindow):
         # TAB 1: Logs
         logs_tab = QWidget()
         logs_layout = QVBoxLayout()
-        self.log_box = QTextEdit()
-        self.log_box.setReadOnly(True)
-        logs_layout.addWidget(self.log_box)
+
+        filters_layout = QHBoxLayout()
+        self.log_level_box = QComboBox()
+        for label, level in LOG_LEVELS:
+            self.log_level_box.addItem(label, level)
+        self.log_transfer_edit = QLineEdit()
+        self.log_transfer_edit.setPlaceholderText("Transfer ID")
+        filters_layout.addWidget(QLabel("Level:"))
+        filters_layout.addWidget(self.log_level_box)
+        filters_layout.addWidget(QLabel("Transfer:"))
+        filters_layout.addWidget(self.log_transfer_edit)
+        logs_layout.addLayout(filters_layout)
+
+        # bounded model, filtered by a proxy; rows arrive in batches
+        self.log_model = LogModel(self.controller.log_feed.capacity, self)
+        self.log_proxy = LogFilterProxy(self)
+        self.log_proxy.setSourceModel(self.log_model)
+        self.log_view = QTableView()
+        self.log_view.setModel(self.log_proxy)
+        self.log_view.verticalHeader().setVisible(False)
+        self.log_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.log_view.horizontalHeader().setStretchLastSection(True)
+        self.log_view.setWordWrap(False)
+        logs_layout.addWidget(self.log_view)
         logs_tab.setLayout(logs_layout)
 
+        self.log_level_box.currentIndexChanged.connect(
+            lambda _: self.log_proxy.set_min_level(self.log_level_box.currentData())
+        )
+        self.log_transfer_edit.textChanged.connect(self.log_proxy.set_transfer_id)
+
         # TAB 2: Metrics + Charts
         metrics_tab = QWidget()
         metrics_layout = QVBoxLayout()
@@ -71,7 +123,7 @@ class ServerWindow(QMainWindow):
 
         # Throughput plot
         self.throughput_plot = pg.PlotWidget()
-        self.throughput_plot.setTitle("Throughput (MB/s)")
+        self.throughput_plot.setTitle("Server throughput, all transfers (MB/s)")
         self.throughput_plot.setLabel("left", "MB/s")
         self.throughput_plot.setLabel("bottom", "Sample")
         self.throughput_curve = self.throughput_plot.plot([])
@@ -90,6 +142,11 @@ class ServerWindow(QMainWindow):
         self.ram_plot.setLabel("bottom", "Sample")
         self.ram_curve = self.ram_plot.plot([])
 
+        for plot in (self.throughput_plot, self.cpu_plot, self.ram_plot):
+            # draw only what is visible, at most about one point per pixel
+            plot.setDownsampling(auto=True, mode="peak")
+            plot.setClipToView(True)
+
         charts_grid.addWidget(self.throughput_plot, 0, 0)
         charts_grid.addWidget(self.cpu_plot, 0, 1)
         charts_grid.addWidget(self.ram_plot, 1, 0, 1, 2)
@@ -101,9 +158,31 @@ class ServerWindow(QMainWindow):
 
         metrics_tab.setLayout(metrics_layout)
 
+        # TAB 3: Dashboard of the transfers in progress
+        dashboard_tab = QWidget()
+        dashboard_layout = QVBoxLayout()
+
+        self.transfers_table = QTableWidget(0, len(TABLE_COLUMNS))
+        self.transfers_table.setHorizontalHeaderLabels(TABLE_COLUMNS)
+        self.transfers_table.verticalHeader().setVisible(False)
+        dashboard_layout.addWidget(self.transfers_table)
+
+        # Per-transfer throughput, one curve per active transfer
+        self.transfers_plot = pg.PlotWidget()
+        self.transfers_plot.setTitle("Throughput per transfer (MB/s)")
+        self.transfers_plot.setLabel("left", "MB/s")
+        self.transfers_plot.setLabel("bottom", "Sample")
+        self.transfers_plot.addLegend()
+        self.transfers_plot.setDownsampling(auto=True, mode="peak")
+        self.transfers_plot.setClipToView(True)
+        dashboard_layout.addWidget(self.transfers_plot)
+
+        dashboard_tab.setLayout(dashboard_layout)
+
         #adding tabs to main tab widget
         self.tabs.addTab(logs_tab, "Logs")
         self.tabs.addTab(metrics_tab, "Metrics & Charts")
+        self.tabs.addTab(dashboard_tab, "Dashboard")
 
         # main layout
         main_layout = QVBoxLayout()
@@ -131,7 +210,7 @@ class ServerWindow(QMainWindow):
         self.status_label.setText("Status: Running")
         self.start_button.setEnabled(False)
         self.stop_button.setEnabled(True)
-        self.update_log("[INFO] Server started.")
+        log.info("Server started.")
 
 
     def stop_server(self):
@@ -139,42 +218,94 @@ class ServerWindow(QMainWindow):
         self.status_label.setText("Status: Stopped")
         self.start_button.setEnabled(True)
         self.stop_button.setEnabled(False)
-        self.update_log("[INFO] Server stopped by user.")
+        log.info("Server stopped by user.")
 
     # ==========================
     # Log update
     # ==========================
-    def update_log(self, message: str):
-        self.log_box.append(message)
+    def append_logs(self, entries: list):
+        scrollbar = self.log_view.verticalScrollBar()
+        follow = scrollbar.value() == scrollbar.maximum()
+        self.log_model.append(entries)
+        if follow:
+            self.log_view.scrollToBottom()
 
     # ==========================
     # Metrics & Charts
     # ==========================
     def reset_charts(self):
-        self.throughput_data = []
-        self.cpu_data = []
-        self.ram_data = []
-        self.sample_index = 0
+        self.chart_data.clear()
+        self.charts_dirty = False
 
         self.throughput_curve.setData([])
         self.cpu_curve.setData([])
         self.ram_curve.setData([])
 
-    def update_realtime_charts(self, throughput: float, cpu: float, ram: float):
-        self.throughput_data.append(throughput)
-        self.cpu_data.append(cpu)
-        self.ram_data.append(ram)
-        self.sample_index += 1
-
-        x = list(range(len(self.throughput_data)))
-
-        
-        self.throughput_curve.setData(x, self.throughput_data)
-        self.cpu_curve.setData(x, self.cpu_data)
-        self.ram_curve.setData(x, self.ram_data)
+        for transfer_id in list(self.transfer_board.order):
+            self.remove_transfer(transfer_id)
+
+    def add_transfer(self, info: dict):
+        if self.transfer_board.is_finished(info["transfer_id"]):
+            return
+        row = self.transfer_board.start(info)
+        if row == self.transfers_table.rowCount():
+            self.transfers_table.insertRow(row)
+            for column, text in enumerate(self.transfer_board.transfers[info["transfer_id"]].cells()):
+                self.transfers_table.setItem(row, column, QTableWidgetItem(text))
+        if info["transfer_id"] not in self.transfer_charts:
+            pen = pg.intColor(len(self.transfer_charts) % 9, hues=9)
+            curve = self.transfers_plot.plot([], pen=pen, name=f"#{info['transfer_id']}")
+            self.transfer_charts[info["transfer_id"]] = (ChartBuffer(1, self.chart_window), curve)
+
+    def remove_transfer(self, transfer_id):
+        row = self.transfer_board.finish(transfer_id)
+        if row is not None:
+            self.transfers_table.removeRow(row)
+        chart = self.transfer_charts.pop(transfer_id, None)
+        if chart is not None:
+            self.transfers_plot.removeItem(chart[1])
+
+    def update_realtime_charts(self, batch: dict):
+        # batch: {transfer_id: [(throughput, cpu, ram, bytes_received), ...]};
+        # drawing happens in refresh_charts
+        for transfer_id, samples in batch.items():
+            if self.transfer_board.is_finished(transfer_id):
+                continue
+            if transfer_id not in self.transfer_charts:
+                self.add_transfer({"transfer_id": transfer_id})
+            self.transfer_charts[transfer_id][0].extend([sample[0] for sample in samples])
+
+        # only the rows whose text changed are touched
+        changed, total_throughput = self.transfer_board.update(batch)
+        for row, cells in changed:
+            for column, text in enumerate(cells):
+                item = self.transfers_table.item(row, column)
+                if item.text() != text:
+                    item.setText(text)
+
+        # the server charts take one point per batch: summed throughput and
+        # the latest process CPU/RAM
+        latest = [samples[-1] for samples in batch.values() if samples]
+        if latest:
+            self.chart_data.append(total_throughput, latest[-1][1], latest[-1][2])
+        self.charts_dirty = True
+
+    def refresh_charts(self):
+        if not self.charts_dirty:
+            return
+        self.charts_dirty = False
+        x, (throughput, cpu, ram) = self.chart_data.view()
+        self.throughput_curve.setData(x, throughput)
+        self.cpu_curve.setData(x, cpu)
+        self.ram_curve.setData(x, ram)
+        for buffer, curve in self.transfer_charts.values():
+            x, (throughput,) = buffer.view()
+            curve.setData(x, throughput)
 
     def update_final_metrics(self, metrics: dict):
-        
+        if metrics.get("transfer_id") is not None:
+            self.remove_transfer(metrics["transfer_id"])
+
         text_lines = [
             f"File name: {metrics.get('file_name')}",
             f"File size: {metrics.get('file_size')} bytes",
@@ -183,8 +314,17 @@ class ServerWindow(QMainWindow):
             f"Total transfer time: {metrics.get('total_transfer_time'):.4f} s",
             f"Avg throughput: {metrics.get('throughput'):.4f} MB/s",
             f"Peak throughput: {metrics.get('peak_throughput'):.4f} MB/s",
+            f"Throughput p50/p95/p99: {metrics.get('throughput_p50', 0.0):.4f} / "
+            f"{metrics.get('throughput_p95', 0.0):.4f} / {metrics.get('throughput_p99', 0.0):.4f} MB/s",
             f"Transfer byte difference: {metrics.get('transfer_byte_difference')}",
             f"Transfer status: {metrics.get('transfer_status')}",
+            f"Compression: {metrics.get('compression') or 'none'} "
+            f"(ratio {metrics.get('compression_ratio', 1.0):.2f}, "
+            f"{metrics.get('wire_bytes')} bytes on the wire, "
+            f"{metrics.get('wire_throughput', 0.0):.4f} MB/s)",
+            f"Checksum: {metrics.get('checksum_algorithm') or 'none'} "
+            f"({'ok' if metrics.get('checksum_ok') else 'n/a' if metrics.get('checksum_ok') is None else 'MISMATCH'}, "
+            f"{metrics.get('checksum_ms_per_mb') or 0.0:.3f} ms/MB)",
             "",
             f"CPU avg: {metrics.get('cpu_usage_avg'):.2f} %",
             f"CPU peak: {metrics.get('cpu_usage_peak'):.2f} %",
@@ -193,4 +333,10 @@ class ServerWindow(QMainWindow):
         ]
         self.metrics_text.setPlainText("\n".join(text_lines))
 
-
+    def update_session_metrics(self, session: dict):
+        log.info(
+            "Session from %s: %s files (%s failed), %s bytes in %.2f s, %.2f MB/s, %.1f files/s",
+            session.get('client_address'), session.get('file_count'), session.get('failed_count'),
+            session.get('total_bytes'), session.get('total_time'),
+            session.get('throughput'), session.get('files_per_second'),
+        )
@@ -1,7 +1,23 @@
 import os
 from typing import Optional, List
 
+from .sample_series import SampleSeries
+
+
+def _as_series(samples):
+    return samples if isinstance(samples, SampleSeries) else SampleSeries(samples or ())
+
+
 class FileTransferMetrics:
+    __slots__ = (
+        "file_name", "file_size", "file_type", "total_transfer_time", "throughput",
+        "peak_throughput", "transfer_byte_difference", "transfer_status",
+        "cpu_usage_samples", "ram_usage_samples", "throughput_samples",
+        "stream_throughputs", "resume_offset", "logical_bytes", "wire_bytes",
+        "compression", "dedup_bytes_saved", "checksum_algorithm", "checksum_ok",
+        "checksum_ms_per_mb", "transfer_id",
+    )
+
     def __init__(
         self,
         file_name: str,
@@ -13,7 +29,18 @@ class FileTransferMetrics:
         transfer_byte_difference: int,
         transfer_status: str,
         cpu_usage_samples: Optional[List[float]] = None,
-        ram_usage_samples: Optional[List[float]] = None
+        ram_usage_samples: Optional[List[float]] = None,
+        stream_throughputs: Optional[List[float]] = None,
+        resume_offset: int = 0,
+        logical_bytes: Optional[int] = None,
+        wire_bytes: Optional[int] = None,
+        compression: Optional[str] = None,
+        dedup_bytes_saved: int = 0,
+        checksum_algorithm: Optional[str] = None,
+        checksum_ok: Optional[bool] = None,
+        checksum_ms_per_mb: Optional[float] = None,
+        throughput_samples: Optional[List[float]] = None,
+        transfer_id: Optional[str] = None,
     ):
         self.file_name = file_name
         self.file_size = file_size
@@ -23,37 +50,137 @@ class FileTransferMetrics:
         self.peak_throughput = peak_throughput
         self.transfer_byte_difference = transfer_byte_difference
         self.transfer_status = transfer_status
-        self.cpu_usage_samples = cpu_usage_samples or []
-        self.ram_usage_samples = ram_usage_samples or []
+        # SampleSeries: bounded buffers with running stats; lists are converted
+        self.cpu_usage_samples = _as_series(cpu_usage_samples)
+        self.ram_usage_samples = _as_series(ram_usage_samples)
+        self.throughput_samples = _as_series(throughput_samples)
+        # MB/s of each connection; a single-stream transfer has one entry
+        self.stream_throughputs = stream_throughputs or [throughput]
+        # bytes already on the server when a resumed transfer reconnected
+        self.resume_offset = resume_offset
+        # file bytes written vs. bytes read off the socket; they differ when
+        # the payload was compressed (`compression` names the codec)
+        self.logical_bytes = logical_bytes
+        self.wire_bytes = wire_bytes if wire_bytes is not None else logical_bytes
+        self.compression = compression
+        # bytes of a deduplicated upload rebuilt from chunks the server had
+        self.dedup_bytes_saved = dedup_bytes_saved
+        # end-to-end checksum; None when the client did not ask for one
+        self.checksum_algorithm = checksum_algorithm
+        self.checksum_ok = checksum_ok
+        self.checksum_ms_per_mb = checksum_ms_per_mb
+        # id the real-time samples of this transfer were tagged with
+        self.transfer_id = transfer_id
+
+    @property
+    def compression_ratio(self):
+        # logical / wire; 1.0 for uncompressed transfers
+        if not self.wire_bytes or self.logical_bytes is None:
+            return 1.0
+        return self.logical_bytes / self.wire_bytes
+
+    @property
+    def wire_throughput(self):
+        # MB/s actually carried by the network
+        if self.wire_bytes is None or self.total_transfer_time <= 0:
+            return self.throughput
+        return (self.wire_bytes / self.total_transfer_time) / (1024 * 1024)
+
+    @property
+    def dedup_ratio(self):
+        # share of the file that did not have to be sent (0.0 - 1.0)
+        if not self.logical_bytes:
+            return 0.0
+        return self.dedup_bytes_saved / self.logical_bytes
 
     @property
     def cpu_usage_avg(self):
-        return sum(self.cpu_usage_samples) / len(self.cpu_usage_samples) if self.cpu_usage_samples else 0.0
+        return self.cpu_usage_samples.mean
 
     @property
     def cpu_usage_peak(self):
-        return max(self.cpu_usage_samples) if self.cpu_usage_samples else 0.0
+        return self.cpu_usage_samples.max
 
     @property
     def ram_usage_avg(self):
-        return sum(self.ram_usage_samples) / len(self.ram_usage_samples) if self.ram_usage_samples else 0.0
+        return self.ram_usage_samples.mean
 
     @property
     def ram_usage_peak(self):
-        return max(self.ram_usage_samples) if self.ram_usage_samples else 0.0
+        return self.ram_usage_samples.max
+
+    def throughput_percentiles(self):
+        # (p50, p95, p99) of the real-time throughput samples, in MB/s
+        if not self.throughput_samples:
+            return (self.throughput,) * 3
+        return tuple(self.throughput_samples.percentiles((50, 95, 99)))
 
     def to_dict(self):
+        p50, p95, p99 = self.throughput_percentiles()
         return {
+            "transfer_id": self.transfer_id,
             "file_name": self.file_name,
             "file_size": self.file_size,
             "file_type": self.file_type,
             "total_transfer_time": self.total_transfer_time,
             "throughput": self.throughput,
             "peak_throughput": self.peak_throughput,
+            "throughput_p50": p50,
+            "throughput_p95": p95,
+            "throughput_p99": p99,
+            "throughput_stddev": self.throughput_samples.stddev,
             "transfer_byte_difference": self.transfer_byte_difference,
             "transfer_status": self.transfer_status,
             "cpu_usage_avg": self.cpu_usage_avg,
             "cpu_usage_peak": self.cpu_usage_peak,
             "ram_usage_avg": self.ram_usage_avg,
             "ram_usage_peak": self.ram_usage_peak,
+            "stream_count": len(self.stream_throughputs),
+            "stream_throughputs": list(self.stream_throughputs),
+            "resume_offset": self.resume_offset,
+            "logical_bytes": self.logical_bytes,
+            "wire_bytes": self.wire_bytes,
+            "wire_throughput": self.wire_throughput,
+            "compression": self.compression,
+            "compression_ratio": self.compression_ratio,
+            "dedup_bytes_saved": self.dedup_bytes_saved,
+            "dedup_ratio": self.dedup_ratio,
+            "checksum_algorithm": self.checksum_algorithm,
+            "checksum_ok": self.checksum_ok,
+            "checksum_ms_per_mb": self.checksum_ms_per_mb,
+        }
+
+
+class SessionMetrics:
+    def __init__(
+        self,
+        client_address: str,
+        file_count: int,
+        failed_count: int,
+        total_bytes: int,
+        total_time: float,
+    ):
+        self.client_address = client_address
+        self.file_count = file_count
+        self.failed_count = failed_count
+        self.total_bytes = total_bytes
+        self.total_time = total_time
+
+    @property
+    def throughput(self):
+        return (self.total_bytes / self.total_time) / (1024 * 1024) if self.total_time > 0 else 0.0
+
+    @property
+    def files_per_second(self):
+        return self.file_count / self.total_time if self.total_time > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "client_address": self.client_address,
+            "file_count": self.file_count,
+            "failed_count": self.failed_count,
+            "total_bytes": self.total_bytes,
+            "total_time": self.total_time,
+            "throughput": self.throughput,
+            "files_per_second": self.files_per_second,
         }
@@ -0,0 +1,46 @@
+import threading
+from collections import deque
+
+
+COALESCE_MODES = ("all", "latest")
+DEFAULT_EMIT_INTERVAL_MS = 50  # 20 batches per second
+DEFAULT_MAX_SAMPLES = 1000     # per key and batch; older samples are dropped
+
+
+class SampleCoalescer:
+    """Collects samples from worker threads until the GUI thread drains them.
+
+    `push` only appends under a short lock; `drain` swaps the pending dict
+    out, so producers never wait on the consumer. Samples are grouped by key
+    (e.g. connection), and `mode` decides what a batch keeps per key: "all"
+    samples (at most `max_samples`, newest kept) or only the "latest" one.
+    """
+
+    def __init__(self, mode: str = "all", max_samples: int = DEFAULT_MAX_SAMPLES):
+        if mode not in COALESCE_MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {COALESCE_MODES}")
+        if max_samples < 1:
+            raise ValueError("max_samples must be at least 1")
+        self.mode = mode
+        self.max_samples = 1 if mode == "latest" else max_samples
+        self.dropped = 0  # samples discarded by the per-key bound
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def push(self, sample, key=None) -> None:
+        with self._lock:
+            samples = self._pending.get(key)
+            if samples is None:
+                samples = self._pending[key] = deque(maxlen=self.max_samples)
+            elif len(samples) == self.max_samples:
+                self.dropped += 1
+            samples.append(sample)
+
+    def drain(self) -> dict:
+        """{key: [samples, oldest first]} pushed since the last drain."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return {key: list(samples) for key, samples in pending.items()}
+
+    def __len__(self):
+        return sum(len(samples) for samples in self._pending.values())
@@ -0,0 +1,129 @@
+import sys
+from array import array
+
+
+SERIES = ("throughput", "cpu", "ram")
+
+# Downsampling tiers: name -> bucket width in seconds. "raw" keeps the
+# samples themselves (as much as the in-memory buffers retained).
+TIERS = {"1s": 1.0, "1min": 60.0}
+RAW_TIER = "raw"
+
+# float64 values per point: raw (t, value), tiers (t, mean, min, max)
+RAW_STRIDE = 2
+TIER_STRIDE = 4
+BLOCK_POINTS = 4096  # points per stored block
+
+
+class Downsampler:
+    """Fixed-width buckets of one series, built as the samples arrive.
+
+    Each bucket is (start, mean, min, max), so peaks survive downsampling
+    and memory grows with the duration, not the sample rate.
+    """
+
+    __slots__ = ("resolution", "buckets", "_start", "_count", "_sum", "_min", "_max")
+
+    def __init__(self, resolution: float):
+        self.resolution = resolution
+        self.buckets = []  # closed buckets
+        self._start = None
+        self._count = 0
+        self._sum = self._min = self._max = 0.0
+
+    def add(self, t: float, value: float) -> None:
+        start = t - t % self.resolution
+        if start != self._start:
+            self._close()
+            self._start = start
+            self._count = 0
+            self._sum = 0.0
+            self._min = self._max = value
+        self._count += 1
+        self._sum += value
+        if value < self._min:
+            self._min = value
+        elif value > self._max:
+            self._max = value
+
+    def _close(self):
+        if self._count:
+            self.buckets.append((self._start, self._sum / self._count, self._min, self._max))
+
+    def points(self):
+        # closed buckets plus the one still open
+        if not self._count:
+            return list(self.buckets)
+        return self.buckets + [(self._start, self._sum / self._count, self._min, self._max)]
+
+
+def encode_points(points, stride):
+    # little-endian float64, whatever the host byte order
+    data = array("d")
+    for point in points:
+        if len(point) != stride:
+            raise ValueError(f"expected {stride} values per point, got {len(point)}")
+        data.extend(point)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def decode_points(blob, stride):
+    data = array("d")
+    data.frombytes(blob)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return [tuple(data[i:i + stride]) for i in range(0, len(data), stride)]
+
+
+def sample_rows(transfer_id, series):
+    """TransferSample rows for `series` ({name: {tier: points}}), in blocks."""
+    rows = []
+    for name, tiers in series.items():
+        for tier, points in tiers.items():
+            stride = RAW_STRIDE if tier == RAW_TIER else TIER_STRIDE
+            for block_index, first in enumerate(range(0, len(points), BLOCK_POINTS)):
+                block = points[first:first + BLOCK_POINTS]
+                rows.append({
+                    "transfer_id": transfer_id,
+                    "series": name,
+                    "tier": tier,
+                    "block_index": block_index,
+                    "start_time": block[0][0],
+                    "sample_count": len(block),
+                    "data": encode_points(block, stride),
+                })
+    return rows
+
+
+def load_series(db, transfer_id, series, tier=RAW_TIER):
+    """Points of one series of a stored transfer, oldest first."""
+    from sqlalchemy import select
+
+    from db.transfer_metrics_model import TransferSample
+
+    stride = RAW_STRIDE if tier == RAW_TIER else TIER_STRIDE
+    blobs = db.scalars(
+        select(TransferSample.data)
+        .where(
+            TransferSample.transfer_id == transfer_id,
+            TransferSample.series == series,
+            TransferSample.tier == tier,
+        )
+        .order_by(TransferSample.block_index)
+    )
+    points = []
+    for blob in blobs:
+        points.extend(decode_points(blob, stride))
+    return points
+
+
+def choose_tier(duration, sample_interval, max_points=2000):
+    """Finest tier that charts `duration` seconds in at most `max_points` points."""
+    if duration <= max_points * sample_interval:
+        return RAW_TIER
+    for tier, resolution in sorted(TIERS.items(), key=lambda item: item[1]):
+        if duration <= max_points * resolution:
+            return tier
+    return max(TIERS, key=TIERS.get)
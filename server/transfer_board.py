@@ -0,0 +1,115 @@
+from collections import deque
+
+
+TABLE_COLUMNS = ("ID", "File", "Client", "Received", "Size", "Rate (MB/s)", "ETA")
+
+
+class ActiveTransfer:
+    __slots__ = ("transfer_id", "file_name", "file_size", "client_address", "bytes_received", "throughput")
+
+    def __init__(self, transfer_id, file_name=None, file_size=None, client_address=None):
+        self.transfer_id = transfer_id
+        self.file_name = file_name
+        self.file_size = file_size
+        self.client_address = client_address
+        self.bytes_received = 0
+        self.throughput = 0.0  # MB/s
+
+    @property
+    def eta(self):
+        # seconds left at the current rate; None when unknown
+        if not self.file_size or self.throughput <= 0:
+            return None
+        remaining = max(self.file_size - self.bytes_received, 0)
+        return remaining / (self.throughput * 1024 * 1024)
+
+    def cells(self):
+        eta = self.eta
+        return (
+            self.transfer_id,
+            self.file_name or "",
+            self.client_address or "",
+            _format_bytes(self.bytes_received),
+            _format_bytes(self.file_size) if self.file_size is not None else "?",
+            f"{self.throughput:.2f}",
+            f"{eta:.1f} s" if eta is not None else "-",
+        )
+
+
+class TransferBoard:
+    """Rows of the active-transfers table, kept apart from Qt.
+
+    Every method returns only what changed, so the view can update those
+    cells or rows instead of redrawing the table.
+    """
+
+    def __init__(self):
+        self.transfers = {}  # transfer_id -> ActiveTransfer
+        self.order = []      # transfer ids in table row order
+        # realtime batches can still carry samples of a transfer whose final
+        # metrics already arrived; these must not bring its row back
+        self._finished = deque(maxlen=256)
+
+    def start(self, info: dict) -> int:
+        """Add a transfer; returns its new row."""
+        transfer_id = info["transfer_id"]
+        if transfer_id in self.transfers:
+            return self.order.index(transfer_id)
+        self.transfers[transfer_id] = ActiveTransfer(
+            transfer_id, info.get("file_name"), info.get("file_size"), info.get("client_address")
+        )
+        self.order.append(transfer_id)
+        return len(self.order) - 1
+
+    def update(self, batch: dict):
+        """Apply a realtime batch {transfer_id: [(throughput, cpu, ram, bytes), ...]}.
+
+        Returns [(row, cells)] for the rows whose cells changed, and the
+        aggregate server throughput (sum of the latest rate of each transfer).
+        """
+        changed = []
+        for transfer_id, samples in batch.items():
+            if not samples:
+                continue
+            if self.is_finished(transfer_id):
+                continue
+            transfer = self.transfers.get(transfer_id)
+            if transfer is None:
+                # samples arrived before (or without) the start notification
+                self.start({"transfer_id": transfer_id})
+                transfer = self.transfers[transfer_id]
+            throughput, _, _, bytes_received = samples[-1]
+            before = transfer.cells()
+            transfer.throughput = throughput
+            transfer.bytes_received = bytes_received
+            cells = transfer.cells()
+            if cells != before:
+                changed.append((self.order.index(transfer_id), cells))
+        return changed, self.total_throughput
+
+    def finish(self, transfer_id):
+        """Drop a transfer; returns the row to remove, or None."""
+        if transfer_id not in self._finished:
+            self._finished.append(transfer_id)
+        if self.transfers.pop(transfer_id, None) is None:
+            return None
+        row = self.order.index(transfer_id)
+        del self.order[row]
+        return row
+
+    def is_finished(self, transfer_id) -> bool:
+        return transfer_id in self._finished
+
+    @property
+    def total_throughput(self):
+        return sum(transfer.throughput for transfer in self.transfers.values())
+
+    def __len__(self):
+        return len(self.order)
+
+
+def _format_bytes(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024 or unit == "GiB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
@@ -0,0 +1,11 @@
+import pytest
+
+from db import database
+
+
+@pytest.fixture(scope="session", autouse=True)
+def sqlite_database(tmp_path_factory):
+    # Tests never need Postgres: metrics go to a throwaway SQLite file
+    engine = database.configure(f"sqlite:///{tmp_path_factory.mktemp('db') / 'metrics.db'}")
+    yield engine
+    engine.dispose()
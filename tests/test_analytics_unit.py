@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert, inspect
+from sqlalchemy.orm import Session
+
+from db import analytics, database
+from db.transfer_metrics_model import TransferMetrics
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = database.create_db_engine(f"sqlite:///{tmp_path / 'analytics.db'}")
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def _row(minutes, file_type=".iso", throughput=10.0, status="Success", size=1000):
+    return {
+        "file_name": f"f{minutes}{file_type}",
+        "file_size": size,
+        "file_type": file_type,
+        "total_transfer_time": 1.0,
+        "throughput": throughput,
+        "peak_throughput": throughput,
+        "transfer_byte_difference": 0 if status == "Success" else size // 2,
+        "transfer_status": status,
+        "timestamp": datetime(2026, 3, 2, 10, 0, tzinfo=timezone.utc) + timedelta(minutes=minutes),
+    }
+
+
+def _store(db, rows):
+    analytics.update_rollups(db, rows)
+    db.execute(insert(TransferMetrics), rows)
+    db.commit()
+
+
+def test_metrics_table_has_query_indexes(db):
+    indexed = {
+        column
+        for index in inspect(db.get_bind()).get_indexes("transfer_metrics")
+        for column in index["column_names"]
+    }
+    assert {"timestamp", "file_type", "transfer_status"} <= indexed
+
+
+def test_rollups_accumulate_across_batches(db):
+    _store(db, [_row(5, throughput=10.0), _row(20, throughput=30.0)])
+    _store(db, [_row(40, throughput=20.0, status="Failed"), _row(70, throughput=50.0)])
+
+    hourly = analytics.rollups(db, "hour", file_type=".iso")
+    assert [r["bucket_start"].hour for r in hourly] == [10, 11]
+    first = hourly[0]
+    assert first["transfer_count"] == 3
+    assert first["failed_count"] == 1
+    assert first["failure_rate"] == pytest.approx(1 / 3)
+    assert first["total_bytes"] == 2500
+    assert first["throughput_avg"] == pytest.approx(20.0)
+    assert first["throughput_max"] == 30.0
+
+    (daily,) = analytics.rollups(db, "day")
+    assert daily["transfer_count"] == 4
+    assert daily["throughput_max"] == 50.0
+
+
+def test_rebuild_rollups_matches_incremental_rollups(db):
+    rows = [_row(i * 17, file_type=(".iso", ".txt")[i % 2], throughput=float(i)) for i in range(12)]
+    _store(db, rows)
+    incremental = analytics.rollups(db, "hour")
+
+    analytics.rebuild_rollups(db, batch_size=5)
+    db.commit()
+
+    assert analytics.rollups(db, "hour") == incremental
+
+
+def test_throughput_percentile_filters_by_type_and_time(db):
+    _store(db, [_row(i, throughput=float(i + 1)) for i in range(100)])
+    _store(db, [_row(i, file_type=".txt", throughput=1000.0) for i in range(10)])
+
+    p95 = analytics.throughput_percentile(db, 95, file_type=".iso")
+    assert p95 == pytest.approx(95.05)
+
+    since = datetime(2026, 3, 2, 10, 50, tzinfo=timezone.utc)
+    assert analytics.throughput_percentile(db, 0, since=since, file_type=".iso") == 51.0
+    assert analytics.throughput_percentile(db, 50, file_type=".zip") is None
+
+
+def test_export_transfers_streams_in_timestamp_order(db):
+    _store(db, [_row(30), _row(10), _row(20, status="Failed")])
+
+    exported = list(analytics.export_transfers(db, status="Success", batch_size=1))
+
+    assert [row["file_name"] for row in exported] == ["f10.iso", "f30.iso"]
+    assert "throughput_p95" in exported[0]
@@ -0,0 +1,84 @@
+import csv
+import json
+
+import pytest
+
+from benchmarks.loopback import (
+    CASE_KEYS,
+    compare,
+    load_results,
+    main,
+    make_file,
+    parse_size,
+    run_benchmark,
+    write_results,
+)
+
+
+def test_parse_size_units():
+    assert parse_size("512") == 512
+    assert parse_size("1K") == 1024
+    assert parse_size("64kb") == 64 * 1024
+    assert parse_size("1.5M") == 1536 * 1024
+    assert parse_size("4G") == 4 * 1024 ** 3
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+@pytest.mark.parametrize("kind", ["sparse", "random"])
+def test_make_file_has_the_requested_size(tmp_path, kind):
+    path = make_file(str(tmp_path / "f.bin"), 3 * 1024 * 1024 + 7, kind)
+
+    with open(path, "rb") as f:
+        data = f.read()
+    assert len(data) == 3 * 1024 * 1024 + 7
+    assert (data.count(0) == len(data)) == (kind == "sparse")
+
+
+def _case(**metrics):
+    row = {"engine": "threaded", "chunk_size": 262144, "file_size": 1024, "file_kind": "sparse", "concurrency": 1}
+    row.update(metrics)
+    return row
+
+
+def test_compare_flags_regressions_in_either_direction():
+    baseline = [_case(throughput_mb_s=100.0, latency_p99_ms=10.0, server_peak_rss_mb=50.0)]
+    current = [_case(throughput_mb_s=80.0, latency_p99_ms=10.5, server_peak_rss_mb=40.0),
+               _case(concurrency=8, throughput_mb_s=1.0)]  # not in the baseline
+
+    changes = {c["metric"]: c for c in compare(baseline, current, threshold=0.1)}
+
+    assert set(changes) == {"throughput_mb_s", "latency_p99_ms", "server_peak_rss_mb"}
+    assert changes["throughput_mb_s"]["regression"]
+    assert changes["throughput_mb_s"]["change"] == pytest.approx(-0.2)
+    assert not changes["latency_p99_ms"]["regression"]  # 5 % worse, within threshold
+    assert changes["server_peak_rss_mb"]["change"] == pytest.approx(0.2)  # less memory is better
+
+
+def test_loopback_run_writes_json_and_csv(tmp_path):
+    results = run_benchmark(
+        sizes=[1024, 300 * 1024], concurrency=[1, 2], repeat=1, work_dir=str(tmp_path), progress=None,
+    )
+
+    assert [(r["file_size"], r["concurrency"]) for r in results] == [(1024, 1), (1024, 2), (307200, 1), (307200, 2)]
+    for row in results:
+        assert row["errors"] == 0, row["error_samples"]
+        assert row["total_bytes"] == row["file_size"] * row["concurrency"]
+        assert row["throughput_mb_s"] > 0
+        assert 0 < row["latency_p50_ms"] <= row["latency_p99_ms"]
+        assert row["server_peak_rss_mb"] > 0
+    assert list(tmp_path.iterdir()) == []  # work files cleaned up
+
+    json_path, csv_path = write_results(results, str(tmp_path / "out" / "run"))
+    assert load_results(json_path) == json.loads(json.dumps(results))
+    with open(csv_path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [int(row["concurrency"]) for row in rows] == [1, 2, 1, 2]
+    assert "error_samples" not in rows[0]
+
+    # unchanged results never regress; a halved throughput does
+    assert main(["compare", json_path, json_path]) == 0
+    slower = [dict(row, throughput_mb_s=row["throughput_mb_s"] / 2) for row in results]
+    slower_path, _ = write_results(slower, str(tmp_path / "out" / "slower"))
+    assert main(["compare", json_path, slower_path]) == 1
+    assert set(CASE_KEYS) <= set(rows[0])
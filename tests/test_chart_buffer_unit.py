@@ -0,0 +1,59 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from server.chart_buffer import ChartBuffer
+
+
+def test_chart_buffer_returns_samples_in_order_before_wrapping():
+    buffer = ChartBuffer(2, window=5)
+    for i in range(3):
+        buffer.append(i, i * 10)
+
+    x, (first, second) = buffer.view()
+
+    assert list(x) == [0, 1, 2]
+    assert list(first) == [0, 1, 2]
+    assert list(second) == [0, 10, 20]
+
+
+def test_chart_buffer_keeps_latest_window_after_wrapping():
+    buffer = ChartBuffer(1, window=4)
+    for i in range(10):
+        buffer.append(float(i))
+
+    x, (values,) = buffer.view()
+
+    assert len(buffer) == 4
+    assert list(x) == [6, 7, 8, 9]
+    assert list(values) == [6.0, 7.0, 8.0, 9.0]
+
+
+def test_chart_buffer_view_is_not_changed_by_later_appends():
+    buffer = ChartBuffer(1, window=4)
+    buffer.append(1.0)
+    _, (values,) = buffer.view()
+
+    buffer.clear()
+    buffer.append(2.0)
+
+    assert list(values) == [1.0]
+    assert list(buffer.view()[1][0]) == [2.0]
+
+
+@pytest.mark.parametrize("count", [3, 6, 11])
+def test_chart_buffer_extend_matches_repeated_append(count):
+    samples = [(float(i), float(-i)) for i in range(count)]
+    appended = ChartBuffer(2, window=5)
+    extended = ChartBuffer(2, window=5)
+    appended.append(100.0, 100.0)
+    extended.append(100.0, 100.0)
+
+    for sample in samples:
+        appended.append(*sample)
+    extended.extend(samples)
+
+    x_a, series_a = appended.view()
+    x_e, series_e = extended.view()
+    assert list(x_a) == list(x_e)
+    assert [list(s) for s in series_a] == [list(s) for s in series_e]
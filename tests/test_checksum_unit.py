@@ -0,0 +1,32 @@
+import hashlib
+import zlib
+
+import pytest
+
+from common.checksum import CHECKSUM_IDS, StreamingChecksum
+
+
+@pytest.mark.parametrize("algorithm", sorted(CHECKSUM_IDS))
+def test_streaming_checksum_matches_one_shot_digest(algorithm):
+    data = bytes(range(256)) * 1000
+    checksum = StreamingChecksum(algorithm)
+    for i in range(0, len(data), 4096):
+        checksum.update(memoryview(data)[i:i + 4096])
+
+    digest = checksum.digest()
+    assert len(digest) == checksum.digest_size
+    assert checksum.bytes_hashed == len(data)
+    if algorithm == "crc32":
+        assert digest == zlib.crc32(data).to_bytes(4, "big")
+    elif algorithm == "sha256":
+        assert digest == hashlib.sha256(data).digest()
+
+
+def test_streaming_checksum_round_trips_algorithm_id():
+    for algorithm, algorithm_id in CHECKSUM_IDS.items():
+        assert StreamingChecksum.from_id(algorithm_id).algorithm == algorithm
+
+
+def test_streaming_checksum_rejects_unknown_algorithm():
+    with pytest.raises(ValueError):
+        StreamingChecksum("md4")
@@ -1,8 +1,18 @@
 import os
 import socket
+import threading
+
 import pytest
 
 from client.client_core import ClientCore
+from common.protocol import (
+    ACK_FRAME,
+    ACK_OK,
+    ACK_STORED_FILE,
+    ACK_STORED_METRICS,
+    FLAG_ACK,
+    parse_header,
+)
 
 
 class FakeSocket:
@@ -11,6 +21,8 @@ class FakeSocket:
         self.connected_to = None
         self.sent_data = []
         self.closed = False
+        self.shut_down = None
+        self.reply = b""
 
     def connect(self, addr):
         self.connected_to = addr
@@ -20,6 +32,14 @@ class FakeSocket:
     def sendall(self, data: bytes):
         self.sent_data.append(data)
 
+    def shutdown(self, how):
+        self.shut_down = how
+
+    def recv(self, size):
+        # replies queued by a test, then EOF (a server that sends nothing)
+        reply, self.reply = self.reply[:size], self.reply[size:]
+        return reply
+
     def close(self):
         self.closed = True
 
@@ -43,17 +63,17 @@ def test_send_file_sends_header_and_body(monkeypatch, tmp_path):
     assert fake_socket.connected_to == ("127.0.0.1", 5000)
 
     all_sent = b"".join(fake_socket.sent_data)
-    header_end = all_sent.find(b"\n")
-    assert header_end != -1
-
-    header = all_sent[: header_end + 1].decode()
-    body = all_sent[header_end + 1 :]
+    header, consumed = parse_header(all_sent)
+    body = all_sent[consumed:]
 
     expected_name = os.path.basename(tmp_file)
     expected_size = os.path.getsize(tmp_file)
     expected_type = os.path.splitext(tmp_file)[1].lower()
 
-    assert header == f"{expected_name}|{expected_size}|{expected_type}\n"
+    assert header.legacy is False
+    assert header.file_name == expected_name
+    assert header.file_size == expected_size
+    assert header.file_type == expected_type
     assert body == content
     assert fake_socket.closed is True
 
@@ -68,3 +88,134 @@ def test_connect_raises_on_failure(monkeypatch):
 
     with pytest.raises(ConnectionRefusedError):
         client.connect()
+
+
+def _sent_header_and_body(fake_socket):
+    all_sent = b"".join(bytes(chunk) for chunk in fake_socket.sent_data)
+    header, consumed = parse_header(all_sent)
+    return header, all_sent[consumed:]
+
+
+def test_send_file_range_without_sendfile_support(monkeypatch, tmp_path):
+    # FakeSocket has no fileno(), so the buffered copy loop is used
+    fake_socket = FakeSocket()
+    monkeypatch.setattr("client.client_core.socket.socket", lambda *a, **k: fake_socket, raising=True)
+
+    content = bytes(range(256)) * 1024
+    tmp_file = tmp_path / "ranged.bin"
+    tmp_file.write_bytes(content)
+
+    client = ClientCore(host="127.0.0.1", port=5000)
+    client.send_file(str(tmp_file), offset=1000, length=100_000)
+
+    header, body = _sent_header_and_body(fake_socket)
+    assert header.file_size == 100_000
+    assert body == content[1000:101_000]
+    assert fake_socket.closed is True
+
+
+def test_send_file_uses_sendfile_over_real_socket(tmp_path):
+    content = os.urandom(300 * 1024)
+    tmp_file = tmp_path / "big.bin"
+    tmp_file.write_bytes(content)
+
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    host, port = listener.getsockname()
+
+    client = ClientCore(host=host, port=port)
+    received = []
+
+    def accept_and_read():
+        conn, _ = listener.accept()
+        with conn:
+            while True:
+                data = conn.recv(65536)
+                if not data:
+                    break
+                received.append(data)
+
+    reader = threading.Thread(target=accept_and_read)
+    reader.start()
+    client.send_file(str(tmp_file), offset=4096)
+    reader.join(timeout=5)
+    listener.close()
+
+    header, consumed = parse_header(b"".join(received))
+    assert header.file_size == len(content) - 4096
+    assert b"".join(received)[consumed:] == content[4096:]
+
+
+def test_send_file_rejects_offset_past_end(tmp_path):
+    tmp_file = tmp_path / "tiny.bin"
+    tmp_file.write_bytes(b"abc")
+
+    with pytest.raises(ValueError):
+        ClientCore(host="127.0.0.1", port=5000).send_file(str(tmp_file), offset=10)
+
+
+def test_send_file_reports_progress_and_aborts_from_callback(monkeypatch, tmp_path):
+    sockets = []
+
+    def factory(*args, **kwargs):
+        sockets.append(FakeSocket())
+        return sockets[-1]
+
+    monkeypatch.setattr("client.client_core.socket.socket", factory, raising=True)
+    content = os.urandom(3 * 1024 * 1024 + 5)
+    tmp_file = tmp_path / "progress.bin"
+    tmp_file.write_bytes(content)
+    client = ClientCore(host="127.0.0.1", port=5000)
+
+    reported = []
+    client.send_file(str(tmp_file), on_sent=reported.append)
+    assert sum(reported) == len(content)
+    assert len(reported) > 1
+
+    def abort(n):
+        raise RuntimeError("cancelled")
+
+    with pytest.raises(RuntimeError):
+        client.send_file(str(tmp_file), on_sent=abort)
+    assert sockets[-1].closed is True
+
+
+def test_send_file_reads_the_server_acknowledgement(monkeypatch, tmp_path):
+    fake_socket = FakeSocket()
+    fake_socket.reply = ACK_FRAME.pack(ACK_OK, ACK_STORED_FILE | ACK_STORED_METRICS, 5, 0.5, 0.25, 0.125, 1.0)
+    monkeypatch.setattr("client.client_core.socket.socket", lambda *a, **k: fake_socket, raising=True)
+    tmp_file = tmp_path / "acked.bin"
+    tmp_file.write_bytes(b"12345")
+
+    metrics = ClientCore(host="127.0.0.1", port=5000).send_file(str(tmp_file), ack=True)
+
+    header, _ = _sent_header_and_body(fake_socket)
+    assert header.flags & FLAG_ACK
+    assert fake_socket.shut_down == socket.SHUT_WR
+    assert metrics.acknowledged
+    assert metrics.bytes_sent == 5
+    result = metrics.to_dict()
+    assert result["server_status"] == "Success"
+    assert result["server_metrics_committed"] is True
+    assert result["server_disk_time"] == 0.25
+    assert result["server_time"] == 1.0
+    assert 0 <= result["time_to_first_byte"] <= result["total_wall_time"]
+
+
+def test_send_file_without_acknowledgement(monkeypatch, tmp_path):
+    fake_socket = FakeSocket()  # closes without replying, like an older server
+    monkeypatch.setattr("client.client_core.socket.socket", lambda *a, **k: fake_socket, raising=True)
+    tmp_file = tmp_path / "plain.bin"
+    tmp_file.write_bytes(b"12345")
+    client = ClientCore(host="127.0.0.1", port=5000)
+
+    metrics = client.send_file(str(tmp_file), ack=True)
+    assert not metrics.acknowledged
+    assert metrics.network_time is None
+
+    fake_socket.sent_data.clear()
+    metrics = client.send_file(str(tmp_file))  # no acknowledgement by default
+    header, _ = _sent_header_and_body(fake_socket)
+    assert not header.flags & FLAG_ACK
+    assert metrics.ack_wait_time is None
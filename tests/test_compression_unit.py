@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from common.compression import (
+    BLOCK_HEADER,
+    CODEC_IDS,
+    CompressionPolicy,
+    Decompressor,
+    compress_blocks,
+    make_compressor,
+)
+
+
+def _decode_blocks(framed: bytes, codec: str) -> bytes:
+    decompressor = Decompressor(CODEC_IDS[codec])
+    out = b""
+    pos = 0
+    while True:
+        (length,) = BLOCK_HEADER.unpack_from(framed, pos)
+        pos += BLOCK_HEADER.size
+        if length == 0:
+            break
+        out += decompressor.decompress(framed[pos:pos + length])
+        pos += length
+    assert pos == len(framed)
+    return out + decompressor.flush()
+
+
+@pytest.mark.parametrize("codec", sorted(CODEC_IDS))
+def test_compress_blocks_round_trip(codec):
+    data = b"log line with some repetition\n" * 2000
+
+    framed = compress_blocks(data, codec)
+
+    assert len(framed) < len(data)
+    assert _decode_blocks(framed, codec) == data
+
+
+def test_compress_blocks_of_empty_payload_is_just_the_end_marker():
+    assert _decode_blocks(compress_blocks(b"", "zlib"), "zlib") == b""
+
+
+def test_policy_skips_already_compressed_types():
+    policy = CompressionPolicy(codec="lzma")
+
+    assert policy.choose(".txt") == "lzma"
+    assert policy.choose(".JPG") is None
+    assert policy.choose(".mp4") is None
+
+
+def test_policy_probe_rejects_incompressible_sample():
+    policy = CompressionPolicy(probe=True)
+
+    assert policy.choose(".bin", os.urandom(64 * 1024)) is None
+    assert policy.choose(".bin", b"a" * 64 * 1024) == "zlib"
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        CompressionPolicy(codec="zstd")
+    with pytest.raises(ValueError):
+        make_compressor("zstd")
@@ -0,0 +1,82 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from client.client_core import ClientCore
+from server.headless import HeadlessServer, parse_args, timings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_flags_override_environment(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # no .env
+    monkeypatch.setenv("SERVER_PORT", "6000")
+    monkeypatch.setenv("SERVER_ENGINE", "asyncio")
+    monkeypatch.setenv("SERVER_SAVE_DIR", "/data/in")
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///env.db")
+
+    args = parse_args(["--port", "7000"])
+
+    assert args.port == 7000
+    assert args.engine == "asyncio"
+    assert args.save_dir == "/data/in"
+    assert args.db_url == "sqlite:///env.db"
+    assert args.host is None
+
+
+def test_server_core_import_leaves_heavy_modules_unloaded():
+    code = (
+        "import sys, server.headless, server.server_core;"
+        "print(sorted(m for m in ('PyQt5', 'pyqtgraph', 'sqlalchemy', 'numpy', 'asyncio', 'dotenv', 'db.database')"
+        " if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
+
+
+@pytest.mark.parametrize("engine", ["threaded", "asyncio"])
+def test_headless_server_receives_a_file(tmp_path, engine):
+    server = HeadlessServer("127.0.0.1", 0, str(tmp_path / "received"), engine)
+    server.start()
+    try:
+        source = tmp_path / "hello.txt"
+        source.write_bytes(b"headless" * 1000)
+        metrics = ClientCore(*server.address[:2]).send_file(str(source), ack=True)
+    finally:
+        server.stop()
+
+    assert metrics.server_status == "Success"
+    assert (tmp_path / "received" / "hello.txt").read_bytes() == source.read_bytes()
+    report = timings(server)
+    assert 0 < report["import_ms"] <= report["startup_ms"]
+
+
+def test_check_prints_startup_timings(tmp_path):
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "main_server.py"), "--headless", "--check",
+         "--host", "127.0.0.1", "--port", "0", "--save-dir", str(tmp_path / "received"),
+         "--db-url", f"sqlite:///{tmp_path / 'metrics.db'}"],
+        cwd=tmp_path, capture_output=True, text=True, timeout=60,
+    )
+
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert set(report) == {"import_ms", "startup_ms"}
+    assert "Ready on 127.0.0.1:" in result.stderr
+    assert "PyQt5" not in result.stderr
+
+
+def test_starting_and_stopping_does_not_load_the_database(tmp_path):
+    code = (
+        "import sys\n"
+        "from server.headless import HeadlessServer\n"
+        f"server = HeadlessServer('127.0.0.1', 0, {str(tmp_path / 'received')!r})\n"
+        "server.start()\n"
+        "server.stop()\n"
+        "print(sorted(m for m in ('sqlalchemy', 'db.database', 'numpy') if m in sys.modules))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert out.strip().splitlines()[-1] == "[]"
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import socket
 import threading
@@ -5,21 +6,36 @@ import time
 
 import pytest
 
-from client.client_core import ClientCore
+from client.client_core import ClientCore, file_identity
+from common.compression import CompressionPolicy
+from common.protocol import (
+    EXT_FILE_ID,
+    EXT_RANGE,
+    EXT_TRANSFER_ID,
+    FLAG_RANGE,
+    FLAG_RESUMABLE,
+    RESUME_REPLY,
+    FileHeader,
+    pack_range,
+)
 from server.server_core import ServerCore
 
 
-@pytest.fixture
-def running_server(tmp_path):
-    server = ServerCore(host="127.0.0.1", port=0, save_dir=str(tmp_path))
+@pytest.fixture(params=["threaded", "asyncio"])
+def running_server(request, tmp_path):
+    server = ServerCore(host="127.0.0.1", port=0, save_dir=str(tmp_path), engine=request.param)
 
     final_metrics = []
+    session_metrics = []
+    started_transfers = []
     server_errors = []
 
     def on_final(metrics_dict):
         final_metrics.append(metrics_dict)
 
     server.on_final_metrics = on_final
+    server.on_session_metrics = session_metrics.append
+    server.on_transfer_started = started_transfers.append
 
     def run_server():
         try:
@@ -43,6 +59,8 @@ def running_server(tmp_path):
         "host": host,
         "port": port,
         "metrics": final_metrics,
+        "sessions": session_metrics,
+        "started": started_transfers,
         "errors": server_errors,
         "save_dir": str(tmp_path),
     }
@@ -97,6 +115,57 @@ def test_small_file_transfer(running_server, tmp_path):
     assert m["file_size"] == len(content)
 
 
+def test_acknowledged_transfer_reports_end_to_end_timing(running_server, tmp_path):
+    content = os.urandom(2 * 1024 * 1024)
+    src_file = tmp_path / "src" / "acked.bin"
+    src_file.parent.mkdir()
+    src_file.write_bytes(content)
+
+    client = ClientCore(host=running_server["host"], port=running_server["port"])
+    metrics = client.send_file(str(src_file), checksum="crc32", ack=True)
+
+    # the acknowledgement comes after the file is durable and its row stored
+    assert metrics.acknowledged
+    assert metrics.server_status == "Success"
+    assert metrics.server_bytes_received == len(content)
+    assert metrics.server_file_synced and metrics.server_metrics_committed
+    assert metrics.server_time <= metrics.total_wall_time
+    assert metrics.server_disk_time <= metrics.server_time
+    assert metrics.bytes_sent == len(content)
+    assert metrics.send_rate > 0
+    assert metrics.network_time >= 0
+    saved = os.path.join(running_server["save_dir"], "acked.bin")
+    with open(saved, "rb") as f:
+        assert f.read() == content
+
+
+def test_concurrent_acknowledged_transfers(running_server, tmp_path):
+    # more uploads than the asyncio default executor has threads wait for
+    # their acknowledgement at the same time; the threaded engine's listen
+    # backlog of 5 is not meant for bursts like this
+    if running_server["server"].engine != "asyncio":
+        pytest.skip("asyncio engine only")
+    count = 40
+    results = {}
+
+    def send(i):
+        path = tmp_path / f"acked-{i}.bin"
+        path.write_bytes(os.urandom(4096))
+        client = ClientCore(host=running_server["host"], port=running_server["port"])
+        results[i] = client.send_file(str(path), ack=True)
+
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results) == count
+    for metrics in results.values():
+        assert metrics.server_status == "Success"
+        assert metrics.server_metrics_committed
+
+
 def test_large_file_transfer_10mb(running_server, tmp_path):
     host = running_server["host"]
     port = running_server["port"]
@@ -158,6 +227,15 @@ def test_simultaneous_transfers(running_server, tmp_path):
         matching = [m for m in metrics_list if m["file_name"] == name]
         assert matching, f"No metrics found for {name}"
 
+    # each transfer is announced once, under the id its final metrics carry
+    started = {info["transfer_id"]: info for info in running_server["started"]}
+    assert len(started) == len(contents)
+    for metrics in metrics_list:
+        info = started[metrics["transfer_id"]]
+        assert info["file_name"] == metrics["file_name"]
+        assert info["file_size"] == len(contents[metrics["file_name"]])
+        assert info["client_address"].startswith("127.0.0.1:")
+
 
 def test_client_disconnect_mid_transfer_marked_failed(running_server):
     host = running_server["host"]
@@ -181,3 +259,485 @@ def test_client_disconnect_mid_transfer_marked_failed(running_server):
     m = next(mm for mm in metrics_list if mm["file_name"] == "incomplete.bin")
     assert m["transfer_status"] == "Failed"
     assert m["transfer_byte_difference"] == expected_size - sent_size
+
+
+def test_parallel_multi_stream_transfer(running_server, tmp_path):
+    host = running_server["host"]
+    port = running_server["port"]
+    metrics_list = running_server["metrics"]
+    save_dir = running_server["save_dir"]
+
+    content = os.urandom(5 * 1024 * 1024 + 123)
+    src_dir = tmp_path / "src"
+    src_dir.mkdir()
+    src_file = src_dir / "parallel.bin"
+    src_file.write_bytes(content)
+
+    client = ClientCore(host=host, port=port)
+    client.send_file_parallel(str(src_file), streams=4)
+
+    _wait_for_metrics(metrics_list, expected_count=1)
+
+    # One record for the whole logical transfer
+    assert len(metrics_list) == 1
+    m = metrics_list[0]
+    assert m["file_name"] == "parallel.bin"
+    assert m["file_size"] == len(content)
+    assert m["transfer_status"] == "Success"
+    assert m["stream_count"] == 4
+    assert len(m["stream_throughputs"]) == 4
+
+    with open(os.path.join(save_dir, "parallel.bin"), "rb") as f:
+        assert f.read() == content
+
+
+def test_multi_stream_preallocates_off_the_accept_thread(running_server, tmp_path, monkeypatch):
+    import server.server_core
+
+    allocating = []
+    preallocate = server.server_core.preallocate
+
+    def slow_preallocate(file_path, size):
+        allocating.append(threading.current_thread())
+        time.sleep(0.3)  # the other streams wait; the server keeps serving
+        preallocate(file_path, size)
+
+    monkeypatch.setattr(server.server_core, "preallocate", slow_preallocate)
+    content = os.urandom(4 * 1024 * 1024)
+    src_file = tmp_path / "src" / "parallel.bin"
+    src_file.parent.mkdir()
+    src_file.write_bytes(content)
+    small_file = tmp_path / "src" / "small.bin"
+    small_file.write_bytes(b"s" * 1024)
+
+    client = ClientCore(host=running_server["host"], port=running_server["port"])
+    sender = threading.Thread(target=client.send_file_parallel, args=(str(src_file),), kwargs={"streams": 4})
+    sender.start()
+    _wait_until(lambda: allocating)
+    started = time.perf_counter()
+    client.send_file(str(small_file))
+    assert time.perf_counter() - started < 0.25
+    sender.join()
+
+    _wait_for_metrics(running_server["metrics"], expected_count=2)
+    assert len(allocating) == 1 and running_server["thread"] not in allocating
+    m = next(m for m in running_server["metrics"] if m["file_name"] == "parallel.bin")
+    assert m["transfer_status"] == "Success"
+    with open(os.path.join(running_server["save_dir"], "parallel.bin"), "rb") as f:
+        assert f.read() == content
+
+
+def _send_range(host, port, transfer_id, index, stream_count, total_size, payload, length=None):
+    # one stream of a multi-stream upload; `payload` may stop short of `length`
+    range_size = total_size // stream_count
+    header = FileHeader(
+        "broken.bin", range_size if length is None else length, ".bin",
+        flags=FLAG_RANGE,
+        extensions={
+            EXT_TRANSFER_ID: transfer_id,
+            EXT_RANGE: pack_range(index * range_size, total_size, index, stream_count),
+        },
+    ).encode()
+    with socket.create_connection((host, port)) as sock:
+        sock.sendall(header + payload)
+
+
+def _wait_until(condition, timeout_seconds=5):
+    deadline = time.time() + timeout_seconds
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.02)
+
+
+def test_multi_stream_transfer_with_a_broken_stream_fails(running_server):
+    server = running_server["server"]
+    transfer_id = os.urandom(16)
+    address = running_server["host"], running_server["port"]
+
+    _send_range(*address, transfer_id, 0, 2, 2048, b"a" * 1024)
+    _send_range(*address, transfer_id, 1, 2, 2048, b"b" * 100)  # connection drops mid-range
+
+    _wait_for_metrics(running_server["metrics"])
+    m = running_server["metrics"][0]
+    assert m["file_name"] == "broken.bin"
+    assert m["transfer_status"] == "Failed"
+    assert len(server._multi_streams) == 0
+    _wait_until(lambda: server.resource_sampler.active_transfers == 0)
+
+
+def test_multi_stream_rejects_streams_that_disagree_with_the_first(running_server):
+    server = running_server["server"]
+    transfer_id = os.urandom(16)
+    address = running_server["host"], running_server["port"]
+
+    _send_range(*address, transfer_id, 0, 2, 2048, b"")  # connects and ends at once
+    _wait_until(lambda: len(server._multi_streams) == 1)
+    _send_range(*address, transfer_id, 3, 4, 4096, b"c" * 1024, length=1024)  # more streams
+    _send_range(*address, transfer_id, 0, 2, 2048, b"a" * 1024)  # index 0 again
+    time.sleep(0.2)
+    assert running_server["metrics"] == []
+    assert len(server._multi_streams) == 1
+
+    _send_range(*address, transfer_id, 1, 2, 2048, b"b" * 1024)
+
+    _wait_for_metrics(running_server["metrics"])
+    m = running_server["metrics"][0]
+    assert m["transfer_status"] == "Failed"  # stream 0 sent nothing
+    assert m["stream_count"] == 2
+    assert len(server._multi_streams) == 0
+
+
+def test_multi_stream_transfer_expires_without_its_other_streams(running_server):
+    server = running_server["server"]
+    server._multi_streams.expiry = 0.2
+
+    _send_range(running_server["host"], running_server["port"], os.urandom(16), 0, 3, 3072, b"a" * 1024)
+
+    _wait_for_metrics(running_server["metrics"])
+    assert running_server["metrics"][0]["transfer_status"] == "Failed"
+    assert len(server._multi_streams) == 0
+    assert server.resource_sampler.active_transfers == 0
+
+
+def test_resumable_transfer(running_server, tmp_path):
+    host = running_server["host"]
+    port = running_server["port"]
+    metrics_list = running_server["metrics"]
+    save_dir = running_server["save_dir"]
+
+    content = os.urandom(3 * 1024 * 1024)
+    src_dir = tmp_path / "src"
+    src_dir.mkdir()
+    src_file = src_dir / "resumable.bin"
+    src_file.write_bytes(content)
+
+    client = ClientCore(host=host, port=port)
+    assert client.send_file_resumable(str(src_file)) == 0
+
+    _wait_for_metrics(metrics_list, expected_count=1)
+
+    m = metrics_list[0]
+    assert m["file_name"] == "resumable.bin"
+    assert m["transfer_status"] == "Success"
+    with open(os.path.join(save_dir, "resumable.bin"), "rb") as f:
+        assert f.read() == content
+
+
+def _start_resumable(running_server, src_file, sent):
+    # a first attempt that gets `sent` bytes across; returns its socket
+    header = FileHeader(
+        src_file.name, src_file.stat().st_size, src_file.suffix,
+        flags=FLAG_RESUMABLE, extensions={EXT_FILE_ID: file_identity(str(src_file))},
+    ).encode()
+    sock = socket.create_connection((running_server["host"], running_server["port"]))
+    sock.sendall(header)
+    assert RESUME_REPLY.unpack(sock.recv(RESUME_REPLY.size)) == (0,)
+    sock.sendall(src_file.read_bytes()[:sent])
+    return sock
+
+
+@pytest.mark.parametrize("half_open", [False, True])
+def test_resumable_transfer_continues_after_a_dropped_connection(running_server, tmp_path, half_open):
+    server = running_server["server"]
+    server.checkpoint_bytes = 64 * 1024
+    metrics_list = running_server["metrics"]
+
+    content = os.urandom(1024 * 1024)
+    src_file = tmp_path / "src" / "resumed.bin"
+    src_file.parent.mkdir()
+    src_file.write_bytes(content)
+
+    sent = 5 * server.checkpoint_bytes  # ends on a checkpoint, so the part file is flushed
+    first = _start_resumable(running_server, src_file, sent)
+    part_path = server.resume_store.part_path(file_identity(str(src_file)).hex())
+    _wait_until(lambda: os.path.getsize(part_path) == sent)
+    if not half_open:
+        first.close()
+
+    # a half-open first connection is still receiving: the reconnect takes
+    # its claim over instead of being refused
+    client = ClientCore(host=running_server["host"], port=running_server["port"])
+    assert client.send_file_resumable(str(src_file), retries=0) == sent
+    first.close()
+
+    _wait_for_metrics(metrics_list, expected_count=2)
+    assert sorted(m["transfer_status"] for m in metrics_list) == ["Failed", "Success"]
+    resumed = next(m for m in metrics_list if m["transfer_status"] == "Success")
+    assert resumed["resume_offset"] == sent
+    with open(os.path.join(running_server["save_dir"], "resumed.bin"), "rb") as f:
+        assert f.read() == content
+
+
+def test_directory_upload_over_one_session(running_server, tmp_path):
+    host = running_server["host"]
+    port = running_server["port"]
+    metrics_list = running_server["metrics"]
+    save_dir = running_server["save_dir"]
+
+    src_dir = tmp_path / "tree"
+    (src_dir / "nested" / "deeper").mkdir(parents=True)
+    files = {f"small{i}.txt": f"file {i}".encode() * (i + 1) for i in range(40)}
+    files["nested/big.bin"] = os.urandom(2 * 1024 * 1024)
+    files["nested/deeper/empty.dat"] = b""
+    for name, data in files.items():
+        (src_dir / name).write_bytes(data)
+
+    client = ClientCore(host=host, port=port)
+    sent = []
+    assert client.send_directory(str(src_dir), in_flight=4, on_sent=sent.append) == len(files)
+    assert sum(sent) == sum(len(d) for d in files.values())
+
+    _wait_for_metrics(running_server["sessions"], expected_count=1)
+
+    assert len(metrics_list) == len(files)
+    assert all(m["transfer_status"] == "Success" for m in metrics_list)
+    for name, data in files.items():
+        with open(os.path.join(save_dir, *name.split("/")), "rb") as f:
+            assert f.read() == data
+
+    session = running_server["sessions"][0]
+    assert session["file_count"] == len(files)
+    assert session["failed_count"] == 0
+    assert session["total_bytes"] == sum(len(d) for d in files.values())
+
+
+def test_compressed_transfer_records_wire_and_logical_bytes(running_server, tmp_path):
+    host = running_server["host"]
+    port = running_server["port"]
+    metrics_list = running_server["metrics"]
+    save_dir = running_server["save_dir"]
+
+    content = b"2024-01-01 INFO request served in 12ms\n" * 100_000
+    src_dir = tmp_path / "src"
+    src_dir.mkdir()
+    src_file = src_dir / "server.log"
+    src_file.write_bytes(content)
+
+    client = ClientCore(host=host, port=port)
+    client.send_file(str(src_file), compression=CompressionPolicy(codec="zlib", probe=True))
+
+    _wait_for_metrics(metrics_list, expected_count=1)
+
+    m = metrics_list[0]
+    assert m["transfer_status"] == "Success"
+    assert m["compression"] == "zlib"
+    assert m["logical_bytes"] == len(content)
+    assert m["wire_bytes"] < len(content) // 5
+    with open(os.path.join(save_dir, "server.log"), "rb") as f:
+        assert f.read() == content
+
+
+def test_decompression_and_hashing_run_off_the_accept_thread(running_server, tmp_path, monkeypatch):
+    from common.checksum import StreamingChecksum
+    from common.compression import Decompressor
+
+    threads = set()
+
+    def on_thread(cls, name):
+        method = getattr(cls, name)
+
+        def wrapper(self, *args):
+            threads.add(threading.current_thread())
+            return method(self, *args)
+
+        monkeypatch.setattr(cls, name, wrapper)
+
+    on_thread(Decompressor, "decompress")
+    on_thread(StreamingChecksum, "update")
+    content = b"2024-01-01 INFO request served in 12ms\n" * 50_000
+    src_file = tmp_path / "src" / "server.log"
+    src_file.parent.mkdir()
+    src_file.write_bytes(content)
+
+    client = ClientCore(host=running_server["host"], port=running_server["port"])
+    client.send_file(str(src_file), compression=CompressionPolicy(codec="zlib"), checksum="crc32")
+    _wait_for_metrics(running_server["metrics"])
+
+    assert running_server["metrics"][0]["checksum_ok"] is True
+    assert threads and running_server["thread"] not in threads
+
+
+def test_directory_upload_with_compression_policy(running_server, tmp_path):
+    host = running_server["host"]
+    port = running_server["port"]
+    metrics_list = running_server["metrics"]
+    save_dir = running_server["save_dir"]
+
+    src_dir = tmp_path / "tree"
+    src_dir.mkdir()
+    files = {
+        "notes.txt": b"compress me please " * 500,
+        "photo.jpg": os.urandom(4096),
+        "dump.sql": b"INSERT INTO t VALUES (1);\n" * 80_000,
+    }
+    for name, data in files.items():
+        (src_dir / name).write_bytes(data)
+
+    client = ClientCore(host=host, port=port)
+    client.send_directory(str(src_dir), compression=CompressionPolicy(codec="bz2"))
+
+    _wait_for_metrics(running_server["sessions"], expected_count=1)
+
+    by_name = {m["file_name"]: m for m in metrics_list}
+    assert by_name["photo.jpg"]["compression"] is None
+    assert by_name["notes.txt"]["compression"] == "bz2"
+    assert by_name["dump.sql"]["compression"] == "bz2"
+    for name, data in files.items():
+        assert by_name[name]["transfer_status"] == "Success"
+        with open(os.path.join(save_dir, name), "rb") as f:
+            assert f.read() == data
+
+
+@pytest.mark.parametrize("use_sendfile", [True, False])
+def test_checksummed_transfer_is_verified(running_server, tmp_path, use_sendfile):
+    host = running_server["host"]
+    port = running_server["port"]
+    metrics_list = running_server["metrics"]
+
+    content = os.urandom(3 * 1024 * 1024 + 7)
+    src_dir = tmp_path / "src"
+    src_dir.mkdir()
+    src_file = src_dir / "verified.bin"
+    src_file.write_bytes(content)
+
+    client = ClientCore(host=host, port=port)
+    client.send_file(str(src_file), use_sendfile=use_sendfile, checksum="crc32")
+
+    _wait_for_metrics(metrics_list, expected_count=1)
+
+    m = metrics_list[0]
+    assert m["transfer_status"] == "Success"
+    assert m["checksum_algorithm"] == "crc32"
+    assert m["checksum_ok"] is True
+
+
+def test_directory_upload_with_checksum_and_compression(running_server, tmp_path):
+    host = running_server["host"]
+    port = running_server["port"]
+    metrics_list = running_server["metrics"]
+    save_dir = running_server["save_dir"]
+
+    src_dir = tmp_path / "tree"
+    src_dir.mkdir()
+    files = {
+        "small.txt": b"tiny " * 100,
+        "big.log": b"GET /index.html 200\n" * 200_000,
+        "random.bin": os.urandom(2 * 1024 * 1024),
+    }
+    for name, data in files.items():
+        (src_dir / name).write_bytes(data)
+
+    client = ClientCore(host=host, port=port)
+    client.send_directory(
+        str(src_dir), compression=CompressionPolicy(codec="zlib"), checksum="blake2b"
+    )
+
+    _wait_for_metrics(running_server["sessions"], expected_count=1)
+
+    by_name = {m["file_name"]: m for m in metrics_list}
+    for name, data in files.items():
+        assert by_name[name]["transfer_status"] == "Success"
+        assert by_name[name]["checksum_ok"] is True
+        with open(os.path.join(save_dir, name), "rb") as f:
+            assert f.read() == data
+
+
+def test_dedup_upload_sends_only_changed_chunks(running_server, tmp_path):
+    host = running_server["host"]
+    port = running_server["port"]
+    metrics_list = running_server["metrics"]
+    save_dir = running_server["save_dir"]
+    store = running_server["server"].chunk_store
+    store_threads = set()
+
+    def on_thread(method):
+        def wrapper(*args):
+            store_threads.add(threading.current_thread())
+            return method(*args)
+        return wrapper
+
+    store.has, store.put, store.read = on_thread(store.has), on_thread(store.put), on_thread(store.read)
+
+    chunk_size = 64 * 1024
+    content = bytearray(os.urandom(20 * chunk_size + 100))
+    src_dir = tmp_path / "src"
+    src_dir.mkdir()
+    src_file = src_dir / "disk.img"
+    src_file.write_bytes(content)
+
+    client = ClientCore(host=host, port=port)
+    assert client.send_file_dedup(str(src_file), chunk_size=chunk_size) == len(content)
+    _wait_for_metrics(metrics_list, expected_count=1)
+    assert metrics_list[0]["dedup_bytes_saved"] == 0
+
+    # Change a single chunk; everything else is already on the server
+    content[5 * chunk_size:5 * chunk_size + 10] = b"0123456789"
+    src_file.write_bytes(content)
+    assert client.send_file_dedup(str(src_file), chunk_size=chunk_size) == chunk_size
+    _wait_for_metrics(metrics_list, expected_count=2)
+
+    m = metrics_list[1]
+    assert m["transfer_status"] == "Success"
+    assert m["dedup_bytes_saved"] == len(content) - chunk_size
+    assert m["dedup_ratio"] == pytest.approx((len(content) - chunk_size) / len(content))
+    with open(os.path.join(save_dir, "disk.img"), "rb") as f:
+        assert f.read() == bytes(content)
+    # hashing and chunk I/O never run on the accept thread (the event loop)
+    assert store_threads and running_server["thread"] not in store_threads
+
+
+def test_uploads_cannot_write_to_reserved_names(running_server, tmp_path):
+    server = running_server["server"]
+    save_dir = running_server["save_dir"]
+
+    chunk = os.urandom(64 * 1024)
+    src_file = tmp_path / "src" / "chunk.img"
+    src_file.parent.mkdir()
+    src_file.write_bytes(chunk)
+    client = ClientCore(host=running_server["host"], port=running_server["port"])
+    client.send_file_dedup(str(src_file), chunk_size=len(chunk))
+    _wait_for_metrics(running_server["metrics"])
+    digest = hashlib.sha256(chunk).digest()
+    chunk_name = os.path.relpath(server.chunk_store.path(digest), save_dir).replace(os.sep, "/")
+
+    forged = b"x" * len(chunk)
+    for name in (chunk_name, chunk_name.upper(), "./.partial/0.json", ".metrics_journal.jsonl"):
+        header = FileHeader(name, len(forged), ".bin").encode()
+        with socket.create_connection((running_server["host"], running_server["port"])) as sock:
+            sock.settimeout(5)
+            sock.sendall(header + forged)
+            sock.recv(1)  # the server refuses and closes
+
+    assert server.chunk_store.read(digest) == chunk
+    assert not os.path.exists(os.path.join(save_dir, ".partial", "0.json"))
+    assert not os.path.exists(os.path.join(save_dir, ".metrics_journal.jsonl"))
+    assert len(running_server["metrics"]) == 1
+
+
+def test_dedup_upload_fails_on_a_damaged_stored_chunk(running_server, tmp_path):
+    server = running_server["server"]
+    metrics_list = running_server["metrics"]
+
+    content = os.urandom(4 * 64 * 1024)
+    src_file = tmp_path / "src" / "disk.img"
+    src_file.parent.mkdir()
+    src_file.write_bytes(content)
+    client = ClientCore(host=running_server["host"], port=running_server["port"])
+    client.send_file_dedup(str(src_file), chunk_size=64 * 1024)
+    _wait_for_metrics(metrics_list, expected_count=1)
+
+    damaged = server.chunk_store.path(hashlib.sha256(content[64 * 1024:128 * 1024]).digest())
+    with open(damaged, "r+b") as f:
+        f.write(b"corrupt")
+
+    assert client.send_file_dedup(str(src_file), chunk_size=64 * 1024) == 0
+    _wait_for_metrics(metrics_list, expected_count=2)
+    assert metrics_list[1]["transfer_status"] == "Failed"
+
+    # the damaged chunk was dropped, so the retry sends it again
+    assert client.send_file_dedup(str(src_file), chunk_size=64 * 1024) == 64 * 1024
+    _wait_for_metrics(metrics_list, expected_count=3)
+    assert metrics_list[2]["transfer_status"] == "Success"
+    with open(os.path.join(running_server["save_dir"], "disk.img"), "rb") as f:
+        assert f.read() == content
@@ -0,0 +1,139 @@
+import json
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.load_generator import LoadResult, _collect, _share, main, run_load
+from benchmarks.workload import LatencyHistogram, SizeDistribution
+from server.server_core import ServerCore
+
+
+def test_size_distribution_specs():
+    rng = random.Random(1)
+
+    assert SizeDistribution("1M").sample(rng) == 1024 * 1024
+    uniform = SizeDistribution("uniform:1K-10K")
+    assert all(1024 <= uniform.sample(rng) <= 10 * 1024 for _ in range(200))
+    assert uniform.max_size == 10 * 1024
+    lognormal = SizeDistribution("lognormal:256K,1.5,1M")
+    assert all(1 <= lognormal.sample(rng) <= 1024 * 1024 for _ in range(200))
+    mix = SizeDistribution("mix:1K=70,1M=30")
+    samples = [mix.sample(rng) for _ in range(1000)]
+    assert set(samples) == {1024, 1024 * 1024}
+    assert 600 < samples.count(1024) < 800
+    assert mix.max_size == 1024 * 1024
+    for bad in ("", "uniform:2K-1K", "gamma:1K", "mix:1K=0"):
+        with pytest.raises(ValueError):
+            SizeDistribution(bad)
+
+
+def test_latency_histogram_percentiles_and_merge():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    for _ in range(90):
+        first.add(0.0015)  # 2 ms bucket
+    for _ in range(10):
+        second.add(0.3)  # 500 ms bucket
+
+    first.merge(second)
+
+    assert first.count == 100
+    assert first.percentile(50) == pytest.approx(0.002)
+    assert first.percentile(99) == pytest.approx(0.3)  # clamped to the max seen
+    assert first.mean == pytest.approx((90 * 0.0015 + 10 * 0.3) / 100)
+    assert first.buckets() == [(pytest.approx(0.002), 90), (pytest.approx(0.5), 10)]
+
+
+def test_load_results_merge():
+    a, b = LoadResult(), LoadResult()
+    a.started, a.finished, a.completed, a.bytes_sent = 10.0, 12.0, 3, 300
+    b.started, b.finished, b.completed, b.bytes_sent = 11.0, 14.0, 1, 100
+    b.errors["ConnectionRefusedError"] += 2
+
+    a.merge(b)
+
+    report = a.to_dict()
+    assert report["wall_time"] == 4.0
+    assert report["requests_per_s"] == 1.0
+    assert report["error_count"] == 2
+    assert [_share(10, 3, i) for i in range(3)] == [4, 3, 3]
+
+
+def test_collect_reports_workers_that_died_without_a_result(monkeypatch):
+    monkeypatch.setattr("benchmarks.load_generator.RESULT_POLL_INTERVAL", 0.01)
+    finished = LoadResult()
+    finished.completed = 5
+    results = queue.Queue()
+    results.put((0, finished))
+    workers = [SimpleNamespace(exitcode=0), SimpleNamespace(exitcode=-9), SimpleNamespace(exitcode=None)]
+    aborted = []
+    barrier = SimpleNamespace(abort=lambda: aborted.append(True))
+
+    def third_worker_reports_later():
+        time.sleep(0.05)
+        late = LoadResult()
+        late.completed = 2
+        results.put((2, late))
+
+    threading.Thread(target=third_worker_reports_later).start()
+    total = _collect(workers, results, barrier)
+
+    assert total.completed == 7
+    assert total.errors == {"process 1: exited with code -9": 1}
+    assert aborted
+
+
+def test_import_does_not_pull_in_qt_or_the_server():
+    code = (
+        "import sys, benchmarks.load_generator;"
+        "print(sorted(m for m in sys.modules if m.split('.')[0] in ('PyQt5', 'server', 'sqlalchemy')))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
+
+
+@pytest.fixture
+def server_address(tmp_path):
+    server = ServerCore(host="127.0.0.1", port=0, save_dir=str(tmp_path / "received"))
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    deadline = time.time() + 5
+    while server.server_socket is None and time.time() < deadline:
+        time.sleep(0.01)
+    yield server.server_socket.getsockname()
+    server.stop()
+    thread.join(timeout=5)
+
+
+def test_closed_loop_run(server_address, tmp_path):
+    host, port = server_address
+
+    result = run_load(host, port, sizes="mix:1K=50,64K=50", concurrency=3, processes=2,
+                      duration=30, requests=12, seed=7, work_dir=str(tmp_path))
+
+    assert not result.errors
+    assert result.completed == 12
+    assert result.latency.count == 12
+    assert 12 * 1024 <= result.bytes_sent <= 12 * 64 * 1024
+
+
+def test_open_loop_run_from_the_command_line(server_address, tmp_path, capsys):
+    host, port = server_address
+    report_path = tmp_path / "report.json"
+
+    status = main([
+        "--host", host, "--port", str(port), "--rate", "50", "--arrival", "uniform",
+        "--processes", "1", "--duration", "0.2", "--sizes", "4K",
+        "--work-dir", str(tmp_path), "--json", str(report_path),
+    ])
+
+    assert status == 0
+    report = json.loads(report_path.read_text())
+    assert 5 <= report["completed"] <= 11
+    assert report["bytes_sent"] == report["completed"] * 4096
+    assert "latency ms:" in capsys.readouterr().out
@@ -0,0 +1,76 @@
+import logging
+import threading
+
+from server.log_pipeline import LogEntry, LogFeed, LogFilter, LogPipeline
+
+
+def _record(message, level=logging.INFO, transfer_id=None):
+    record = logging.LogRecord("server.test", level, __file__, 1, message, None, None)
+    if transfer_id is not None:
+        record.transfer_id = transfer_id
+    return record
+
+
+def test_log_feed_drains_batches_and_bounds_the_backlog():
+    feed = LogFeed(capacity=3)
+    for i in range(5):
+        feed.handle(_record(f"line {i}"))
+
+    entries = feed.drain()
+
+    assert [entry.message for entry in entries] == ["line 2", "line 3", "line 4"]
+    assert feed.dropped == 2
+    assert feed.drain() == []
+
+
+def test_log_filter_by_level_and_transfer_id():
+    info = LogEntry.from_record(_record("a", transfer_id="1"))
+    warning = LogEntry.from_record(_record("b", logging.WARNING, transfer_id="2"))
+    untagged = LogEntry.from_record(_record("c"))
+    entries = [info, warning, untagged]
+
+    assert untagged.transfer_id == ""
+    assert [e.message for e in entries if LogFilter().accepts(e)] == ["a", "b", "c"]
+    assert [e.message for e in entries if LogFilter(logging.WARNING).accepts(e)] == ["b"]
+    assert [e.message for e in entries if LogFilter(transfer_id="1").accepts(e)] == ["a"]
+
+
+def test_pipeline_delivers_server_records_off_the_calling_thread():
+    delivered = []
+
+    class Recorder(logging.Handler):
+        def emit(self, record):
+            delivered.append((threading.current_thread(), self.format(record)))
+
+    pipeline = LogPipeline([Recorder()], level=logging.DEBUG)
+    pipeline.start()
+    try:
+        logging.getLogger("server.test").info("hello %s", "world", extra={"transfer_id": "7"})
+        logging.getLogger("server.test").debug("untagged")
+        logging.getLogger("other").warning("not ours")
+    finally:
+        pipeline.stop()  # flushes the queue
+
+    assert len(delivered) == 2
+    assert all(thread is not threading.current_thread() for thread, _ in delivered)
+    assert delivered[0][1].endswith("server.test [7] hello world")
+    assert delivered[1][1].endswith("server.test [] untagged")
+    assert not logging.getLogger("server").handlers
+
+
+def test_pipeline_drops_records_when_the_queue_is_full():
+    blocker = threading.Event()
+
+    class Slow(logging.Handler):
+        def emit(self, record):
+            blocker.wait(5)
+
+    pipeline = LogPipeline([Slow()], max_queue=2)
+    pipeline.start()
+    try:
+        for i in range(10):
+            logging.getLogger("server.test").warning("burst %d", i)  # never blocks
+        assert pipeline.dropped >= 10 - 2 - 1
+    finally:
+        blocker.set()
+        pipeline.stop()
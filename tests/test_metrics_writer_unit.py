@@ -0,0 +1,269 @@
+import json
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from server.metrics_writer import MetricsWriter
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.batches = []
+        self.failures = 0  # number of upcoming inserts that fail
+        self.refused = set()  # file names whose rows always fail
+
+    @contextmanager
+    def session(self):
+        yield self
+
+    def get_bind(self):
+        return SimpleNamespace(dialect=SimpleNamespace(name="sqlite"))
+
+    def execute(self, statement, rows=None):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unreachable")
+        if rows is not None and any(row["file_name"] in self.refused for row in rows):
+            raise ValueError("constraint violated")
+        if rows is not None:  # rollup upserts come without rows
+            self.batches.append(list(rows))
+
+    @property
+    def rows(self):
+        return [row for batch in self.batches for row in batch]
+
+
+def _metrics(i):
+    return {
+        "file_name": f"file-{i}.bin",
+        "file_size": i,
+        "throughput": 1.0,
+        "stream_throughputs": [1.0],  # not a column, must be dropped
+    }
+
+
+def _writer(database, tmp_path, **kwargs):
+    kwargs.setdefault("flush_interval", 0.05)
+    kwargs.setdefault("retry_delay", 0.001)
+    return MetricsWriter(database.session, str(tmp_path / "journal.jsonl"), **kwargs)
+
+
+def test_metrics_writer_coalesces_rows_into_bulk_inserts(tmp_path):
+    database = FakeDatabase()
+    writer = _writer(database, tmp_path, batch_size=10, flush_interval=5.0)
+
+    for i in range(25):
+        writer.submit(_metrics(i))
+    writer.stop()
+
+    assert [len(batch) for batch in database.batches] == [10, 10, 5]
+    assert [row["file_name"] for row in database.rows] == [f"file-{i}.bin" for i in range(25)]
+    assert "stream_throughputs" not in database.rows[0]
+    assert database.rows[0]["timestamp"] is not None
+    assert writer.rows_written == 25
+
+
+def test_metrics_writer_flushes_partial_batch_after_interval(tmp_path):
+    database = FakeDatabase()
+    writer = _writer(database, tmp_path, batch_size=100)
+
+    writer.submit(_metrics(1))
+    writer.flush()
+
+    assert len(database.rows) == 1
+    writer.stop()
+
+
+def test_metrics_writer_retries_then_succeeds(tmp_path):
+    database = FakeDatabase()
+    database.failures = 2
+    writer = _writer(database, tmp_path, retries=3)
+
+    writer.submit(_metrics(1))
+    writer.stop()
+
+    assert len(database.rows) == 1
+    assert writer.rows_spilled == 0
+
+
+def test_metrics_writer_spills_to_journal_and_replays(tmp_path):
+    database = FakeDatabase()
+    database.failures = 2
+    writer = _writer(database, tmp_path, retries=2)
+
+    writer.submit(_metrics(1))
+    writer.stop()
+
+    journal = tmp_path / "journal.jsonl"
+    assert database.rows == []
+    assert writer.rows_spilled == 1
+    assert json.loads(journal.read_text())["metrics"]["file_name"] == "file-1.bin"
+
+    # The database is back: the next writer replays the journal first
+    writer = _writer(database, tmp_path)
+    writer.submit(_metrics(2))
+    writer.stop()
+
+    assert sorted(row["file_name"] for row in database.rows) == ["file-1.bin", "file-2.bin"]
+    assert not journal.exists()
+
+
+def test_metrics_writer_spills_when_queue_is_full(tmp_path):
+    database = FakeDatabase()
+    writer = _writer(database, tmp_path, max_queue=1)
+    writer._start_thread = lambda: None  # keep the queue from draining
+
+    writer.submit(_metrics(1))
+    writer.submit(_metrics(2))
+
+    assert writer.pending == 1
+    assert writer.rows_spilled == 1
+
+
+def test_metrics_writer_rejects_empty_batches(tmp_path):
+    with pytest.raises(ValueError):
+        _writer(FakeDatabase(), tmp_path, batch_size=0)
+
+
+def test_metrics_writer_reports_stored_rows_without_waiting_for_the_batch(tmp_path):
+    database = FakeDatabase()
+    writer = _writer(database, tmp_path, batch_size=100, flush_interval=30.0)
+    stored = []
+
+    writer.submit(_metrics(1), on_stored=stored.append)
+    writer.flush()  # returns long before the 30 s flush interval
+
+    assert stored == [True]
+    assert len(database.rows) == 1
+    writer.stop()
+
+
+def test_metrics_writer_reports_spilled_rows(tmp_path):
+    database = FakeDatabase()
+    database.failures = 2
+    writer = _writer(database, tmp_path, retries=2)
+    stored = []
+
+    writer.submit(_metrics(1), on_stored=stored.append)
+    writer.stop()
+
+    assert stored == [False]
+    assert writer.rows_spilled == 1
+
+
+def test_metrics_writer_batches_rows_queued_behind_a_waiter(tmp_path):
+    database = FakeDatabase()
+    inserting = threading.Event()
+    release = threading.Event()
+    execute = database.execute
+
+    def slow_first_insert(statement, rows=None):
+        if rows is not None and not database.batches:
+            inserting.set()
+            release.wait(5)
+        execute(statement, rows)
+
+    database.execute = slow_first_insert
+    writer = _writer(database, tmp_path, batch_size=100, flush_interval=30.0)
+    stored = []
+
+    writer.submit(_metrics(0), on_stored=stored.append)
+    assert inserting.wait(5)
+    for i in range(1, 21):  # an acknowledged burst arriving during that insert
+        writer.submit(_metrics(i), on_stored=stored.append)
+    release.set()
+    writer.flush()
+
+    assert [len(batch) for batch in database.batches] == [1, 20]
+    assert stored == [True] * 21
+    writer.stop()
+
+
+def test_metrics_writer_journals_rows_submitted_after_stop(tmp_path):
+    database = FakeDatabase()
+    writer = _writer(database, tmp_path)
+    writer.submit(_metrics(1))
+    writer.stop()
+    stored = []
+
+    writer.submit(_metrics(2), on_stored=stored.append)
+
+    assert writer._thread is None  # no writer nobody would stop
+    assert stored == [False]
+    assert writer.rows_spilled == 1
+    assert json.loads((tmp_path / "journal.jsonl").read_text())["metrics"]["file_name"] == "file-2.bin"
+
+    writer.start()  # restarting replays it
+    writer.submit(_metrics(3))
+    writer.stop()
+    assert sorted(row["file_name"] for row in database.rows) == ["file-1.bin", "file-2.bin", "file-3.bin"]
+
+
+def test_metrics_writer_moves_refused_journal_rows_aside(tmp_path):
+    database = FakeDatabase()
+    database.failures = 2
+    writer = _writer(database, tmp_path, retries=2, batch_size=3, flush_interval=5.0)
+    for i in range(3):
+        writer.submit(_metrics(i))
+    writer.stop()
+    assert writer.rows_spilled == 3
+
+    database.refused.add("file-1.bin")
+    writer = _writer(database, tmp_path)
+    writer.submit(_metrics(3))
+    writer.stop()
+
+    assert sorted(row["file_name"] for row in database.rows) == ["file-0.bin", "file-2.bin", "file-3.bin"]
+    assert not (tmp_path / "journal.jsonl").exists()
+    rejected = (tmp_path / "journal.jsonl.rejected").read_text().splitlines()
+    assert [json.loads(line)["metrics"]["file_name"] for line in rejected] == ["file-1.bin"]
+
+
+def test_metrics_writer_moves_torn_journal_lines_aside(tmp_path):
+    database = FakeDatabase()
+    journal = tmp_path / "journal.jsonl"
+    good = json.dumps({"metrics": _metrics(0), "series": None})
+    journal.write_text(good + "\n" + '{"metrics": {"file_na')  # crashed mid-write
+
+    writer = _writer(database, tmp_path)
+    writer.submit(_metrics(1))
+    writer.flush()
+
+    assert sorted(row["file_name"] for row in database.rows) == ["file-0.bin", "file-1.bin"]
+    assert writer.rows_written == 2
+    assert not journal.exists()
+    assert (tmp_path / "journal.jsonl.rejected").read_text() == '{"metrics": {"file_na\n'
+    writer.stop()
+
+
+def test_metrics_writer_replays_the_journal_in_batches(tmp_path):
+    database = FakeDatabase()
+    journal = tmp_path / "journal.jsonl"
+    journal.write_text("".join(json.dumps({"metrics": _metrics(i), "series": None}) + "\n" for i in range(5)))
+
+    writer = _writer(database, tmp_path, batch_size=2)
+    writer.start()
+    writer.stop()
+
+    assert [len(batch) for batch in database.batches] == [2, 2, 1]
+    assert not journal.exists()
+
+
+def test_metrics_writer_survives_a_batch_it_cannot_store_or_journal(tmp_path):
+    database = FakeDatabase()
+    database.failures = 1
+    writer = MetricsWriter(
+        database.session, str(tmp_path / "missing" / "journal.jsonl"), retries=1, flush_interval=0.05
+    )
+    stored = []
+
+    writer.submit(_metrics(1), on_stored=stored.append)
+    writer.flush()  # the journal cannot be written either
+    writer.submit(_metrics(2), on_stored=stored.append)
+    writer.flush()
+
+    assert stored == [False, True]
+    assert [row["file_name"] for row in database.rows] == ["file-2.bin"]
+    writer.stop()
@@ -0,0 +1,51 @@
+import pytest
+
+from common.protocol import FIXED_HEADER_SIZE, FileHeader, ProtocolError, parse_header
+
+
+def test_binary_header_round_trip_with_trailing_payload():
+    encoded = FileHeader("report.txt", 1234, ".txt", flags=0x3, extensions={7: b"abc"}).encode()
+
+    header, consumed = parse_header(encoded + b"payload")
+
+    assert consumed == len(encoded)
+    assert header.legacy is False
+    assert header.file_name == "report.txt"
+    assert header.file_size == 1234
+    assert header.file_type == ".txt"
+    assert header.flags == 0x3
+    assert header.extensions == {7: b"abc"}
+
+
+def test_binary_header_needs_more_data_until_complete():
+    encoded = FileHeader("a.bin", 10, ".bin").encode()
+
+    for cut in (1, FIXED_HEADER_SIZE - 1, len(encoded) - 1):
+        assert parse_header(encoded[:cut]) is None
+
+    with pytest.raises(ProtocolError):
+        parse_header(encoded[:FIXED_HEADER_SIZE], eof=True)
+
+
+def test_legacy_header_is_detected():
+    header, consumed = parse_header(b"old.bin|42|.bin\nBODY")
+
+    assert header.legacy is True
+    assert (header.file_name, header.file_size, header.file_type) == ("old.bin", 42, ".bin")
+    assert consumed == len(b"old.bin|42|.bin\n")
+
+
+def test_legacy_header_malformed_or_truncated():
+    assert parse_header(b"no-newline-yet") is None
+
+    header, _ = parse_header(b"garbage", eof=True)
+    assert header.file_name == "unknown"
+    assert header.file_size is None
+
+
+def test_unsupported_version_is_rejected():
+    encoded = bytearray(FileHeader("a.bin", 1, ".bin").encode())
+    encoded[4] = 99
+
+    with pytest.raises(ProtocolError):
+        parse_header(bytes(encoded))
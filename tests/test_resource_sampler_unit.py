@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from server.resource_sampler import ResourceSampler
+
+
+def test_transfer_probe_spans_samples_taken_while_active():
+    sampler = ResourceSampler(interval=0.005)
+    realtime = []
+    sampler.on_sample = lambda probe, throughput, cpu, ram: realtime.append(probe.transfer_id)
+    sampler.start()
+    try:
+        probe = sampler.begin()
+        for _ in range(10):
+            probe.add(1024 * 1024)
+            time.sleep(0.01)
+        sampler.end(probe)
+    finally:
+        sampler.stop()
+
+    assert probe.bytes_received == 10 * 1024 * 1024
+    assert probe.end_index > probe.start_index
+    assert len(probe.cpu_samples) == len(probe.ram_samples) == probe.end_index - probe.start_index
+    assert probe.throughput_samples and max(probe.throughput_samples) > 0
+    assert len(realtime) >= len(probe.throughput_samples)
+    assert set(realtime) == {probe.transfer_id}
+    assert sampler.active_transfers == 0
+
+
+def test_sampler_samples_inline_when_thread_is_not_running():
+    sampler = ResourceSampler()
+    probe = sampler.begin()
+    probe.add(100)
+    sampler.end(probe)
+
+    assert sampler.count == 2
+    assert len(probe.cpu_samples) == 2
+    times, cpu, ram, system_cpu, system_ram = sampler.samples(0, sampler.count)
+    assert len(times) == len(system_ram) == 2
+    assert times[0] <= times[1]
+
+
+def test_ring_buffer_keeps_only_the_latest_capacity_samples():
+    sampler = ResourceSampler(capacity=4)
+    for _ in range(10):
+        sampler.sample()
+
+    times, *_ = sampler.samples(0, sampler.count)
+    assert len(times) == 4
+    assert times == sorted(times)
+
+
+def test_sampler_rejects_invalid_settings():
+    with pytest.raises(ValueError):
+        ResourceSampler(interval=0)
+    with pytest.raises(ValueError):
+        ResourceSampler(capacity=0)
+
+
+def test_sampler_is_idle_without_transfers():
+    sampler = ResourceSampler(interval=0.005)
+    sampler.start()
+    try:
+        time.sleep(0.05)
+        assert sampler.count == 0
+        probe = sampler.begin()
+        time.sleep(0.05)
+        sampler.end(probe)
+        busy_count = sampler.count
+        time.sleep(0.05)
+        assert sampler.count <= busy_count + 1  # at most one sample in flight
+    finally:
+        sampler.stop()
+
+    assert busy_count > 2
+    assert not sampler.is_running
+
+
+def test_ended_probe_is_not_recorded_to_any_more():
+    sampler = ResourceSampler(interval=0.001)
+    sampler.start()
+    try:
+        ended = sampler.begin()
+        active = sampler.begin()  # keeps the thread sampling
+        time.sleep(0.02)
+        sampler.end(ended)
+        recorded = len(ended.throughput_samples)
+        time.sleep(0.02)
+        assert len(ended.throughput_samples) == recorded
+        assert len(active.throughput_samples) > recorded
+        sampler.end(active)
+    finally:
+        sampler.stop()
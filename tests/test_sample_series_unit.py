@@ -0,0 +1,44 @@
+import statistics
+
+import pytest
+
+from server import sample_series
+from server.sample_series import SampleSeries
+
+
+def test_sample_series_tracks_running_stats_over_all_samples():
+    values = [3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0]
+    series = SampleSeries(values, capacity=3)
+
+    assert series.count == len(values)
+    assert len(series) == 3
+    assert list(series.values()) == [9.0, 2.0, 6.0]
+    assert series.min == 1.0
+    assert series.max == 9.0
+    assert series.mean == pytest.approx(statistics.fmean(values))
+    assert series.variance == pytest.approx(statistics.pvariance(values))
+
+
+def test_sample_series_empty_is_falsy_with_zero_stats():
+    series = SampleSeries()
+
+    assert not series
+    assert series.mean == series.max == series.variance == 0.0
+    assert series.percentiles((50, 99)) == [0.0, 0.0]
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_sample_series_percentiles_interpolate_linearly(monkeypatch, use_numpy):
+    if use_numpy and sample_series._numpy() is None:
+        pytest.skip("numpy is not installed")
+    if not use_numpy:
+        monkeypatch.setattr(sample_series, "np", None)
+    series = SampleSeries([10.0, 20.0, 30.0, 40.0])
+
+    assert series.percentiles((0, 50, 100)) == pytest.approx([10.0, 25.0, 40.0])
+    assert series.percentiles((95,)) == pytest.approx([38.5])
+
+
+def test_sample_series_rejects_zero_capacity():
+    with pytest.raises(ValueError):
+        SampleSeries(capacity=0)
@@ -1,15 +1,33 @@
+import hashlib
 import os
 import time
 
 import pytest
 
+from common.checksum import CHECKSUM_IDS
 from server.server_core import ServerCore
 from server.server_model import FileTransferMetrics
+from common.protocol import (
+    DEDUP_PARAMS,
+    EXT_CHECKSUM,
+    EXT_DEDUP,
+    EXT_FILE_ID,
+    EXT_RANGE,
+    EXT_TRANSFER_ID,
+    FLAG_DEDUP,
+    FLAG_RANGE,
+    FLAG_RESUMABLE,
+    FLAG_SESSION,
+    RESUME_REPLY,
+    FileHeader,
+    pack_range,
+)
 
 
 class FakeConn:
     def __init__(self, payload: bytes):
         self._payload = bytearray(payload)
+        self.sent = b""
         self.closed = False
 
     def recv(self, n: int) -> bytes:
@@ -19,11 +37,19 @@ class FakeConn:
         del self._payload[:n]
         return bytes(chunk)
 
+    def recv_into(self, buffer) -> int:
+        chunk = self.recv(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+    def sendall(self, data: bytes) -> None:
+        self.sent += bytes(data)
+
     def close(self) -> None:
         self.closed = True
 
 
-def _run_handle_client_with_header_and_body(tmp_path, header: str, body: bytes):
+def _run_handle_client_with_header_and_body(tmp_path, header, body: bytes):
     server = ServerCore(host="127.0.0.1", port=0, save_dir=str(tmp_path))
 
     metrics_list = []
@@ -33,7 +59,9 @@ def _run_handle_client_with_header_and_body(tmp_path, header: str, body: bytes):
 
     server.on_final_metrics = on_final
 
-    payload = header.encode() + body
+    if isinstance(header, str):
+        header = header.encode()
+    payload = header + body
     conn = FakeConn(payload)
 
     server.handle_client(conn, ("127.0.0.1", 12345))
@@ -64,6 +92,48 @@ def test_handle_client_parses_valid_header_and_saves_file(tmp_path):
     assert metrics["transfer_byte_difference"] == 0
 
 
+def test_handle_client_parses_binary_header(tmp_path):
+    body = b"binary framing" * 10
+    header = FileHeader("framed.bin", len(body), ".bin").encode()
+
+    metrics = _run_handle_client_with_header_and_body(tmp_path, header, body)
+
+    with open(os.path.join(tmp_path, "framed.bin"), "rb") as f:
+        assert f.read() == body
+    assert metrics["file_name"] == "framed.bin"
+    assert metrics["file_type"] == ".bin"
+    assert metrics["transfer_status"] == "Success"
+
+
+def test_handle_client_verifies_checksum_trailer(tmp_path):
+    body = b"integrity" * 1000
+    extensions = {EXT_CHECKSUM: bytes([CHECKSUM_IDS["sha256"]])}
+    header = FileHeader("checked.bin", len(body), ".bin", extensions=extensions).encode()
+
+    metrics = _run_handle_client_with_header_and_body(
+        tmp_path, header, body + hashlib.sha256(body).digest()
+    )
+
+    assert metrics["transfer_status"] == "Success"
+    assert metrics["checksum_algorithm"] == "sha256"
+    assert metrics["checksum_ok"] is True
+    assert metrics["checksum_ms_per_mb"] >= 0
+
+
+def test_handle_client_checksum_mismatch_marks_failed(tmp_path):
+    body = b"integrity" * 1000
+    extensions = {EXT_CHECKSUM: bytes([CHECKSUM_IDS["sha256"]])}
+    header = FileHeader("corrupt.bin", len(body), ".bin", extensions=extensions).encode()
+
+    metrics = _run_handle_client_with_header_and_body(
+        tmp_path, header, body + hashlib.sha256(b"something else").digest()
+    )
+
+    assert metrics["transfer_byte_difference"] == 0
+    assert metrics["checksum_ok"] is False
+    assert metrics["transfer_status"] == "Failed"
+
+
 def test_handle_client_handles_malformed_header(tmp_path):
     body = b"data-without-valid-header"
     header = "not-a-valid-header\n"
@@ -127,3 +197,185 @@ def test_file_transfer_metrics_computes_cpu_and_ram_stats():
         "ram_usage_peak",
     }
     assert expected_keys.issubset(as_dict.keys())
+
+
+def test_file_transfer_metrics_reports_throughput_percentiles():
+    metrics = FileTransferMetrics(
+        file_name="file.bin",
+        file_size=100,
+        file_type=".bin",
+        total_transfer_time=1.0,
+        throughput=50.0,
+        peak_throughput=100.0,
+        transfer_byte_difference=0,
+        transfer_status="Success",
+        throughput_samples=[float(v) for v in range(1, 101)],
+    )
+
+    as_dict = metrics.to_dict()
+    assert as_dict["throughput_p50"] == pytest.approx(50.5)
+    assert as_dict["throughput_p95"] == pytest.approx(95.05)
+    assert as_dict["throughput_p99"] == pytest.approx(99.01)
+
+
+def test_file_transfer_metrics_without_samples_falls_back_to_average():
+    metrics = FileTransferMetrics(
+        file_name="file.bin",
+        file_size=100,
+        file_type=".bin",
+        total_transfer_time=1.0,
+        throughput=12.0,
+        peak_throughput=12.0,
+        transfer_byte_difference=0,
+        transfer_status="Success",
+    )
+
+    as_dict = metrics.to_dict()
+    assert as_dict["cpu_usage_avg"] == 0.0
+    assert as_dict["throughput_p50"] == as_dict["throughput_p99"] == 12.0
+    with pytest.raises(AttributeError):
+        metrics.unexpected = 1  # __slots__ keeps instances compact
+
+
+def test_server_core_rejects_unknown_engine(tmp_path):
+    with pytest.raises(ValueError):
+        ServerCore(host="127.0.0.1", port=0, save_dir=str(tmp_path), engine="fork")
+
+
+def test_server_core_rejects_chunk_size_out_of_range(tmp_path):
+    with pytest.raises(ValueError):
+        ServerCore(host="127.0.0.1", port=0, save_dir=str(tmp_path), chunk_size=4096)
+
+
+def test_handle_client_reuses_pooled_receive_buffer(tmp_path):
+    server = ServerCore(host="127.0.0.1", port=0, save_dir=str(tmp_path), chunk_size=64 * 1024)
+    body = bytes(range(256)) * 1024  # several chunks
+
+    for i in range(3):
+        header = FileHeader(f"pooled{i}.bin", len(body), ".bin").encode()
+        server.handle_client(FakeConn(header + body), ("127.0.0.1", 12345))
+
+        with open(os.path.join(tmp_path, f"pooled{i}.bin"), "rb") as f:
+            assert f.read() == body
+
+    assert server.buffer_pool.allocated == 1
+    assert server.buffer_pool.idle == 1
+
+
+def test_handle_client_reassembles_ranges_into_one_transfer(tmp_path):
+    server = ServerCore(host="127.0.0.1", port=0, save_dir=str(tmp_path))
+    metrics_list = []
+    server.on_final_metrics = metrics_list.append
+
+    body = bytes(range(256)) * 40
+    half = len(body) // 2
+    ranges = [(1, half, len(body) - half), (0, 0, half)]  # second range first
+
+    for index, offset, length in ranges:
+        header = FileHeader(
+            "ranged.bin", length, ".bin",
+            flags=FLAG_RANGE,
+            extensions={EXT_TRANSFER_ID: b"t" * 16, EXT_RANGE: pack_range(offset, len(body), index, 2)},
+        ).encode()
+        server.handle_client(FakeConn(header + body[offset:offset + length]), ("127.0.0.1", 12345))
+
+    with open(os.path.join(tmp_path, "ranged.bin"), "rb") as f:
+        assert f.read() == body
+
+    assert len(metrics_list) == 1
+    assert metrics_list[0]["file_size"] == len(body)
+    assert metrics_list[0]["transfer_status"] == "Success"
+    assert metrics_list[0]["stream_count"] == 2
+
+
+def test_handle_client_resumes_from_checkpointed_offset(tmp_path):
+    server = ServerCore(
+        host="127.0.0.1", port=0, save_dir=str(tmp_path),
+        chunk_size=64 * 1024, checkpoint_bytes=64 * 1024,
+    )
+    metrics_list = []
+    server.on_final_metrics = metrics_list.append
+
+    body = bytes(range(256)) * 1024  # 256 KiB
+    header = FileHeader(
+        "resumed.bin", len(body), ".bin",
+        flags=FLAG_RESUMABLE, extensions={EXT_FILE_ID: b"f" * 16},
+    ).encode()
+
+    # First attempt drops after 150 KiB, which are checkpointed on the way out
+    first = FakeConn(header + body[:150 * 1024])
+    server.handle_client(first, ("127.0.0.1", 12345))
+    assert RESUME_REPLY.unpack(first.sent) == (0,)
+    assert metrics_list[0]["transfer_status"] == "Failed"
+    assert not os.path.exists(os.path.join(tmp_path, "resumed.bin"))
+
+    # The retry is told where to continue and only sends the remainder
+    offset = 150 * 1024
+    second = FakeConn(header + body[offset:])
+    server.handle_client(second, ("127.0.0.1", 12345))
+    assert RESUME_REPLY.unpack(second.sent) == (offset,)
+
+    with open(os.path.join(tmp_path, "resumed.bin"), "rb") as f:
+        assert f.read() == body
+    assert metrics_list[1]["transfer_status"] == "Success"
+    assert metrics_list[1]["resume_offset"] == offset
+    assert metrics_list[1]["transfer_byte_difference"] == 0
+
+
+def test_handle_client_session_receives_consecutive_files(tmp_path):
+    server = ServerCore(host="127.0.0.1", port=0, save_dir=str(tmp_path))
+    metrics_list = []
+    sessions = []
+    server.on_final_metrics = metrics_list.append
+    server.on_session_metrics = sessions.append
+
+    files = [("a.txt", b"first"), ("dir/b.txt", b"second file"), ("c.bin", b"")]
+    payload = b"".join(
+        FileHeader(name, len(data), ".txt", flags=FLAG_SESSION).encode() + data
+        for name, data in files
+    )
+    server.handle_client(FakeConn(payload), ("127.0.0.1", 12345))
+
+    for name, data in files:
+        with open(os.path.join(tmp_path, *name.split("/")), "rb") as f:
+            assert f.read() == data
+    assert [m["file_name"] for m in metrics_list] == [name for name, _ in files]
+    assert sessions[0]["file_count"] == 3
+    assert sessions[0]["total_bytes"] == sum(len(data) for _, data in files)
+
+
+def test_handle_client_refuses_paths_outside_save_dir(tmp_path):
+    save_dir = tmp_path / "save"
+    server = ServerCore(host="127.0.0.1", port=0, save_dir=str(save_dir))
+    metrics_list = []
+    server.on_final_metrics = metrics_list.append
+
+    header = FileHeader("../escape.bin", 3, ".bin").encode()
+    server.handle_client(FakeConn(header + b"abc"), ("127.0.0.1", 12345))
+
+    assert not (tmp_path / "escape.bin").exists()
+    assert metrics_list == []
+
+
+def test_handle_client_dedup_requests_repeated_chunk_once(tmp_path):
+    server = ServerCore(host="127.0.0.1", port=0, save_dir=str(tmp_path))
+    metrics_list = []
+    server.on_final_metrics = metrics_list.append
+
+    chunk_size = 4096
+    chunk = os.urandom(chunk_size)
+    body = chunk * 3
+    digest = hashlib.sha256(chunk).digest()
+    header = FileHeader(
+        "repeated.img", len(body), ".img",
+        flags=FLAG_DEDUP, extensions={EXT_DEDUP: DEDUP_PARAMS.pack(chunk_size)},
+    ).encode()
+
+    conn = FakeConn(header + digest * 3 + chunk)
+    server.handle_client(conn, ("127.0.0.1", 12345))
+
+    assert conn.sent == bytes([0b10000000])
+    with open(os.path.join(tmp_path, "repeated.img"), "rb") as f:
+        assert f.read() == body
+    assert metrics_list[0]["transfer_status"] == "Success"
+    assert metrics_list[0]["dedup_bytes_saved"] == 2 * chunk_size
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from server.signal_bridge import SampleCoalescer
+
+
+def test_coalescer_batches_samples_per_key():
+    coalescer = SampleCoalescer()
+    coalescer.push((1.0, 2.0, 3.0), key="a")
+    coalescer.push((4.0, 5.0, 6.0), key="b")
+    coalescer.push((7.0, 8.0, 9.0), key="a")
+
+    assert coalescer.drain() == {
+        "a": [(1.0, 2.0, 3.0), (7.0, 8.0, 9.0)],
+        "b": [(4.0, 5.0, 6.0)],
+    }
+    assert coalescer.drain() == {}
+
+
+def test_coalescer_bounds_each_batch():
+    coalescer = SampleCoalescer(max_samples=3)
+    for i in range(10):
+        coalescer.push(i)
+
+    assert coalescer.drain() == {None: [7, 8, 9]}
+    assert coalescer.dropped == 7
+
+
+def test_coalescer_latest_mode_keeps_one_sample_per_key():
+    coalescer = SampleCoalescer(mode="latest")
+    for i in range(5):
+        coalescer.push(i, key="a")
+
+    assert coalescer.drain() == {"a": [4]}
+
+
+def test_coalescer_loses_nothing_under_concurrent_pushes():
+    coalescer = SampleCoalescer(max_samples=100000)
+    drained = []
+
+    def produce(key):
+        for i in range(5000):
+            coalescer.push(i, key=key)
+
+    threads = [threading.Thread(target=produce, args=(k,)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        drained.append(coalescer.drain())
+    for thread in threads:
+        thread.join()
+    drained.append(coalescer.drain())
+
+    for key in range(4):
+        received = [i for batch in drained for i in batch.get(key, [])]
+        assert received == list(range(5000))
+
+
+def test_coalescer_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        SampleCoalescer(mode="average")
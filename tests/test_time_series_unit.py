@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from db import database
+from db.transfer_metrics_model import TransferMetrics
+from server.metrics_writer import MetricsWriter
+from server.resource_sampler import ResourceSampler
+from server.time_series import (
+    BLOCK_POINTS,
+    Downsampler,
+    choose_tier,
+    decode_points,
+    encode_points,
+    load_series,
+    sample_rows,
+)
+
+
+def test_downsampler_keeps_mean_min_max_per_bucket():
+    downsampler = Downsampler(1.0)
+    for t, value in [(10.0, 1.0), (10.5, 5.0), (10.9, 3.0), (11.2, 7.0)]:
+        downsampler.add(t, value)
+
+    assert downsampler.points() == [(10.0, 3.0, 1.0, 5.0), (11.0, 7.0, 7.0, 7.0)]
+
+
+def test_points_round_trip_through_binary_blocks():
+    points = [(float(t), t * 0.5, t * 0.25, t * 2.0) for t in range(10)]
+
+    blob = encode_points(points, 4)
+
+    assert len(blob) == len(points) * 4 * 8
+    assert decode_points(blob, 4) == points
+
+
+def test_sample_rows_split_long_series_into_blocks():
+    points = [(float(t), 1.0) for t in range(BLOCK_POINTS + 10)]
+
+    rows = sample_rows(7, {"cpu": {"raw": points}})
+
+    assert [(row["block_index"], row["sample_count"]) for row in rows] == [(0, BLOCK_POINTS), (1, 10)]
+    assert rows[1]["start_time"] == float(BLOCK_POINTS)
+    assert all(row["transfer_id"] == 7 for row in rows)
+
+
+def test_choose_tier_picks_finest_tier_within_budget():
+    assert choose_tier(10, sample_interval=0.01) == "raw"
+    assert choose_tier(600, sample_interval=0.01) == "1s"
+    assert choose_tier(86400, sample_interval=0.01) == "1min"
+
+
+def test_metrics_writer_stores_probe_time_series(tmp_path):
+    engine = database.create_db_engine(f"sqlite:///{tmp_path / 'series.db'}")
+    Session = sessionmaker(bind=engine)
+
+    @contextmanager
+    def session_factory():
+        with Session() as db, db.begin():
+            yield db
+
+    sampler = ResourceSampler()
+    probe = sampler.begin()
+    for _ in range(5):
+        probe.add(1024)
+        sampler.sample()
+    sampler.end(probe)
+
+    writer = MetricsWriter(session_factory, str(tmp_path / "journal.jsonl"), flush_interval=0.01)
+    writer.submit(
+        {"file_name": "a.bin", "file_size": 5120, "total_transfer_time": 1.0,
+         "throughput": 1.0, "peak_throughput": 1.0, "transfer_status": "Success"},
+        probe.time_series(),
+    )
+    writer.stop()
+
+    with Session() as db:
+        transfer_id = db.query(TransferMetrics.id).scalar()
+        throughput = load_series(db, transfer_id, "throughput")
+        cpu = load_series(db, transfer_id, "cpu")
+        per_second = load_series(db, transfer_id, "throughput", tier="1s")
+
+    assert [value for _, value in throughput] == pytest.approx(list(probe.throughput_samples.values()))
+    assert len(cpu) == len(probe.cpu_samples)
+    assert per_second and len(per_second[0]) == 4
+    engine.dispose()
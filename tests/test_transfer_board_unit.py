@@ -0,0 +1,77 @@
+from server.transfer_board import TABLE_COLUMNS, TransferBoard
+
+MB = 1024 * 1024
+
+
+def _info(transfer_id, size=10 * MB):
+    return {
+        "transfer_id": transfer_id,
+        "file_name": f"{transfer_id}.bin",
+        "file_size": size,
+        "client_address": "127.0.0.1:4000",
+        "start_time": 0.0,
+    }
+
+
+def test_started_transfers_get_rows_in_order():
+    board = TransferBoard()
+
+    assert board.start(_info("1")) == 0
+    assert board.start(_info("2")) == 1
+    assert board.start(_info("1")) == 0  # repeated notification keeps the row
+    assert len(board) == 2
+    assert len(board.transfers["1"].cells()) == len(TABLE_COLUMNS)
+
+
+def test_update_reports_only_changed_rows_and_total_throughput():
+    board = TransferBoard()
+    board.start(_info("1"))
+    board.start(_info("2"))
+
+    changed, total = board.update({
+        "1": [(1.0, 5.0, 10.0, MB), (2.0, 5.0, 10.0, 2 * MB)],
+        "2": [(3.0, 5.0, 10.0, 3 * MB)],
+    })
+    assert [row for row, _ in changed] == [0, 1]
+    assert total == 5.0  # latest rate of each transfer
+    rate, eta = changed[0][1][5:]
+    assert rate == "2.00"
+    assert eta == "4.0 s"  # 8 MiB left at 2 MB/s
+
+    changed, total = board.update({"2": [(3.0, 5.0, 10.0, 3 * MB)]})
+    assert changed == []
+    assert total == 5.0
+
+
+def test_eta_unknown_without_rate_or_size():
+    board = TransferBoard()
+    board.start({"transfer_id": "1"})
+
+    board.update({"1": [(0.0, 0.0, 0.0, 100)]})
+
+    assert board.transfers["1"].eta is None
+    assert board.transfers["1"].cells()[-1] == "-"
+
+
+def test_finish_removes_row_and_ignores_late_samples():
+    board = TransferBoard()
+    board.start(_info("1"))
+    board.start(_info("2"))
+
+    assert board.finish("1") == 0
+    assert board.order == ["2"]
+    assert board.finish("1") is None
+
+    changed, total = board.update({"1": [(9.0, 0.0, 0.0, MB)]})
+    assert changed == []
+    assert total == 0.0
+    assert "1" not in board.transfers
+
+
+def test_samples_before_start_create_the_row():
+    board = TransferBoard()
+
+    changed, total = board.update({"7": [(1.5, 0.0, 0.0, 10)]})
+
+    assert [row for row, _ in changed] == [0]
+    assert total == 1.5
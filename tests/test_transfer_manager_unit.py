@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+
+import pytest
+
+from client.transfer_manager import CANCELLED, DONE, FAILED, TransferManager
+
+
+class FakeCore:
+    """send_file stand-in: reports `steps` chunks, optionally held by a gate."""
+
+    def __init__(self, steps=5, gate=None):
+        self.steps = steps
+        self.gate = gate
+        self.running = 0
+        self.max_running = 0
+        self.directories = []  # send_directory calls
+        self.lock = threading.Lock()
+
+    def send_file(self, file_path, on_sent=None, **options):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            if options.get("fail"):
+                raise ConnectionRefusedError("no server")
+            size = 1000
+            for _ in range(self.steps):
+                if self.gate is not None:
+                    self.gate.wait(5)
+                on_sent(size // self.steps)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+    def send_directory(self, dir_path, on_sent=None, **options):
+        self.directories.append(dir_path)
+        for name in sorted(os.listdir(dir_path)):
+            on_sent(os.path.getsize(os.path.join(dir_path, name)))
+        return len(os.listdir(dir_path))
+
+
+def _files(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"f{i}.bin"
+        path.write_bytes(b"x" * 1000)
+        paths.append(str(path))
+    return paths
+
+
+def _wait(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_jobs_run_with_bounded_concurrency_and_finish_once(tmp_path):
+    core = FakeCore(steps=3)
+    manager = TransferManager(core, max_workers=2, progress_interval=0)
+    finished = []
+    progress = []
+    manager.on_finished = finished.append
+    manager.on_progress = progress.append
+
+    ids = [manager.submit(path) for path in _files(tmp_path, 5)]
+    manager.shutdown(wait=True, cancel=False)
+
+    assert sorted(p["job_id"] for p in finished) == ids
+    assert all(p["state"] == DONE and p["bytes_sent"] == 999 for p in finished)
+    assert core.max_running <= 2
+    assert progress and all(p["state"] == "running" for p in progress)
+
+
+def test_directory_is_one_job_sent_over_a_session(tmp_path):
+    core = FakeCore()
+    manager = TransferManager(core, max_workers=1, progress_interval=0)
+    finished = []
+    manager.on_finished = finished.append
+    _files(tmp_path, 3)
+
+    manager.submit(str(tmp_path))
+    manager.shutdown(wait=True, cancel=False)
+
+    assert core.directories == [str(tmp_path)]
+    [progress] = finished
+    assert progress["state"] == DONE
+    assert progress["file_size"] == progress["bytes_sent"] == 3000
+    assert progress["metrics"] is None
+
+
+def test_progress_is_throttled(tmp_path):
+    manager = TransferManager(FakeCore(steps=100), max_workers=1, progress_interval=60)
+    progress = []
+    manager.on_progress = progress.append
+
+    manager.submit(_files(tmp_path, 1)[0])
+    manager.shutdown(wait=True, cancel=False)
+
+    assert len(progress) == 1  # the first report, then nothing for 60 s
+
+
+def test_failed_job_reports_the_error(tmp_path):
+    manager = TransferManager(FakeCore(), max_workers=1)
+    finished = []
+    manager.on_finished = finished.append
+
+    manager.submit(_files(tmp_path, 1)[0], fail=True)
+    manager.shutdown(wait=True, cancel=False)
+
+    assert finished[0]["state"] == FAILED
+    assert "no server" in finished[0]["error"]
+
+
+def test_cancel_running_and_queued_jobs(tmp_path):
+    gate = threading.Event()
+    core = FakeCore(steps=3, gate=gate)
+    manager = TransferManager(core, max_workers=1, progress_interval=0)
+    finished = []
+    manager.on_finished = finished.append
+    running_id, queued_id = (manager.submit(path) for path in _files(tmp_path, 2))
+    _wait(lambda: core.running == 1)
+
+    assert manager.cancel(queued_id) is True
+    assert manager.cancel(running_id) is True
+    gate.set()
+    manager.shutdown(wait=True)
+
+    states = {p["job_id"]: p["state"] for p in finished}
+    assert states == {running_id: CANCELLED, queued_id: CANCELLED}
+    assert manager.cancel(running_id) is False
+    assert manager.active() == []
+
+
+def test_shutdown_cancels_pending_work_and_rejects_new_jobs(tmp_path):
+    gate = threading.Event()
+    core = FakeCore(steps=2, gate=gate)
+    manager = TransferManager(core, max_workers=1)
+    finished = []
+    manager.on_finished = finished.append
+    paths = _files(tmp_path, 3)
+    for path in paths:
+        manager.submit(path)
+    _wait(lambda: core.running == 1)
+
+    manager.shutdown(wait=False)
+    gate.set()
+    _wait(lambda: len(finished) == 3)
+
+    assert len(finished) == 3
+    assert all(p["state"] == CANCELLED for p in finished)
+    with pytest.raises(RuntimeError):
+        manager.submit(paths[0])